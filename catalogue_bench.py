@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+
+# --- Araç Kataloğu Kıyaslaması ---
+# Dropdown uçlarının (/api/brands, /api/series, /api/years, /api/fuels, /api/models) eski hali her
+# istekte tum_data.json listesinin tamamını tarıyordu. Bu betik aynı sentetik veri üzerinde eski
+# taramayı, build_vehicle_catalogue ile derlenen mmap'li katalog dosyasındaki tek aramayla
+# karşılaştırır ve her örnek yolda iki yöntemin aynı sıralı listeyi döndürdüğünü doğrular.
+# Veri ve örnek yollar --seed ile sabittir; --data ile gerçek bir tum_data.json da verilebilir.
+#
+#   python catalogue_bench.py
+#   python catalogue_bench.py --brands 80 --samples 300 --repeats 5
+#
+# Sayılar aynı makinede iki yöntem arasındaki farkı göstermek içindir.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEVELS = ("marka", "seri", "yil", "yakit", "model")
+LEVEL_NAMES = ("brands", "series", "years", "fuels", "models")
+
+def generate_catalogue(rng, brands, series_per_brand, years, fuels, models):
+    # Girdi sırası karıştırılır ve bazı satırlar tekrarlanır; gerçek dosyada da sıra ve tekillik garanti değil.
+    rows = []
+    for brand_index in range(brands):
+        brand = f"Marka{brand_index:03d}"
+        for series_index in range(series_per_brand):
+            series = f"{brand} Seri {series_index}"
+            for year in range(2024 - years, 2024):
+                for fuel in ("Benzin", "Dizel", "LPG", "Hibrit", "Elektrik")[:fuels]:
+                    for model_index in range(models):
+                        rows.append({"marka": brand, "seri": series, "yil": str(year), "yakit": fuel,
+                                     "model": f"{series} {rng.choice('ÇŞĞÜÖİ')}{model_index} {fuel}"})
+    rows.extend(rng.sample(rows, len(rows) // 20))
+    rng.shuffle(rows)
+    return rows
+
+def legacy_catalogue_lookup(vehicle_data, path):
+    # Eski uçlardaki tam taramaların birebir kopyası.
+    if len(path) == 0:
+        return sorted(list(set(item['marka'] for item in vehicle_data)))
+    if len(path) == 1:
+        brand, = path
+        return sorted(list(set(item['seri'] for item in vehicle_data if item['marka'] == brand)))
+    if len(path) == 2:
+        brand, series = path
+        return sorted(list(set(item['yil'] for item in vehicle_data if item['marka'] == brand and item['seri'] == series)))
+    if len(path) == 3:
+        brand, series, year = path
+        return sorted(list(set(item['yakit'] for item in vehicle_data if item['marka'] == brand and item['seri'] == series and item['yil'] == year)))
+    brand, series, year, fuel = path
+    return sorted(list(set(item['model'] for item in vehicle_data if item['marka'] == brand and item['seri'] == series and item['yil'] == year and item['yakit'] == fuel)))
+
+def sample_paths(rng, vehicle_data, count):
+    paths = []
+    for _ in range(count):
+        item = rng.choice(vehicle_data)
+        depth = rng.randrange(len(LEVELS))
+        paths.append(tuple(item[LEVELS[i]] for i in range(depth)))
+    return paths
+
+def timed(func, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="araç kataloğu indeksi ile eski tam taramanın kıyaslaması")
+    parser.add_argument("--data", help="sentetik veri yerine kullanılacak tum_data.json")
+    parser.add_argument("--brands", type=int, default=40)
+    parser.add_argument("--series", type=int, default=6, help="marka başına seri sayısı")
+    parser.add_argument("--years", type=int, default=15)
+    parser.add_argument("--fuels", type=int, default=3, choices=range(1, 6))
+    parser.add_argument("--models", type=int, default=4, help="yakıt başına model sayısı")
+    parser.add_argument("--samples", type=int, default=100, help="ölçülen rastgele yol sayısı")
+    parser.add_argument("--repeats", type=int, default=3, help="eski tarama için yol başına tekrar")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="sonuçları JSON olarak da yaz")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="aracabak-catalogue-")
+    rng = random.Random(args.seed)
+    if args.data:
+        with open(args.data, 'r', encoding='utf-8') as f:
+            vehicle_data = json.load(f)
+    else:
+        vehicle_data = generate_catalogue(rng, args.brands, args.series, args.years, args.fuels, args.models)
+    # main_api içe aktarılırken DATABASE_DIR'deki referans dosyalarını okur.
+    for name, content in (('tum_data.json', vehicle_data), ('sehirler.json', {"sehirler": []})):
+        with open(os.path.join(workdir, name), 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+    os.environ.update({"DATABASE_DIR": workdir, "REDIS_URL": os.getenv("CATALOGUE_BENCH_REDIS_URL", "redis://127.0.0.1:1/0")})
+    logging.basicConfig(level=logging.ERROR)
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    import main_api as api
+
+    started = time.perf_counter()
+    catalogue = api.build_vehicle_catalogue(vehicle_data)
+    build_seconds = time.perf_counter() - started
+    catalogue_path = os.path.join(workdir, 'bench.cat')
+    started = time.perf_counter()
+    api.write_catalogue_file(catalogue, catalogue_path, 0, 0)
+    write_seconds = time.perf_counter() - started
+    store = api.CatalogueStore(catalogue_path)
+
+    results = {name: {"legacy": [], "index": []} for name in LEVEL_NAMES}
+    mismatches = 0
+    for path in sample_paths(rng, vehicle_data, args.samples):
+        name = LEVEL_NAMES[len(path)]
+        expected = legacy_catalogue_lookup(vehicle_data, path)
+        payload = store.get(path)
+        if payload is None or json.loads(bytes(payload.body)) != expected:
+            mismatches += 1
+        results[name]["legacy"].append(timed(lambda: legacy_catalogue_lookup(vehicle_data, path), args.repeats))
+        results[name]["index"].append(timed(lambda: store.get(path), max(args.repeats, 50)))
+
+    report = {
+        "rows": len(vehicle_data), "catalogue_entries": len(catalogue), "catalogue_bytes": os.path.getsize(catalogue_path),
+        "build_seconds": round(build_seconds, 4), "write_seconds": round(write_seconds, 4), "mismatches": mismatches,
+        "seed": args.seed, "levels": {},
+    }
+    print(f"Satır: {report['rows']}  katalog kaydı: {report['catalogue_entries']}  dosya: {report['catalogue_bytes'] / 1024:.0f} KB  "
+          f"derleme: {build_seconds * 1000:.1f} ms  yazma: {write_seconds * 1000:.1f} ms")
+    for name, timings in results.items():
+        if not timings["legacy"]:
+            continue
+        row = {"samples": len(timings["legacy"])}
+        for method, values in timings.items():
+            values.sort()
+            row[f"{method}_p50_ms"] = round(percentile(values, 0.50) * 1000, 4)
+            row[f"{method}_p95_ms"] = round(percentile(values, 0.95) * 1000, 4)
+        report["levels"][name] = row
+        print(f"  {name:<8} {row['samples']:>4} yol  tarama p50 {row['legacy_p50_ms']:>9.3f} ms  p95 {row['legacy_p95_ms']:>9.3f} ms   "
+              f"indeks p50 {row['index_p50_ms']:>7.4f} ms  p95 {row['index_p95_ms']:>7.4f} ms")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if mismatches:
+        print(f"UYARI: {mismatches} yolda indeks eski taramadan farklı sonuç döndürdü.")
+        return 1
+    print("Tüm örnek yollarda indeks eski taramayla aynı listeyi döndürdü.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,799 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import itertools
+import sqlite3
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+# --- Yük Testi ve Kıyaslama ---
+# main_api.py'yi sentetik bir SQLite veritabanı, fakeredis (ya da --redis-url ile verilen yerel
+# Redis) ve gecikme eklenmiş yerel Google Places / apisepeti / Brevo taklitleriyle ayağa kaldırır,
+# karışık bir iş yükünü gerçek HTTP üzerinden sürer ve senaryo başına throughput, p50/p95/p99 ve
+# istek başına SQL sayısını raporlar. --save-baseline ile sonuçlar saklanır; sonraki koşular bu
+# değerlerle karşılaştırılır ve gerileme varsa 1 koduyla çıkılır.
+#
+#   python loadtest.py --scale small --duration 20 --save-baseline
+#   python loadtest.py --scale small --duration 20
+#
+# İstemci thread'leri sunucuyla aynı süreçte çalışır; mutlak sayılar üretim kapasitesini değil,
+# aynı makinede iki sürüm arasındaki farkı göstermek içindir.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = os.path.join(BASE_DIR, 'loadtest_baseline.json')
+
+SCALES = {
+    "small": {"owners": 300, "shops": 40, "vehicles_per_owner": 2, "fuel_entries_per_vehicle": 60, "requests_per_owner": 4},
+    "medium": {"owners": 3000, "shops": 300, "vehicles_per_owner": 2, "fuel_entries_per_vehicle": 150, "requests_per_owner": 8},
+    "large": {"owners": 20000, "shops": 1500, "vehicles_per_owner": 2, "fuel_entries_per_vehicle": 300, "requests_per_owner": 12},
+}
+CITIES = ["Ankara", "İstanbul", "İzmir", "Bursa", "Antalya", "Konya"]
+CITY_CENTERS = {"Ankara": (39.93, 32.85), "İstanbul": (41.01, 28.98), "İzmir": (38.42, 27.14),
+                "Bursa": (40.19, 29.06), "Antalya": (36.90, 30.71), "Konya": (37.87, 32.48)}
+BRANDS = ["Audi", "BMW", "Fiat", "Ford", "Honda", "Hyundai", "Mercedes", "Renault", "Toyota", "Volkswagen"]
+FUELS = ["Benzin", "Dizel"]
+YEARS = [str(year) for year in range(2012, 2024)]
+PERCENTILES = (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99))
+TAIL_MIN_SAMPLES = 5
+PARTS = {"Yağ": ["Castrol", "Shell"], "Yağ Filtresi": ["Bosch", "Mann"], "Hava Filtresi": ["Bosch"], "Polen Filtresi": ["Mahle"]}
+
+# --- Dış Servis Taklitleri ---
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency, jitter):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def url(self, path=""):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def delay(self):
+        with self.server._lock:
+            self.server.calls += 1
+        latency = self.server.latency
+        if latency > 0:
+            time.sleep(max(0.0, random.gauss(latency, latency * self.server.jitter)))
+
+    def send_body(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+class PlacesStubHandler(StubHandler):
+    def do_GET(self):
+        self.delay()
+        place_id = parse_qs(urlparse(self.path).query).get("place_id", [""])[0]
+        seed = sum(map(ord, place_id))
+        result = {
+            "name": f"Servis {place_id}",
+            "rating": round(3 + (seed % 20) / 10, 1),
+            "user_ratings_total": 10 + seed % 400,
+            "reviews": [{"author_name": f"Müşteri {index}", "rating": 4, "text": "Hızlı ve özenli."} for index in range(5)],
+            "formatted_phone_number": "0312 000 00 00",
+            "url": f"https://maps.google.com/?cid={seed}",
+            "geometry": {"location": {"lat": 39 + (seed % 100) / 100, "lng": 32 + (seed % 70) / 100}},
+        }
+        body = json.dumps({"status": "OK", "result": result}).encode('utf-8')
+        self.send_body(200, body, [("Content-Type", "application/json")])
+
+class FuelPricesStubHandler(StubHandler):
+    BODY = json.dumps({"success": True, "data": [
+        {"sehir": city, "benzin": 43.5 + index / 10, "motorin": 44.9 + index / 10, "lpg": 25.1} for index, city in enumerate(CITIES)
+    ]}).encode('utf-8')
+    ETAG = '"loadtest-fuel-v1"'
+
+    def do_GET(self):
+        self.delay()
+        if self.headers.get("If-None-Match") == self.ETAG:
+            self.send_body(304, headers=[("ETag", self.ETAG)])
+            return
+        self.send_body(200, self.BODY, [("Content-Type", "application/json"), ("ETag", self.ETAG)])
+
+class BrevoStubHandler(StubHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.delay()
+        body = json.dumps({"messageId": f"<{time.time_ns()}@loadtest>"}).encode('utf-8')
+        self.send_body(201, body, [("Content-Type", "application/json")])
+
+def start_stub(handler, latency_ms, jitter):
+    server = StubServer(handler, latency_ms / 1000.0, jitter)
+    threading.Thread(target=server.serve_forever, name=f"stub-{handler.__name__}", daemon=True).start()
+    return server
+
+# --- Sentetik Veri ---
+def write_reference_data(directory):
+    catalogue = []
+    for brand in BRANDS:
+        for series_index in range(3):
+            series = f"{brand} S{series_index}"
+            for year in YEARS:
+                for fuel in FUELS:
+                    for model_index in range(2):
+                        catalogue.append({"marka": brand, "seri": series, "yil": year, "yakit": fuel, "model": f"{series} M{model_index}"})
+    schedule = {
+        str(km): {"degisecek_parcalar": {part: brands for part, brands in PARTS.items()}, "kontrol_edilecekler": ["Fren", "Lastik"]}
+        for km in (15000, 30000, 60000, 90000, 120000)
+    }
+    files = {
+        'tum_data.json': catalogue,
+        'dizel_bakim_parcalari.json': schedule,
+        'benzin_bakim_parcalari.json': schedule,
+        'sehirler.json': {"sehirler": [{"isim": city} for city in CITIES]},
+    }
+    for name, content in files.items():
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+
+def insert_vehicle(api, conn, owner, vehicle_id, fuel_entries, rng, today):
+    brand = rng.choice(BRANDS)
+    vehicle = {"id": vehicle_id, "brand": brand, "series": f"{brand} S{rng.randrange(3)}", "year": rng.choice(YEARS),
+               "fuel": rng.choice(FUELS), "km": rng.randrange(10000, 200000)}
+    vehicle["model"] = f"{vehicle['series']} M{rng.randrange(2)}"
+    owner["vehicles"].append(vehicle)
+    conn.execute(
+        "INSERT INTO Vehicles (id, user_id, plate_number, brand, series, year, fuel, model, last_inspection_date, tax_paid_jan) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (vehicle_id, owner["id"], f"34LT{vehicle_id:05d}", brand, vehicle["series"], vehicle["year"], vehicle["fuel"], vehicle["model"],
+         (today - timedelta(days=rng.randrange(30, 800))).isoformat(), rng.randrange(2))
+    )
+    entries = []
+    for _ in range(fuel_entries):
+        entry_date = (today - timedelta(days=rng.randrange(0, 730))).isoformat()
+        if rng.random() < 0.5:
+            entries.append((entry_date, round(rng.uniform(500, 2500), 2), None, rng.randrange(200, 700)))
+        else:
+            entries.append((entry_date, None, round(rng.uniform(20, 60), 2), rng.randrange(200, 700)))
+    conn.executemany(
+        "INSERT INTO FuelEntries (user_id, vehicle_id, date, amount_tl, amount_liter, distance_km) VALUES (?, ?, ?, ?, ?, ?)",
+        [(owner["id"], vehicle_id, *entry) for entry in entries]
+    )
+    api.add_fuel_entries_to_rollup(conn, vehicle_id, entries)
+    return vehicle
+
+def seed_fleet_owner(api, user_id, vehicle_count, fuel_entries, shops, rng):
+    # Araç paneli karşılaştırması için çok araçlı tek bir filo sahibi; her aracın bir talebi vardır.
+    conn = sqlite3.connect(api.DATABASE_PATH)
+    today = date.today()
+    fleet = {"id": user_id, "email": f"fleet{user_id}@loadtest.local", "name": "Filo Sahibi", "user_type": "owner", "vehicles": []}
+    conn.execute("INSERT INTO Users (id, email, name, user_type, phone_number) VALUES (?, ?, ?, ?, ?)",
+                 (user_id, fleet["email"], fleet["name"], "owner", f"0555{user_id:07d}"))
+    vehicle_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM Vehicles").fetchone()[0]
+    for _ in range(vehicle_count):
+        vehicle_id += 1
+        vehicle = insert_vehicle(api, conn, fleet, vehicle_id, fuel_entries, rng, today)
+        shop = rng.choice(shops)
+        conn.execute(
+            "INSERT INTO Requests (user_id, shop_user_id, shop_google_place_id, vehicle_brand, vehicle_series, vehicle_year, vehicle_fuel, vehicle_model, vehicle_km, city, maintenance_km, selected_parts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, shop["id"], shop["place_id"], vehicle["brand"], vehicle["series"], vehicle["year"], vehicle["fuel"], vehicle["model"],
+             vehicle["km"], shop["city"], (vehicle["km"] // 15000 + 1) * 15000, json.dumps({"Yağ": "Castrol"}, ensure_ascii=False))
+        )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return fleet
+
+def seed_database(api, scale, rng):
+    # Şema main_api içe aktarılırken göçlerle kurulur; burada yalnızca veri basılır.
+    conn = sqlite3.connect(api.DATABASE_PATH)
+    today = date.today()
+    owners, shops = [], []
+    user_rows, shop_rows, brand_rows = [], [], []
+    for index in range(scale["owners"]):
+        user_id = index + 1
+        owners.append({"id": user_id, "email": f"owner{user_id}@loadtest.local", "name": f"Araç Sahibi {user_id}",
+                       "user_type": "owner", "city": rng.choice(CITIES), "vehicles": [], "request_ids": []})
+        user_rows.append((user_id, owners[-1]["email"], owners[-1]["name"], "owner", f"0555{user_id:07d}"))
+    for index in range(scale["shops"]):
+        user_id = scale["owners"] + index + 1
+        city = CITIES[index % len(CITIES)]
+        brands = sorted(rng.sample(BRANDS, 3))
+        center_lat, center_lng = CITY_CENTERS[city]
+        shop = {"id": user_id, "email": f"shop{user_id}@loadtest.local", "name": f"Servis {user_id}", "user_type": "business",
+                "city": city, "brands": brands, "place_id": f"lt-place-{user_id}", "quoted_request_ids": [], "appointment_ids": []}
+        shops.append(shop)
+        user_rows.append((user_id, shop["email"], shop["name"], "business", f"0532{user_id:07d}"))
+        shop_rows.append((user_id, city, f"0312{user_id:07d}", shop["place_id"], ",".join(brands)))
+        brand_rows.extend((user_id, api.normalize_brand(brand), city) for brand in brands)
+        shop["location"] = (center_lat + rng.uniform(-0.25, 0.25), center_lng + rng.uniform(-0.3, 0.3))
+    conn.executemany("INSERT INTO Users (id, email, name, user_type, phone_number) VALUES (?, ?, ?, ?, ?)", user_rows)
+    conn.executemany("INSERT INTO Shops (user_id, city, phone, google_place_id, serviced_brands) VALUES (?, ?, ?, ?, ?)", shop_rows)
+    conn.executemany("INSERT INTO ShopBrands (shop_user_id, brand, city) VALUES (?, ?, ?)", brand_rows)
+    for shop in shops:
+        api.set_shop_location(conn, shop["id"], *shop["location"])
+
+    shops_by_city = defaultdict(list)
+    for shop in shops:
+        shops_by_city[shop["city"]].append(shop)
+    vehicle_id = 0
+    for owner in owners:
+        for _ in range(scale["vehicles_per_owner"]):
+            vehicle_id += 1
+            insert_vehicle(api, conn, owner, vehicle_id, scale["fuel_entries_per_vehicle"], rng, today)
+        city_shops = shops_by_city.get(owner["city"]) or shops
+        for _ in range(scale["requests_per_owner"]):
+            vehicle = rng.choice(owner["vehicles"])
+            shop = rng.choice(city_shops)
+            created_at = (datetime.now() - timedelta(minutes=rng.randrange(0, 525600))).strftime('%Y-%m-%d %H:%M:%S')
+            roll = rng.random()
+            status = 'pending' if roll < 0.4 else 'quoted' if roll < 0.8 else 'accepted'
+            cursor = conn.execute(
+                "INSERT INTO Requests (user_id, shop_user_id, shop_google_place_id, vehicle_brand, vehicle_series, vehicle_year, vehicle_fuel, vehicle_model, vehicle_km, city, maintenance_km, selected_parts, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (owner["id"], shop["id"], shop["place_id"], vehicle["brand"], vehicle["series"], vehicle["year"], vehicle["fuel"], vehicle["model"],
+                 vehicle["km"], owner["city"], (vehicle["km"] // 15000 + 1) * 15000, json.dumps({"Yağ": "Castrol"}, ensure_ascii=False), status, created_at)
+            )
+            request_id = cursor.lastrowid
+            owner["request_ids"].append(request_id)
+            if status == 'pending':
+                continue
+            parts_cost, labor_cost = rng.randrange(500, 5000), rng.randrange(200, 2000)
+            conn.execute(
+                "INSERT INTO Quotes (request_id, shop_user_id, parts_cost, labor_cost, total_cost, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (request_id, shop["id"], parts_cost, labor_cost, parts_cost + labor_cost, "Yük testi teklifi", created_at)
+            )
+            if status == 'quoted':
+                shop["quoted_request_ids"].append(request_id)
+                continue
+            cursor = conn.execute(
+                "INSERT INTO Appointments (user_id, shop_user_id, request_id, vehicle_plate, vehicle_brand, vehicle_model, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (owner["id"], shop["id"], request_id, f"34LT{vehicle['id']:05d}", vehicle["brand"], vehicle["model"], created_at)
+            )
+            shop["appointment_ids"].append(cursor.lastrowid)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return owners, shops
+
+def session_cookies(api, users):
+    # Oturumlar uygulamanın kendi session arayüzüyle Redis'e yazılır; HTTP istemcisi çerezi kullanır.
+    cookie_name = api.app.config.get("SESSION_COOKIE_NAME", "session")
+    client = api.app.test_client()
+    cookies = {}
+    for user in users:
+        client.delete_cookie(cookie_name)
+        with client.session_transaction() as sess:
+            sess.update(user_id=user["id"], user_type=user["user_type"], email=user["email"], name=user["name"])
+        cookies[user["id"]] = client.get_cookie(cookie_name).value
+    return cookie_name, cookies
+
+# --- İş Yükü ---
+register_counter = itertools.count(1)
+
+def fuel_range(ctx):
+    end = date.today()
+    return f"start_date={(end - timedelta(days=ctx.rng.choice((30, 90, 365)))).isoformat()}&end_date={end.isoformat()}"
+
+def scenario_dashboard(ctx):
+    return "GET", "/api/dashboard", {}
+
+def scenario_account(ctx):
+    return "GET", "/api/account", {}
+
+def scenario_auth_status(ctx):
+    return "GET", "/api/auth/status", {}
+
+def scenario_owner_requests(ctx):
+    return "GET", "/api/requests?limit=20", {}
+
+def scenario_owner_appointments(ctx):
+    return "GET", "/api/appointments?limit=20", {}
+
+def scenario_fuel_list(ctx):
+    vehicle = ctx.rng.choice(ctx.user["vehicles"])
+    return "GET", f"/api/vehicles/{vehicle['id']}/fuel_entries?{fuel_range(ctx)}", {}
+
+def scenario_fuel_add(ctx):
+    vehicle = ctx.rng.choice(ctx.user["vehicles"])
+    unit = ctx.rng.choice(("TL", "Litre"))
+    body = {"date": date.today().isoformat(), "amount": 1500 if unit == "TL" else 40, "unit": unit, "distance": ctx.rng.randrange(200, 700)}
+    return "POST", f"/api/vehicles/{vehicle['id']}/fuel_entries", {"json": body}
+
+def scenario_tax_status(ctx):
+    vehicle = ctx.rng.choice(ctx.user["vehicles"])
+    body = {"vehicle_id": vehicle["id"], "period": ctx.rng.choice(("jan", "jul")), "status": ctx.rng.random() < 0.5}
+    return "POST", "/api/vehicles/tax_status", {"json": body}
+
+def scenario_create_request(ctx):
+    vehicle = ctx.rng.choice(ctx.user["vehicles"])
+    shop = ctx.rng.choice(ctx.shops)
+    body = {
+        "shop_user_id": shop["id"], "shop_google_place_id": shop["place_id"], "city": shop["city"],
+        "vehicle": {key: vehicle[key] for key in ("brand", "series", "year", "fuel", "model", "km")},
+        "maintenance_km": (vehicle["km"] // 15000 + 1) * 15000, "selected_parts": {"Yağ": "Castrol", "Yağ Filtresi": "Bosch"},
+    }
+    return "POST", "/api/requests", {"json": body}
+
+def scenario_shop_requests(ctx):
+    return "GET", "/api/requests?limit=50", {}
+
+def scenario_shop_appointments(ctx):
+    return "GET", "/api/appointments?limit=50", {}
+
+def scenario_quote_update(ctx):
+    request_id = ctx.rng.choice(ctx.user["quoted_request_ids"])
+    parts_cost, labor_cost = ctx.rng.randrange(500, 5000), ctx.rng.randrange(200, 2000)
+    return "PUT", f"/api/requests/{request_id}/quote", {"json": {"parts_cost": parts_cost, "labor_cost": labor_cost, "notes": "Güncellendi"}}
+
+def scenario_appointment_update(ctx):
+    appointment_id = ctx.rng.choice(ctx.user["appointment_ids"])
+    appointment_date = (datetime.now() + timedelta(days=ctx.rng.randrange(1, 30))).strftime('%Y-%m-%dT%H:00')
+    return "PUT", f"/api/appointments/{appointment_id}", {"json": {"appointment_date": appointment_date}}
+
+def scenario_find_shops(ctx):
+    return "GET", f"/api/find_shops?city={ctx.rng.choice(CITIES)}&brand={ctx.rng.choice(BRANDS)}", {}
+
+def scenario_find_shops_nearby(ctx):
+    latitude, longitude = CITY_CENTERS[ctx.rng.choice(CITIES)]
+    return "GET", f"/api/find_shops?lat={latitude + ctx.rng.uniform(-0.2, 0.2):.4f}&lng={longitude + ctx.rng.uniform(-0.2, 0.2):.4f}&brand={ctx.rng.choice(BRANDS)}&limit=10", {}
+
+def scenario_brands(ctx):
+    return "GET", "/api/brands", {"headers": {"Accept-Encoding": "gzip"}}
+
+def scenario_models(ctx):
+    brand = ctx.rng.choice(BRANDS)
+    path = f"/api/models?brand={brand}&series={brand} S{ctx.rng.randrange(3)}&year={ctx.rng.choice(YEARS)}&fuel={ctx.rng.choice(FUELS)}"
+    return "GET", path, {}
+
+def scenario_cities(ctx):
+    return "GET", "/api/cities", {"headers": {"Accept-Encoding": "gzip"}}
+
+def scenario_maintenance_options(ctx):
+    return "GET", f"/api/maintenance_options?fuel={ctx.rng.choice(FUELS)}&km={ctx.rng.randrange(5000, 250000)}", {}
+
+def scenario_fuel_prices(ctx):
+    return "GET", "/api/fuel_prices", {}
+
+def scenario_register(ctx):
+    # Kayıt, hoş geldin e-postasını outbox'a yazar; Brevo taklidi iş kuyruğu üzerinden çağrılır.
+    number = next(register_counter)
+    body = {"email": f"new{number}-{ctx.run_id}@loadtest.local", "name": f"Yeni Kullanıcı {number}", "google_id": f"lt-{ctx.run_id}-{number}",
+            "user_type": "owner", "phone_number": "05551234567"}
+    return "POST", "/api/auth/register", {"json": body}
+
+# (ad, ağırlık, rol, yazma mı, istek üreten fonksiyon)
+SCENARIOS = [
+    ("dashboard", 12, "owner", False, scenario_dashboard),
+    ("account", 8, "owner", False, scenario_account),
+    ("auth_status", 4, "owner", False, scenario_auth_status),
+    ("owner_requests", 8, "owner", False, scenario_owner_requests),
+    ("owner_appointments", 4, "owner", False, scenario_owner_appointments),
+    ("fuel_list", 6, "owner", False, scenario_fuel_list),
+    ("fuel_add", 4, "owner", True, scenario_fuel_add),
+    ("tax_status", 2, "owner", True, scenario_tax_status),
+    ("create_request", 2, "owner", True, scenario_create_request),
+    ("shop_requests", 8, "business", False, scenario_shop_requests),
+    ("shop_appointments", 4, "business", False, scenario_shop_appointments),
+    ("quote_update", 2, "business", True, scenario_quote_update),
+    ("appointment_update", 1, "business", True, scenario_appointment_update),
+    ("find_shops", 8, "anonymous", False, scenario_find_shops),
+    ("find_shops_nearby", 4, "anonymous", False, scenario_find_shops_nearby),
+    ("brands", 4, "anonymous", False, scenario_brands),
+    ("models", 6, "anonymous", False, scenario_models),
+    ("cities", 2, "anonymous", False, scenario_cities),
+    ("maintenance_options", 4, "anonymous", False, scenario_maintenance_options),
+    ("fuel_prices", 4, "anonymous", False, scenario_fuel_prices),
+    ("register", 1, "anonymous", True, scenario_register),
+]
+
+class ScenarioContext:
+    def __init__(self, rng, user, shops, run_id):
+        self.rng = rng
+        self.user = user
+        self.shops = shops
+        self.run_id = run_id
+
+def select_scenarios(mix, only):
+    if only:
+        names = {name.strip() for name in only.split(',') if name.strip()}
+        unknown = names - {scenario[0] for scenario in SCENARIOS}
+        if unknown:
+            raise SystemExit(f"Bilinmeyen senaryo: {', '.join(sorted(unknown))}")
+        return [scenario for scenario in SCENARIOS if scenario[0] in names]
+    if mix == "read":
+        return [scenario for scenario in SCENARIOS if not scenario[3]]
+    if mix == "write":
+        return [scenario for scenario in SCENARIOS if scenario[3]]
+    return list(SCENARIOS)
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, elapsed, status):
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][status] += 1
+            if status == "exception" or status >= 400:
+                self.errors[name] += 1
+
+def run_worker(worker_index, base_url, scenarios, users_by_role, shops, cookie_name, cookies, recorder, deadline, seed, run_id):
+    rng = random.Random(seed * 1000 + worker_index)
+    weights = [scenario[1] for scenario in scenarios]
+    http = requests.Session()
+    while time.perf_counter() < deadline:
+        name, _weight, role, _write, build = rng.choices(scenarios, weights)[0]
+        user = rng.choice(users_by_role[role]) if role != "anonymous" else None
+        ctx = ScenarioContext(rng, user, shops, run_id)
+        method, path, kwargs = build(ctx)
+        http.cookies.clear()
+        if user is not None:
+            http.cookies.set(cookie_name, cookies[user["id"]])
+        started = time.perf_counter()
+        try:
+            response = http.request(method, base_url + path, timeout=30, **kwargs)
+            response.content
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = "exception"
+        if recorder is not None:
+            recorder.record(name, time.perf_counter() - started, status)
+
+def drive(base_url, scenarios, users_by_role, shops, cookie_name, cookies, concurrency, seconds, seed, run_id, recorder):
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=run_worker, name=f"loadtest-{index}",
+                         args=(index, base_url, scenarios, users_by_role, shops, cookie_name, cookies, recorder, deadline, seed, run_id))
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+# --- Raporlama ---
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def sql_statement_totals(api):
+    # /metrics çıktısındaki aracabak_request_sql_statements histogramının sum/count değerleri.
+    totals = {}
+    for line in api.metrics.render().splitlines():
+        for suffix in ("_sum", "_count"):
+            prefix = f"aracabak_request_sql_statements{suffix}{{"
+            if not line.startswith(prefix):
+                continue
+            labels, value = line[len(prefix):].rsplit("} ", 1)
+            parsed = dict(part.split("=", 1) for part in labels.split(","))
+            key = (parsed["endpoint"].strip('"'), parsed["method"].strip('"'))
+            totals.setdefault(key, [0.0, 0])[0 if suffix == "_sum" else 1] += float(value)
+    return totals
+
+def metric_total(api, name):
+    total = 0.0
+    for line in api.metrics.render().splitlines():
+        if line.startswith(name + " ") or line.startswith(name + "{"):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+def scenario_endpoints(api, base_url, scenarios, users_by_role, shops, run_id):
+    # Her senaryonun hangi Flask endpoint'ine düştüğü URL eşlemesinden bulunur.
+    adapter = api.app.url_map.bind("127.0.0.1")
+    rng = random.Random(0)
+    endpoints = {}
+    for name, _weight, role, _write, build in scenarios:
+        user = users_by_role[role][0] if role != "anonymous" else None
+        method, path, _kwargs = build(ScenarioContext(rng, user, shops, f"{run_id}-probe"))
+        endpoint, _args = adapter.match(urlparse(path).path, method=method)
+        endpoints[name] = (endpoint, method)
+    return endpoints
+
+def build_report(recorder, elapsed, endpoints, sql_before, sql_after):
+    report = {"elapsed_seconds": round(elapsed, 3), "scenarios": {}}
+    total_requests = 0
+    total_errors = 0
+    for name in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[name])
+        total_requests += len(values)
+        total_errors += recorder.errors[name]
+        endpoint = endpoints[name]
+        before = sql_before.get(endpoint, [0.0, 0])
+        after = sql_after.get(endpoint, [0.0, 0])
+        counted = after[1] - before[1]
+        report["scenarios"][name] = {
+            "endpoint": f"{endpoint[1]} {endpoint[0]}",
+            "requests": len(values),
+            "errors": recorder.errors[name],
+            "statuses": {str(status): count for status, count in sorted(recorder.statuses[name].items(), key=lambda item: str(item[0]))},
+            "throughput": round(len(values) / elapsed, 2),
+            **{key: round(percentile(values, fraction) * 1000, 2) for key, fraction in PERCENTILES},
+            "sql_per_request": round((after[0] - before[0]) / counted, 2) if counted else None,
+        }
+    report["requests"] = total_requests
+    report["errors"] = total_errors
+    report["throughput"] = round(total_requests / elapsed, 2) if elapsed else 0
+    return report
+
+def print_report(report, stubs, api):
+    header = f"{'senaryo':<20} {'istek':>7} {'hata':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/istek':>9}  endpoint"
+    print(header)
+    print("-" * len(header))
+    for name, row in report["scenarios"].items():
+        sql = "-" if row["sql_per_request"] is None else f"{row['sql_per_request']:.2f}"
+        print(f"{name:<20} {row['requests']:>7} {row['errors']:>5} {row['throughput']:>8.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {sql:>9}  {row['endpoint']}")
+    print("-" * len(header))
+    print(f"Toplam: {report['requests']} istek, {report['errors']} hata, {report['throughput']:.1f} istek/sn ({report['elapsed_seconds']} sn)")
+    # synchronous=FULL iken her commit bir WAL fsync'idir.
+    print(f"Commit: {report['commits']} ({report['commits_per_second']:.1f}/sn)")
+    if api.group_commit is not None:
+        print(f"Grup commit: {api.group_commit.stats()}")
+    print("Dış servis çağrıları: " + ", ".join(f"{name}={server.calls}" for name, server in stubs.items()))
+    print(f"DB okuma havuzu: {api.db_pool.stats()}")
+    print(f"DB yazıcı: {api.db_writer.stats()}")
+    print(f"Places önbelleği: {api.places_cache.stats()}")
+    print(f"İşletme puanları: {api.shop_reputation.stats()}")
+
+def legacy_dashboard_calls(api, fleet, fuel_months):
+    # /api/dashboard öncesi hesap sayfasının akışı: hesap ve talepler, ardından araç başına yakıt
+    # özeti ve bakım seçenekleri (2N+2 istek). Yakıt aralığı panelin varsayılan dönemiyle aynıdır.
+    end = date.today()
+    start = api.month_offset(end.replace(day=1), 1 - fuel_months)
+    calls = ["/api/account", "/api/requests?limit=200"]
+    for vehicle in fleet["vehicles"]:
+        calls.append(f"/api/vehicles/{vehicle['id']}/fuel_entries?start_date={start.isoformat()}&end_date={end.isoformat()}")
+        calls.append(f"/api/maintenance_options?fuel={vehicle['fuel']}&km={vehicle['km']}")
+    return calls
+
+def compare_dashboard(api, base_url, cookie_name, cookie, fleet, repeats):
+    # Aynı filo sahibi için panelin tek istekle ve eski N+1 akışla yüklenmesi sırayla ölçülür;
+    # SQL sayısı /metrics histogramından, gecikme tüm isteklerin bitmesine kadar geçen süredir.
+    http = requests.Session()
+    http.cookies.set(cookie_name, cookie)
+    result = {"vehicles": len(fleet["vehicles"]), "repeats": repeats}
+    flows = (("dashboard", [f"/api/dashboard?fuel_months={api.DASHBOARD_DEFAULT_FUEL_MONTHS}"]),
+             ("n_plus_one", legacy_dashboard_calls(api, fleet, api.DASHBOARD_DEFAULT_FUEL_MONTHS)))
+    for name, calls in flows:
+        latencies = []
+        sql_before = sum(total[0] for total in sql_statement_totals(api).values())
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for path in calls:
+                http.get(base_url + path, timeout=30).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        sql_after = sum(total[0] for total in sql_statement_totals(api).values())
+        latencies.sort()
+        result[name] = {
+            "http_requests": len(calls),
+            "sql_per_load": round((sql_after - sql_before) / repeats, 2),
+            **{key: round(percentile(latencies, fraction) * 1000, 2) for key, fraction in PERCENTILES},
+        }
+    return result
+
+def print_dashboard_comparison(comparison):
+    print(f"Araç paneli ({comparison['vehicles']} araç, {comparison['repeats']} yükleme):")
+    for name in ("dashboard", "n_plus_one"):
+        row = comparison[name]
+        print(f"  {name:<12} {row['http_requests']:>4} istek {row['sql_per_load']:>8.1f} SQL  p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms")
+
+def compare_with_baseline(report, baseline, tolerance, min_delta_ms, sql_tolerance):
+    regressions = []
+    if report["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput']:.1f} -> {report['throughput']:.1f} istek/sn")
+    for name, row in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if row["errors"]:
+            regressions.append(f"{name}: {row['errors']} hatalı yanıt {row['statuses']}")
+        if base is None:
+            continue
+        for key, fraction in PERCENTILES:
+            # Kuyrukta en az TAIL_MIN_SAMPLES ölçüm yoksa yüzdelik gürültüdür, karşılaştırılmaz.
+            if min(row["requests"], base["requests"]) * (1 - fraction) < TAIL_MIN_SAMPLES:
+                continue
+            if row[key] > base[key] * (1 + tolerance) and row[key] - base[key] > min_delta_ms:
+                regressions.append(f"{name}: {key} {base[key]:.2f} -> {row[key]:.2f}")
+        if row["sql_per_request"] is not None and base.get("sql_per_request") is not None:
+            limit = base["sql_per_request"] + max(sql_tolerance, base["sql_per_request"] * 0.05)
+            if row["sql_per_request"] > limit:
+                regressions.append(f"{name}: SQL/istek {base['sql_per_request']:.2f} -> {row['sql_per_request']:.2f}")
+    return regressions
+
+# --- Ortam Kurulumu ---
+def use_fakeredis():
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("fakeredis kurulu değil: pip install fakeredis ya da --redis-url ile yerel bir Redis verin.")
+    import redis
+    server = fakeredis.FakeServer()
+
+    def pool_from_url(cls, url, **kwargs):
+        for key in ('socket_connect_timeout', 'socket_timeout', 'health_check_interval'):
+            kwargs.pop(key, None)
+        return cls(connection_class=fakeredis.FakeConnection, server=server, **kwargs)
+
+    redis.BlockingConnectionPool.from_url = classmethod(pool_from_url)
+    redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=server)
+    redis.Redis.from_url = staticmethod(redis.from_url)
+
+def configure_environment(args, workdir, stubs):
+    os.environ.update({
+        "DATABASE_DIR": workdir,
+        "PLACES_DETAILS_URL": stubs["google_places"].url("/maps/api/place/details/json"),
+        "FUEL_PRICES_URL": stubs["apisepeti"].url("/wp-json/petrol/v1/fiyatlar"),
+        "BREVO_API_HOST": stubs["brevo"].url("/v3"),
+        "BREVO_API_KEY": "loadtest",
+        "GOOGLE_PLACES_API_KEY": "loadtest",
+        "FLASK_SECRET_KEY": "loadtest",
+        "METRICS_ENABLED": "1",
+        "METRICS_TOKEN": "loadtest",
+        "PROFILE_SAMPLE_RATE": "0",
+        "JOB_RETRY_BASE_SECONDS": "1",
+    })
+    if args.places_cache_ttl is not None:
+        os.environ["PLACES_CACHE_TTL"] = str(args.places_cache_ttl)
+        os.environ["PLACES_CACHE_STALE_TTL"] = "0"
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    else:
+        use_fakeredis()
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="aracabak API yük testi ve kıyaslama aracı")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="sentetik veri büyüklüğü")
+    parser.add_argument("--duration", type=float, default=30, help="ölçüm süresi (sn)")
+    parser.add_argument("--warmup", type=float, default=5, help="ölçüme katılmayan ısınma süresi (sn)")
+    parser.add_argument("--concurrency", type=int, default=8, help="eşzamanlı istemci sayısı")
+    parser.add_argument("--mix", choices=("mixed", "read", "write"), default="mixed", help="senaryo karışımı")
+    parser.add_argument("--only", help="yalnızca verilen senaryolar (virgülle)")
+    parser.add_argument("--sessions", type=int, default=200, help="rol başına oturum açılan kullanıcı sayısı")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--places-latency-ms", type=float, default=120)
+    parser.add_argument("--fuel-latency-ms", type=float, default=80)
+    parser.add_argument("--brevo-latency-ms", type=float, default=200)
+    parser.add_argument("--jitter", type=float, default=0.25, help="gecikme standart sapması (gecikmeye oranla)")
+    parser.add_argument("--places-cache-ttl", type=int, help="Places önbellek süresi; 0 her aramayı dış servise düşürür")
+    parser.add_argument("--redis-url", help="fakeredis yerine kullanılacak Redis (boş bir veritabanı seçin, örn. redis://127.0.0.1:6379/15)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="karşılaştırma için temel sonuç dosyası")
+    parser.add_argument("--save-baseline", action="store_true", help="sonuçları temel olarak kaydet, karşılaştırma yapma")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="throughput ve gecikme için izin verilen oransal sapma")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="bu farkın altındaki gecikme artışları gerileme sayılmaz")
+    parser.add_argument("--sql-tolerance", type=float, default=0.1, help="istek başına SQL için izin verilen mutlak artış")
+    parser.add_argument("--dashboard-fleet", type=int, default=50, help="araç paneli karşılaştırmasındaki filo büyüklüğü; 0 karşılaştırmayı kapatır")
+    parser.add_argument("--dashboard-repeats", type=int, default=20, help="araç paneli karşılaştırmasında akış başına yükleme sayısı")
+    parser.add_argument("--json", dest="json_path", help="sonuçları JSON olarak da yaz")
+    parser.add_argument("--keep-data", action="store_true", help="geçici veritabanı dizinini silme")
+    parser.add_argument("--verbose", action="store_true", help="uygulama loglarını göster")
+    return parser.parse_args(argv)
+
+def run_config(args):
+    return {
+        "scale": args.scale, "concurrency": args.concurrency, "duration": args.duration, "mix": args.mix, "only": args.only,
+        "places_latency_ms": args.places_latency_ms, "fuel_latency_ms": args.fuel_latency_ms, "brevo_latency_ms": args.brevo_latency_ms,
+        "places_cache_ttl": args.places_cache_ttl, "redis": "redis" if args.redis_url else "fakeredis",
+        "group_commit": os.getenv("DB_GROUP_COMMIT", "0"), "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL").upper(),
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="aracabak-loadtest-")
+    stubs = {
+        "google_places": start_stub(PlacesStubHandler, args.places_latency_ms, args.jitter),
+        "apisepeti": start_stub(FuelPricesStubHandler, args.fuel_latency_ms, args.jitter),
+        "brevo": start_stub(BrevoStubHandler, args.brevo_latency_ms, args.jitter),
+    }
+    write_reference_data(workdir)
+    configure_environment(args, workdir, stubs)
+    # main_api kendi basicConfig çağrısını yapmadan önce kök logger ayarlanır.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    import main_api as api
+    from werkzeug.serving import make_server
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    for limiter in api.app.extensions.get("limiter", ()):
+        limiter.enabled = False
+
+    rng = random.Random(args.seed)
+    scale = SCALES[args.scale]
+    started = time.perf_counter()
+    owners, shops = seed_database(api, scale, rng)
+    fleet = None
+    if args.dashboard_fleet > 0:
+        fleet = seed_fleet_owner(api, scale["owners"] + scale["shops"] + 1, args.dashboard_fleet, scale["fuel_entries_per_vehicle"],
+                                 shops, random.Random(args.seed + 2))
+    print(f"Veri hazırlandı: {len(owners)} araç sahibi, {len(shops)} servis, {time.perf_counter() - started:.1f} sn ({workdir})")
+    # Üretimde puanlar arka planda çoktan doldurulmuş olur; ölçüm bu kararlı durumdan başlar.
+    while api.shop_reputation.refresh(limit=len(shops)):
+        pass
+
+    # Teklif ve randevu senaryoları için yalnızca ikisine de sahip servisler oturum açar.
+    active_shops = [shop for shop in shops if shop["quoted_request_ids"] and shop["appointment_ids"]]
+    users_by_role = {
+        "owner": rng.sample(owners, min(args.sessions, len(owners))),
+        "business": rng.sample(active_shops, min(args.sessions, len(active_shops))),
+    }
+    cookie_name, cookies = session_cookies(api, users_by_role["owner"] + users_by_role["business"] + ([fleet] if fleet else []))
+    api.start_background_workers()
+
+    server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    scenarios = select_scenarios(args.mix, args.only)
+    run_id = f"{os.getpid()}{int(time.time())}"
+    endpoints = scenario_endpoints(api, base_url, scenarios, users_by_role, shops, run_id)
+
+    if args.warmup > 0:
+        drive(base_url, scenarios, users_by_role, shops, cookie_name, cookies, args.concurrency, args.warmup, args.seed + 1, run_id, None)
+    recorder = Recorder()
+    sql_before = sql_statement_totals(api)
+    commits_before = metric_total(api, "aracabak_sql_commits_total")
+    elapsed = drive(base_url, scenarios, users_by_role, shops, cookie_name, cookies, args.concurrency, args.duration, args.seed, run_id, recorder)
+    sql_after = sql_statement_totals(api)
+    commits = int(metric_total(api, "aracabak_sql_commits_total") - commits_before)
+    dashboard_comparison = None
+    if fleet is not None:
+        dashboard_comparison = compare_dashboard(api, base_url, cookie_name, cookies[fleet["id"]], fleet, args.dashboard_repeats)
+    server.shutdown()
+
+    report = build_report(recorder, elapsed, endpoints, sql_before, sql_after)
+    report["commits"] = commits
+    report["commits_per_second"] = round(commits / elapsed, 2)
+    report["config"] = run_config(args)
+    report["created_at"] = datetime.now().isoformat(timespec='seconds')
+    print_report(report, stubs, api)
+    if dashboard_comparison is not None:
+        report["dashboard_comparison"] = dashboard_comparison
+        print_dashboard_comparison(dashboard_comparison)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if not args.keep_data:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Temel sonuçlar kaydedildi: {args.baseline}")
+        return 1 if report["errors"] else 0
+    if not os.path.exists(args.baseline):
+        print(f"Temel sonuç dosyası yok ({args.baseline}); karşılaştırma yapılmadı. --save-baseline ile oluşturun.")
+        return 1 if report["errors"] else 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("config") != report["config"]:
+        print(f"Temel sonuç farklı ayarlarla alınmış, karşılaştırılamaz: {baseline.get('config')}")
+        return 2
+    regressions = compare_with_baseline(report, baseline, args.tolerance, args.min_delta_ms, args.sql_tolerance)
+    if regressions:
+        print("GERİLEME:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"Temel sonuçlarla karşılaştırıldı ({baseline.get('created_at')}): gerileme yok.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
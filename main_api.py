@@ -1,16 +1,43 @@
 import os
+import sys
 import sqlite3
 import logging
 import re
+import io
+import csv
 import json
 import math
+import functools
+import hashlib
+import hmac
+import calendar
+import base64
+import binascii
+import bisect
+import mmap
+import fcntl
+import struct
+import zlib
+import gzip
+import time
+import threading
+import queue
 import traceback
-from flask import Flask, jsonify, request, session
-from flask_session import Session
+import random
+import contextlib
+import tempfile
+import cProfile
+import pstats
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from urllib.request import pathname2url
+from flask import Flask, Response, g, has_request_context, jsonify, request, session
+from flask.sessions import SecureCookieSessionInterface
+from flask_session.redis import RedisSessionInterface
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import redis
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from dotenv import load_dotenv
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
@@ -18,6 +45,10 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import requests
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # --- Yapılandırma ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(funcName)s] - %(message)s')
@@ -26,167 +57,1532 @@ load_dotenv(dotenv_path=dotenv_path)
 
 # --- Değişkenler ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, '..', '..', 'database', 'aracabak.db')
-VEHICLE_DATA_PATH = os.path.join(BASE_DIR, '..', '..', 'database', 'tum_data.json')
-DIZEL_MAINTENANCE_PATH = os.path.join(BASE_DIR, '..', '..', 'database', 'dizel_bakim_parcalari.json')
-BENZIN_MAINTENANCE_PATH = os.path.join(BASE_DIR, '..', '..', 'database', 'benzin_bakim_parcalari.json')
-CITIES_DATA_PATH = os.path.join(BASE_DIR, '..', '..', 'database', 'sehirler.json')
+DATABASE_DIR = os.getenv("DATABASE_DIR", os.path.join(BASE_DIR, '..', '..', 'database'))
+DATABASE_PATH = os.path.join(DATABASE_DIR, 'aracabak.db')
+VEHICLE_DATA_PATH = os.path.join(DATABASE_DIR, 'tum_data.json')
+DIZEL_MAINTENANCE_PATH = os.path.join(DATABASE_DIR, 'dizel_bakim_parcalari.json')
+BENZIN_MAINTENANCE_PATH = os.path.join(DATABASE_DIR, 'benzin_bakim_parcalari.json')
+CITIES_DATA_PATH = os.path.join(DATABASE_DIR, 'sehirler.json')
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 BREVO_API_KEY = os.getenv("BREVO_API_KEY", "").strip()
-all_vehicle_data = []
+BREVO_API_HOST = os.getenv("BREVO_API_HOST")
+PLACES_DETAILS_URL = os.getenv("PLACES_DETAILS_URL", "https://maps.googleapis.com/maps/api/place/details/json")
+FUEL_PRICES_URL = os.getenv("FUEL_PRICES_URL", "https://apisepeti.com/wp-json/petrol/v1/fiyatlar")
+FUEL_PRICES_REFRESH_INTERVAL = int(os.getenv("FUEL_PRICES_REFRESH_INTERVAL", 1800))
+FUEL_PRICES_REDIS_KEY = "fuel_prices:snapshot"
+FUEL_PRICES_COLD_START_WAIT = 10
+PLACES_CACHE_TTL = int(os.getenv("PLACES_CACHE_TTL", 6 * 3600))
+PLACES_CACHE_STALE_TTL = int(os.getenv("PLACES_CACHE_STALE_TTL", 7 * 24 * 3600))
+PLACES_CACHE_LRU_SIZE = int(os.getenv("PLACES_CACHE_LRU_SIZE", 2048))
+PLACES_CACHE_NEGATIVE_TTL = int(os.getenv("PLACES_CACHE_NEGATIVE_TTL", 60))
+PLACES_MAX_WORKERS = int(os.getenv("PLACES_MAX_WORKERS", 8))
+PLACES_ENRICH_DEADLINE = float(os.getenv("PLACES_ENRICH_DEADLINE", 3.0))
+CATALOGUE_PATH = os.path.join(DATABASE_DIR, 'tum_data.cat')
+CATALOGUE_CHECK_INTERVAL = float(os.getenv("CATALOGUE_CHECK_INTERVAL", 5))
+STATIC_CACHE_MAX_AGE = int(os.getenv("STATIC_CACHE_MAX_AGE", 24 * 3600))
+STATIC_COMPRESS_MIN_SIZE = 256
+MAINTENANCE_BATCH_LIMIT = 100
+LISTING_DEFAULT_LIMIT = 50
+LISTING_MAX_LIMIT = 200
+SHOP_SEARCH_DEFAULT_RADIUS_KM = float(os.getenv("SHOP_SEARCH_DEFAULT_RADIUS_KM", 25))
+SHOP_SEARCH_MAX_RADIUS_KM = 200
+SHOP_SEARCH_DEFAULT_LIMIT = 20
+SHOP_SEARCH_MAX_LIMIT = 50
+EARTH_RADIUS_KM = 6371.0088
+SHOP_REPUTATION_FIELDS = "name,rating,user_ratings_total,reviews,formatted_phone_number,url"
+SHOP_REPUTATION_REFRESH_INTERVAL = int(os.getenv("SHOP_REPUTATION_REFRESH_INTERVAL", 60))
+SHOP_REPUTATION_BATCH_SIZE = int(os.getenv("SHOP_REPUTATION_BATCH_SIZE", 20))
+SHOP_REPUTATION_MAX_AGE = int(os.getenv("SHOP_REPUTATION_MAX_AGE", 24 * 3600))
+SHOP_REPUTATION_RETRY_SECONDS = 1800
+SHOP_REPUTATION_FETCH_TIMEOUT = 15
+SHOP_REPUTATION_REDIS_LOCK = "shop_reputation:lock"
+FUEL_ENTRIES_DEFAULT_LIMIT = 100
+FUEL_ENTRIES_MAX_LIMIT = 500
+FUEL_IMPORT_CHUNK_SIZE = 1000
+FUEL_IMPORT_MAX_ROWS = int(os.getenv("FUEL_IMPORT_MAX_ROWS", 100000))
+FUEL_IMPORT_MAX_ERRORS = 50
+FUEL_EXPORT_BATCH_SIZE = 500
+DASHBOARD_DEFAULT_FUEL_MONTHS = 12
+DASHBOARD_MAX_FUEL_MONTHS = 120
+INSPECTION_WARNING_DAYS = 90
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", 1))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 6))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", 30))
+JOB_LEASE_SECONDS = 300
+JOB_POLL_INTERVAL = 5
+EVENTS_CHANNEL_PREFIX = "events:user:"
+SSE_KEEPALIVE_INTERVAL = 20
+SSE_MAX_STREAM_SECONDS = int(os.getenv("SSE_MAX_STREAM_SECONDS", 3600))
+SSE_RETRY_MS = 5000
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 32))
+SSE_MAX_STREAMS_PER_USER = int(os.getenv("SSE_MAX_STREAMS_PER_USER", 3))
+CHANGE_VERSION_PREFIX = "changes:user:"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", 5))
+DB_WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", 32))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+DB_GROUP_COMMIT_WINDOW = float(os.getenv("DB_GROUP_COMMIT_WINDOW_MS", 2)) / 1000
+DB_GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", 64))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 16384))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 64))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 2))
+REDIS_RETRY_INTERVAL = float(os.getenv("REDIS_RETRY_INTERVAL", 5))
+SESSION_LOCAL_CACHE_TTL = float(os.getenv("SESSION_LOCAL_CACHE_TTL", 5))
+SESSION_LOCAL_CACHE_SIZE = int(os.getenv("SESSION_LOCAL_CACHE_SIZE", 10000))
+SESSION_REFRESH_INTERVAL = int(os.getenv("SESSION_REFRESH_INTERVAL", 24 * 3600))
+SESSION_INVALIDATION_CHANNEL = "session:invalidate"
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), 'aracabak_profiles'))
+PROFILE_KEEP_FILES = 50
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# --- Ölçümler ve Profil ---
+# METRICS_ENABLED=1 ile açılır; kapalıyken hiçbir kanca ya da trace callback kurulmaz.
+# Ölçümler süreç içinde tutulur ve /metrics ucundan Prometheus metin biçiminde okunur; birden
+# fazla worker varsa her worker kendi değerlerini döndürür. cProfile örnekleri PROFILE_DIR'e
+# .prof olarak yazılır.
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(histogram["buckets"], value)
+            if index < len(histogram["buckets"]):
+                histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ''
+        escaped = []
+        for key, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self, gauges=()):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(value, counts=list(value["counts"]))) for key, value in self._histograms.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram['count']}")
+        for name, value in gauges:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+SQL_STATEMENT_PATTERN = re.compile(r"^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+))?", re.IGNORECASE | re.DOTALL)
+
+def statement_label(sql):
+    # Etiket sayısı sınırlı kalsın diye sorgu metni yerine "komut tablo" kullanılır.
+    match = SQL_STATEMENT_PATTERN.match(sql)
+    if not match:
+        return "other"
+    return f"{match.group(1).upper()} {match.group(2) or ''}".strip()
+
+def metrics_endpoint():
+    if not has_request_context():
+        return "background"
+    return request.endpoint or "unmatched"
+
+def add_request_total(key, value):
+    if has_request_context() and 'metrics_totals' in g:
+        g.metrics_totals[key] += value
+
+def count_sql_statement(sql):
+    add_request_total("sql_statements", 1)
+    metrics.inc("aracabak_sql_statements_total", {"endpoint": metrics_endpoint()})
+    if sql == "COMMIT":
+        # synchronous=FULL iken her commit bir WAL fsync'idir.
+        metrics.inc("aracabak_sql_commits_total", {})
+
+class TimedConnection(sqlite3.Connection):
+    # execute ilk satır hazır olana kadar geçen süreyi ölçer; sonraki fetch süresi dahil değildir.
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            self._observe(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            self._observe(sql, time.perf_counter() - started)
+
+    @staticmethod
+    def _observe(sql, elapsed):
+        add_request_total("sql_seconds", elapsed)
+        metrics.observe("aracabak_sql_query_duration_seconds", {"statement": statement_label(sql)}, elapsed)
+
+class TimedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            elapsed = time.perf_counter() - started
+            add_request_total("redis_seconds", elapsed)
+            metrics.observe("aracabak_redis_command_duration_seconds", {"command": str(args[0]).upper()}, elapsed)
+
+@contextlib.contextmanager
+def outbound_timer(service):
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        add_request_total("outbound_seconds", elapsed)
+        metrics.observe("aracabak_outbound_request_duration_seconds", {"service": service}, elapsed)
+
+class RequestProfiler:
+    # cProfile aynı anda tek istekte çalışır; örnek seçilen istek meşgulse atlanır.
+    def __init__(self, directory, sample_rate, keep_files):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep_files = keep_files
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._armed = 0
+        self._armed_endpoint = None
+
+    def arm(self, count, endpoint=None):
+        with self._lock:
+            self._armed = count
+            self._armed_endpoint = endpoint
+
+    def _should_sample(self, endpoint):
+        with self._lock:
+            if self._armed > 0 and self._armed_endpoint in (None, endpoint):
+                self._armed -= 1
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, endpoint):
+        if not self._should_sample(endpoint) or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, profiler, endpoint):
+        try:
+            profiler.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{endpoint}-{int(time.time() * 1000)}-{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            for old in self.dumps()[self.keep_files:]:
+                os.remove(os.path.join(self.directory, old["name"]))
+        except OSError as e:
+            logging.warning(f"Profil kaydedilemedi: {e}")
+        finally:
+            self._busy.release()
+
+    def dumps(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.prof')]
+        except FileNotFoundError:
+            return []
+        entries = [{"name": name, "size": os.path.getsize(os.path.join(self.directory, name))} for name in names]
+        return sorted(entries, key=lambda entry: entry["name"].rsplit('-', 2)[-2], reverse=True)
+
+    def summary(self, name, limit=40):
+        path = os.path.join(self.directory, os.path.basename(name))
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+request_profiler = RequestProfiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_KEEP_FILES)
+
+# --- Redis Bağlantı Havuzu ---
+# Oturumlar, rate limiter ve tüm önbellekler tek bir bağlantı havuzunu paylaşır. Havuz doluysa
+# istek REDIS_POOL_TIMEOUT kadar boş bağlantı bekler, yeni soket açmaz. Redis'e bağlanılamazsa
+# havuz REDIS_RETRY_INTERVAL boyunca bağlantı denemeden hata verir ve uygulama o süre yedek kipte
+# çalışır: oturumlar imzalı çerezde, limiter bellekte tutulur, önbellekler atlanır. Süre dolunca
+# ilk istek yeniden bağlanmayı dener; Redis döndüyse her şey kendiliğinden Redis'e geri geçer.
+# Canlı olay akışları (pub/sub) bir bağlantıyı saatlerce tuttuğundan ayrı bir havuz kullanır.
+class RedisPoolQueue(queue.LifoQueue):
+    # Boş bağlantı beklerken süre dolduğunda bunu çağıran iş parçacığına işaretler; havuzun
+    # tükenmesi redis-py'nin hata metnine bakılmadan bağlantı hatasından ayrılır.
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.timed_out = threading.local()
+
+    def get(self, block=True, timeout=None):
+        self.timed_out.value = False
+        try:
+            return super().get(block, timeout)
+        except queue.Empty:
+            self.timed_out.value = True
+            raise
+
+class InstrumentedRedisPool(redis.BlockingConnectionPool):
+    def __init__(self, *args, retry_interval=REDIS_RETRY_INTERVAL, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._stats = {"acquired": 0, "in_use": 0, "peak_in_use": 0, "errors": 0, "exhausted": 0, "outages": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+        # Yalnızca get_connection'ın verdiği bağlantılar sayılır; redis-py'nin bağlantı kurulamayınca
+        # kendi içinde yaptığı release çağrısı in_use'u düşürmez.
+        self._handed_out = set()
+        self.retry_interval = retry_interval
+        self._down = False
+        self._down_until = 0.0
+        super().__init__(*args, queue_class=RedisPoolQueue, **kwargs)
+
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self, error):
+        with self._stats_lock:
+            self._down_until = time.monotonic() + self.retry_interval
+            if self._down:
+                return
+            self._down = True
+            self._stats["outages"] += 1
+        logging.warning(f"Redis'e bağlanılamadı, {self.retry_interval:g} sn sonra yeniden denenecek; bu arada yedek kipte çalışılıyor: {error}")
+
+    def _mark_up(self):
+        with self._stats_lock:
+            if not self._down:
+                return
+            self._down = False
+        logging.info("Redis bağlantısı yeniden kuruldu.")
+
+    def reset(self):
+        super().reset()
+        # fork sonrası havuz yeniden kurulur; çocuk süreç ebeveynin bağlantılarını saymaz.
+        with self._stats_lock:
+            self._handed_out.clear()
+            self._stats["in_use"] = 0
+
+    def get_connection(self, *args, **kwargs):
+        if not self.available():
+            raise redis.exceptions.ConnectionError("Redis geçici olarak devre dışı.")
+        started = time.monotonic()
+        pool_queue = self.pool
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except redis.exceptions.RedisError as e:
+            exhausted = getattr(pool_queue.timed_out, 'value', False)
+            with self._stats_lock:
+                self._stats["exhausted" if exhausted else "errors"] += 1
+            # Havuzda boş bağlantı kalmaması Redis'in ayakta olduğunu gösterir; yalnızca bağlantı
+            # kurulamadığında yedek kipe geçilir.
+            if not exhausted and isinstance(e, (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)):
+                self._mark_down(e)
+            raise
+        self._mark_up()
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            self._handed_out.add(id(connection))
+            self._stats["acquired"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return connection
+
+    def release(self, connection):
+        # Sayım bağlantı havuza dönmeden yapılır; aksi halde başka bir iş parçacığı aynı
+        # bağlantıyı alıp kaydettikten sonra kaydı silinebilir.
+        with self._stats_lock:
+            if id(connection) in self._handed_out:
+                self._handed_out.remove(id(connection))
+                self._stats["in_use"] -= 1
+        super().release(connection)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["max_connections"] = self.max_connections
+        stats["created"] = len(self._connections)
+        stats["fallback"] = not self.available()
+        return stats
+
+redis_pool = InstrumentedRedisPool.from_url(
+    REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT,
+    socket_connect_timeout=2, socket_timeout=5, health_check_interval=30
+)
+redis_client = (TimedRedis if METRICS_ENABLED else redis.Redis)(connection_pool=redis_pool)
+# Akış sayısı SSE_MAX_STREAMS ile sınırlı olduğundan bu havuz hiçbir akışı bekletmez;
+# fazladan bir bağlantı oturum geçersizleştirme dinleyicisine aittir.
+pubsub_pool = InstrumentedRedisPool.from_url(
+    REDIS_URL, max_connections=SSE_MAX_STREAMS + 1, timeout=REDIS_POOL_TIMEOUT,
+    socket_connect_timeout=2, health_check_interval=30
+)
+pubsub_client = redis.Redis(connection_pool=pubsub_pool)
+try:
+    redis_client.ping()
+except redis.exceptions.RedisError:
+    # Havuz yedek kipe geçip uyarıyı kendisi loglar; sonraki denemeler istek yolunda yapılır.
+    pass
 
 # --- Flask Uygulaması ve Oturum Yapılandırması ---
+# Oturum Redis'te kısa anahtarlı JSON olarak tutulur ve çözülmüş hali süreç içinde
+# SESSION_LOCAL_CACHE_TTL saniye saklanır; ardışık istekler Redis'e hiç gitmez. Oturum yalnızca
+# değiştiğinde ya da son yenilemenin üzerinden SESSION_REFRESH_INTERVAL geçtiğinde yazılır.
+# Oturum yazıldığında ya da silindiğinde SESSION_INVALIDATION_CHANNEL'a yayın yapılır; her worker'daki
+# dinleyici kendi kopyasını düşürür. Dinleyici abone değilken (başlangıç, Redis kesintisi) yerel
+# kopya kullanılmaz, böylece kaçırılan bir yayın yüzünden çıkış yapılmış oturum geçerli kalmaz.
+class CompactRedisSessionInterface(RedisSessionInterface):
+    FIELD_ALIASES = {"user_id": "u", "user_type": "t", "email": "e", "name": "n", "_permanent": "p", "_refreshed": "r"}
+    FIELD_NAMES = {alias: field for field, alias in FIELD_ALIASES.items()}
+
+    def __init__(self, app, client, pool, pubsub_client, local_ttl, local_size, refresh_interval, **kwargs):
+        super().__init__(app, client, **kwargs)
+        self.pool = pool
+        self.pubsub_client = pubsub_client
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.refresh_interval = refresh_interval
+        self.cookie_fallback = SecureCookieSessionInterface()
+        self._reset_local_state()
+        os.register_at_fork(after_in_child=self._reset_local_state)
+
+    def _reset_local_state(self):
+        # Fork sonrası çocuk süreç kendi dinleyicisini başlatır; üst sürecin kopyaları taşınmaz.
+        self._local = OrderedDict()
+        self._local_lock = threading.Lock()
+        self._listener = None
+        self._subscribed = threading.Event()
+        self._origin = os.urandom(8).hex()
+
+    def _ensure_listener(self):
+        with self._local_lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="session-invalidation", daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            pubsub = self.pubsub_client.pubsub()
+            try:
+                pubsub.subscribe(SESSION_INVALIDATION_CHANNEL)
+                while not self._subscribed.is_set():
+                    message = pubsub.get_message(timeout=SSE_KEEPALIVE_INTERVAL)
+                    if message is not None and message['type'] == 'subscribe':
+                        self._subscribed.set()
+                while True:
+                    message = pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_INTERVAL)
+                    if message is not None:
+                        origin, _, store_id = message['data'].decode('utf-8').partition(' ')
+                        if origin != self._origin:
+                            with self._local_lock:
+                                self._local.pop(store_id, None)
+            except redis.exceptions.RedisError as e:
+                logging.warning(f"Oturum geçersizleştirme aboneliği kesildi, yerel oturum önbelleği devre dışı: {e}")
+            finally:
+                self._subscribed.clear()
+                with self._local_lock:
+                    self._local.clear()
+                pubsub.close()
+            time.sleep(REDIS_RETRY_INTERVAL)
+
+    def _publish_invalidation(self, store_id):
+        self.client.publish(SESSION_INVALIDATION_CHANNEL, f"{self._origin} {store_id}")
+
+    def _encode(self, data):
+        return json.dumps({self.FIELD_ALIASES.get(key, key): value for key, value in data.items()}, separators=(',', ':'))
+
+    def _decode(self, raw):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            # Eski Flask-Session (msgpack) kayıtları okunur, ilk yazmada yeni biçime geçer.
+            return self.serializer.decode(raw)
+        return {self.FIELD_NAMES.get(key, key): value for key, value in payload.items()}
+
+    def _cache_put(self, store_id, data):
+        if not self._subscribed.is_set():
+            return
+        with self._local_lock:
+            self._local[store_id] = (time.monotonic() + self.local_ttl, data)
+            self._local.move_to_end(store_id)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _cache_get(self, store_id):
+        if not self._subscribed.is_set():
+            return None
+        with self._local_lock:
+            cached = self._local.get(store_id)
+            if cached is None:
+                return None
+            if cached[0] < time.monotonic():
+                del self._local[store_id]
+                return None
+            return dict(cached[1])
+
+    def _retrieve_session_data(self, store_id):
+        self._ensure_listener()
+        data = self._cache_get(store_id)
+        if data is not None:
+            return data
+        raw = self.client.get(store_id)
+        if not raw:
+            return None
+        data = self._decode(raw)
+        self._cache_put(store_id, data)
+        return dict(data)
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        data = dict(session, _refreshed=int(time.time()))
+        self.client.set(store_id, self._encode(data), ex=int(session_lifetime.total_seconds()))
+        self._publish_invalidation(store_id)
+        self._cache_put(store_id, data)
+
+    def _delete_session(self, store_id):
+        with self._local_lock:
+            self._local.pop(store_id, None)
+        self.client.delete(store_id)
+        self._publish_invalidation(store_id)
+
+    def _refresh_due(self, session):
+        # dict.get, oturumu "erişildi" olarak işaretlemeden okur.
+        return time.time() - (dict.get(session, '_refreshed') or 0) >= self.refresh_interval
+
+    def should_set_storage(self, app, session):
+        return session.modified or self._refresh_due(session)
+
+    def should_set_cookie(self, app, session):
+        return session.modified or (session.permanent and self._refresh_due(session))
+
+    # Redis'e ulaşılamayan isteklerde oturum imzalı çerezde taşınır. Redis dönünce çerezdeki oturum
+    # ilk istekte Redis'e aktarılır ve çerez yeniden oturum kimliğine döner.
+    def open_session(self, app, request):
+        if self.pool.available():
+            try:
+                session = super().open_session(app, request)
+            except redis.exceptions.RedisError as e:
+                logging.warning(f"Oturum Redis'ten okunamadı, çerez oturumu kullanılıyor: {e}")
+            else:
+                if not session and request.cookies.get(self.get_cookie_name(app)):
+                    carried = self.cookie_fallback.open_session(app, request)
+                    if carried:
+                        session.update(carried)
+                return session
+        return self.cookie_fallback.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if isinstance(session, self.session_class) and self.pool.available():
+            try:
+                return super().save_session(app, session, response)
+            except redis.exceptions.RedisError as e:
+                logging.warning(f"Oturum Redis'e yazılamadı, çerez oturumu kullanılıyor: {e}")
+        self.cookie_fallback.save_session(app, session, response)
+
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", os.urandom(24))
-app.config["SESSION_TYPE"] = "redis"
 app.config["SESSION_PERMANENT"] = True
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
 app.config["SESSION_USE_SIGNER"] = True
-app.config["SESSION_REDIS"] = redis.from_url("redis://127.0.0.1:6379")
-
-Session(app)
+app.session_interface = CompactRedisSessionInterface(
+    app, redis_client, redis_pool, pubsub_client, SESSION_LOCAL_CACHE_TTL, SESSION_LOCAL_CACHE_SIZE, SESSION_REFRESH_INTERVAL,
+    key_prefix=app.config.get("SESSION_KEY_PREFIX", "session:"), use_signer=app.config["SESSION_USE_SIGNER"],
+    permanent=app.config["SESSION_PERMANENT"]
+)
 
 # --- Rate Limiter ---
+# Redis geçici olarak düşerse limiter kendiliğinden bellek içi sayaçlara geçer.
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=REDIS_URL,
+    storage_options={"connection_pool": redis_pool},
+    in_memory_fallback_enabled=True
 )
-try:
-    redis_client = redis.from_url("redis://127.0.0.1:6379")
-    redis_client.ping()
-    app.config["RATELIMIT_STORAGE_URI"] = "redis://127.0.0.1:6379"
-    limiter = Limiter(get_remote_address, app=app, storage_uri="redis://127.0.0.1:6379")
-    logging.info("Rate limiter Redis ile başarıyla yapılandırıldı.")
-except (redis.exceptions.ConnectionError, Exception) as e:
-    logging.warning(f"Redis'e bağlanılamadı, rate limiter bellek üzerinde çalışacak: {e}")
 
 
 # --- Helper Fonksiyonlar ve Veritabanı ---
+class DatabaseBusyError(Exception):
+    pass
+
+def database_busy(message):
+    # İstek içindeyse işaretlenir ki uç kendi try bloğunda yakalasa bile yanıt 503 olsun.
+    if has_request_context():
+        g.database_busy = True
+    return DatabaseBusyError(message)
+
+def distance_km(lat1, lng1, lat2, lng2):
+    # Haversine; SQL içinden distance_km(...) olarak çağrılır.
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class SQLiteConnectionPool:
+    # Bağlantılar LIFO sırayla tekrar kullanılır; böylece sayfa ve ifade önbelleği sıcak kalır.
+    # read_only havuz mode=ro URI ile açılır. max_waiters verilirse bekleme kuyruğu sınırlıdır;
+    # kuyruk doluyken istek beklemeden reddedilir.
+    def __init__(self, path, max_size, timeout, read_only=False, max_waiters=None):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.read_only = read_only
+        self.max_waiters = max_waiters
+        self._idle = []
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._inherited = []
+        self._stats = {"acquired": 0, "waits": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "timeouts": 0, "rejected": 0}
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # SQLite bağlantısı fork'tan sonra çocuk süreçte kullanılamaz (gunicorn --preload). Çocuk
+        # boş bir havuzla başlar; ebeveynden kalan bağlantılar kapatılmaz, çünkü kapatmak
+        # ebeveynin kilitlerine ve WAL dosyasına dokunabilir. Yalnızca çöp toplanmasınlar diye tutulur.
+        self._inherited.extend(self._idle)
+        self._idle = []
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+
+    def connect(self):
+        # Havuzla aynı ayarlarla açılan bağlantı; acquire dışında çağrılırsa havuza ait değildir.
+        target = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro" if self.read_only else self.path
+        if METRICS_ENABLED:
+            conn = sqlite3.connect(target, timeout=self.timeout, check_same_thread=False, uri=self.read_only, factory=TimedConnection)
+            conn.set_trace_callback(count_sql_statement)
+        else:
+            conn = sqlite3.connect(target, timeout=self.timeout, check_same_thread=False, uri=self.read_only)
+        conn.row_factory = sqlite3.Row
+        if self.read_only:
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS if DB_SYNCHRONOUS in ('OFF', 'NORMAL', 'FULL', 'EXTRA') else 'NORMAL'}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.create_function("distance_km", 4, distance_km, deterministic=True)
+        return conn
+
+    def acquire(self):
+        started = time.monotonic()
+        waiter = None
+        with self._lock:
+            if self._idle and not self._waiters:
+                conn = self._idle.pop()
+            elif self._created < self.max_size:
+                self._created += 1
+                conn = None
+            elif self.max_waiters is not None and len(self._waiters) >= self.max_waiters:
+                self._stats["rejected"] += 1
+                raise database_busy("Veritabanı yazma kuyruğu dolu.")
+            else:
+                waiter = [threading.Event(), None]
+                self._waiters.append(waiter)
+        if waiter is not None:
+            conn = self._wait(waiter, started)
+        with self._lock:
+            self._in_use += 1
+            self._stats["acquired"] += 1
+        if conn is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                self._discard()
+                raise
+        return conn
+
+    def _wait(self, waiter, started):
+        # Bekleyenler FIFO sırayla hizmet alır: bırakılan bağlantı sıradakine doğrudan verilir,
+        # yeni gelen istek araya giremez. None, bekleyenin yeni bağlantı açacağı anlamına gelir.
+        waiter[0].wait(self.timeout)
+        with self._lock:
+            if not waiter[0].is_set():
+                self._waiters.remove(waiter)
+                self._stats["timeouts"] += 1
+                raise database_busy("Veritabanı bağlantı havuzu dolu.")
+            wait_seconds = time.monotonic() - started
+            self._stats["waits"] += 1
+            self._stats["wait_seconds_total"] += wait_seconds
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait_seconds)
+        return waiter[1]
+
+    def _hand_off(self, conn):
+        if not self._waiters:
+            return False
+        waiter = self._waiters.popleft()
+        waiter[1] = conn
+        waiter[0].set()
+        return True
+
+    def _discard(self):
+        with self._lock:
+            self._in_use -= 1
+            if not self._hand_off(None):
+                self._created -= 1
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logging.warning(f"Havuza dönen bağlantı geri alınamadı, kapatılıyor: {e}")
+            conn.close()
+            self._discard()
+            return
+        with self._lock:
+            self._in_use -= 1
+            if not self._hand_off(conn):
+                self._idle.append(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"max_size": self.max_size, "size": self._created, "in_use": self._in_use, "idle": len(self._idle), "waiting": len(self._waiters)})
+        return stats
+
+# Okumalar salt okunur (mode=ro) bağlantı havuzundan yapılır; yazmalar süreç başına tek yazıcı
+# bağlantıdan sırayla geçer. Yazıcı ilk yazma ifadesinde alınır ve commit/rollback ile hemen
+# bırakılır, yani yalnızca transaction süresince tutulur. Süreç içindeki yazmalar SQLite
+# kilidinde değil bu kuyrukta bekler; kuyruk doluysa 503 döner. Süreçler arası çakışmada
+# busy_timeout (timeout) geçerlidir. WAL sayesinde okuyucular yazıcıyı beklemez.
+db_pool = SQLiteConnectionPool(DATABASE_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, read_only=True)
+db_writer = SQLiteConnectionPool(DATABASE_PATH, 1, DB_WRITE_TIMEOUT, max_waiters=DB_WRITE_QUEUE_SIZE)
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+READ_STATEMENTS = frozenset(('SELECT', 'EXPLAIN'))
+
+def is_read_statement(sql):
+    return sql.lstrip().split(None, 1)[0].upper() in READ_STATEMENTS
+
+class RoutedCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = None
+
+    def execute(self, sql, parameters=()):
+        self._cursor = self._conn.execute(sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._cursor = self._conn.executemany(sql, seq_of_parameters)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class RoutedConnection:
+    # Yazan isteklerin bağlantısı. Transaction dışındaki okumalar okuyucuya gider; ilk yazma
+    # ifadesiyle yazıcı alınır ve commit/rollback'e kadar tüm ifadeler (okumalar dahil) yazıcıda
+    # çalışır, böylece transaction kendi yazdığını görür.
+    def __init__(self):
+        self._reader = None
+        self._writer = None
+
+    def _target(self, sql):
+        if self._writer is None and not is_read_statement(sql):
+            self._writer = db_writer.acquire()
+        if self._writer is not None:
+            return self._writer
+        if self._reader is None:
+            self._reader = db_pool.acquire()
+        return self._reader
+
+    def execute(self, sql, parameters=()):
+        return self._target(sql).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._target(sql).executemany(sql, seq_of_parameters)
+
+    def cursor(self):
+        return RoutedCursor(self)
+
+    @property
+    def in_transaction(self):
+        return self._writer is not None and self._writer.in_transaction
+
+    def _release_writer(self):
+        writer, self._writer = self._writer, None
+        db_writer.release(writer)
+
+    def commit(self):
+        if self._writer is None:
+            return
+        try:
+            self._writer.commit()
+        finally:
+            self._release_writer()
+
+    def rollback(self):
+        if self._writer is not None:
+            self._release_writer()
+
+    def close(self):
+        if self._writer is not None:
+            self._release_writer()
+        if self._reader is not None:
+            reader, self._reader = self._reader, None
+            db_pool.release(reader)
+
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # İstek boyunca tek bağlantı kullanılır, teardown'da havuza geri verilir. İstek dışında
+    # (başlangıç göçleri, CLI komutları) doğrudan yazıcı bağlantı kullanılır.
+    if 'db_conn' not in g:
+        if not has_request_context():
+            g.db_conn_pool = db_writer
+        elif request.method in READ_METHODS:
+            g.db_conn_pool = db_pool
+        else:
+            g.db_conn_pool = None
+        g.db_conn = g.db_conn_pool.acquire() if g.db_conn_pool else RoutedConnection()
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    conn = g.pop('db_conn', None)
+    pool = g.pop('db_conn_pool', None)
+    if conn is None:
+        return
+    if pool is None:
+        conn.close()
+    else:
+        pool.release(conn)
+
+# --- Grup Commit ---
+# DB_GROUP_COMMIT=1 iken tek ifadelik küçük yazmalar (vergi durumu, yakıt girişi, randevu tarihi)
+# yazıcı thread'ine kuyruklanır. Thread ilk birimden sonra DB_GROUP_COMMIT_WINDOW_MS kadar gelen
+# birimleri toplar ve hepsini tek transaction'da, geliş sırasıyla çalıştırır; böylece commit
+# (synchronous=FULL iken fsync) sayısı birim başına değil grup başına olur. Her birim kendi
+# SAVEPOINT'inde çalışır: hata veren birim yalnızca kendi değişikliğini geri alır ve hatası
+# yalnızca kendi çağıranına döner. Sonuçlar commit başarılı olduktan sonra bildirilir.
+class GroupCommitWriter:
+    def __init__(self, window, max_batch, queue_size):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._stats = {"batches": 0, "units": 0, "failed_units": 0, "failed_batches": 0, "largest_batch": 0}
+
+    def start(self):
+        # Gunicorn fork'undan sonra her süreç kendi yazıcı thread'ini başlatır.
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            threading.Thread(target=self._run, name="group-commit", daemon=True).start()
+
+    def submit(self, unit):
+        self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((unit, future))
+        except queue.Full:
+            raise database_busy("Grup commit kuyruğu dolu.")
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, conn, batch):
+        outcomes = []
+        conn.execute("BEGIN IMMEDIATE")
+        for unit, future in batch:
+            conn.execute("SAVEPOINT unit")
+            try:
+                result = unit(conn)
+            except Exception as e:
+                conn.execute("ROLLBACK TO unit")
+                conn.execute("RELEASE unit")
+                outcomes.append((future, None, e))
+            else:
+                conn.execute("RELEASE unit")
+                outcomes.append((future, result, None))
+        conn.commit()
+        return outcomes
+
+    def run_batch(self, batch):
+        try:
+            conn = db_writer.acquire()
+            try:
+                outcomes = self._apply(conn, batch)
+            finally:
+                db_writer.release(conn)
+        except Exception as e:
+            logging.error(f"Grup commit başarısız, {len(batch)} yazma geri alındı: {e}")
+            with self._lock:
+                self._stats["failed_batches"] += 1
+            for _unit, future in batch:
+                future.set_exception(e)
+            return
+        failed = 0
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                failed += 1
+                future.set_exception(error)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["units"] += len(batch)
+            self._stats["failed_units"] += failed
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+    def _run(self):
+        while True:
+            self.run_batch(self._collect())
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["average_batch"] = round(stats["units"] / stats["batches"], 2) if stats["batches"] else 0
+        return stats
+
+group_commit = GroupCommitWriter(DB_GROUP_COMMIT_WINDOW, DB_GROUP_COMMIT_MAX_BATCH, DB_WRITE_QUEUE_SIZE) if DB_GROUP_COMMIT else None
+
+def run_write(unit):
+    # unit(conn) yazma ifadelerini çalıştırır, commit etmez. Grup commit kapalıysa isteğin kendi
+    # bağlantısında çalışıp hemen commit edilir.
+    if group_commit is None:
+        conn = get_db_connection()
+        result = unit(conn)
+        conn.commit()
+        return result
+    try:
+        return group_commit.submit(unit).result()
+    except DatabaseBusyError:
+        database_busy("Grup commit yazıcısı meşgul.")
+        raise
+
+@app.errorhandler(DatabaseBusyError)
+def handle_database_busy(e):
+    logging.warning(f"Veritabanı bağlantısı alınamadı: {e}")
+    return jsonify({"description": "Sunucu şu anda yoğun, lütfen tekrar deneyin."}), 503
+
+@app.after_request
+def database_busy_response(response):
+    # Yazıcı ilk yazma ifadesinde alındığından bekleme hatası uçların kendi try bloğunda
+    # yakalanıp 500'e dönüşebilir; istemci yine tekrar denemesi gerektiğini bilmeli.
+    if response.status_code == 500 and g.pop('database_busy', False):
+        response = jsonify({"description": "Sunucu şu anda yoğun, lütfen tekrar deneyin."})
+        response.status_code = 503
+    return response
     
-def init_db():
+# --- Şema Göçleri ---
+# Her göç bir kez çalışır ve schema_version tablosuna yazılır. Yeni şema değişiklikleri
+# MIGRATIONS listesinin sonuna yeni bir sürüm olarak eklenmelidir.
+def add_column_if_not_exists(cursor, table_name, column_name, column_def):
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [row[1] for row in cursor.fetchall()]
+    if column_name not in columns:
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}")
+        logging.info(f"'{column_name}' sütunu '{table_name}' tablosuna eklendi.")
+
+def migration_001_base_schema(cursor):
+    # Göç sisteminden önce oluşturulmuş veritabanlarında eksik sütunlar da tamamlanır.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, google_id TEXT UNIQUE, email TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL, password_hash TEXT, user_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    add_column_if_not_exists(cursor, "Users", "phone_number", "TEXT")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Vehicles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, plate_number TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, brand TEXT, series TEXT, year TEXT, fuel TEXT, model TEXT,
+            last_inspection_date TEXT, tax_paid_jan INTEGER DEFAULT 0, tax_paid_jul INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE
+        )
+    ''')
+    add_column_if_not_exists(cursor, "Vehicles", "tax_paid_jan", "INTEGER DEFAULT 0")
+    add_column_if_not_exists(cursor, "Vehicles", "tax_paid_jul", "INTEGER DEFAULT 0")
+    add_column_if_not_exists(cursor, "Vehicles", "last_inspection_date", "TEXT")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Shops (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL UNIQUE, city TEXT,
+            phone TEXT, google_place_id TEXT, serviced_brands TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE
+        )
+    ''')
+    add_column_if_not_exists(cursor, "Shops", "serviced_brands", "TEXT")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, shop_user_id INTEGER NOT NULL,
+            vehicle_brand TEXT, vehicle_series TEXT, vehicle_year TEXT, vehicle_fuel TEXT, 
+            vehicle_model TEXT, vehicle_km INTEGER, city TEXT, maintenance_km INTEGER, 
+            selected_parts TEXT, status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            shop_google_place_id TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users (id),
+            FOREIGN KEY (shop_user_id) REFERENCES Users (id)
+        )
+    ''')
+    add_column_if_not_exists(cursor, "Requests", "status", "TEXT DEFAULT 'pending'")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Quotes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id INTEGER NOT NULL UNIQUE,
+            shop_user_id INTEGER NOT NULL,
+            parts_cost REAL,
+            labor_cost REAL,
+            total_cost REAL,
+            notes TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (request_id) REFERENCES Requests (id) ON DELETE CASCADE,
+            FOREIGN KEY (shop_user_id) REFERENCES Users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS FuelEntries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, vehicle_id INTEGER NOT NULL,
+            date TEXT NOT NULL, amount_tl REAL, amount_liter REAL, distance_km REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE,
+            FOREIGN KEY (vehicle_id) REFERENCES Vehicles (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            shop_user_id INTEGER NOT NULL,
+            request_id INTEGER NOT NULL UNIQUE,
+            vehicle_plate TEXT,
+            vehicle_brand TEXT,
+            vehicle_model TEXT,
+            status TEXT DEFAULT 'tarih_bekleniyor',
+            appointment_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES Users (id),
+            FOREIGN KEY (shop_user_id) REFERENCES Users (id),
+            FOREIGN KEY (request_id) REFERENCES Requests (id) ON DELETE CASCADE
+        )
+    ''')
+    add_column_if_not_exists(cursor, "Appointments", "vehicle_plate", "TEXT")
+    add_column_if_not_exists(cursor, "Appointments", "vehicle_brand", "TEXT")
+    add_column_if_not_exists(cursor, "Appointments", "vehicle_model", "TEXT")
+
+def migration_002_access_path_indexes(cursor):
+    # Quotes.request_id ve Appointments.request_id UNIQUE olduğundan zaten indekslidir.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_requests_shop_created ON Requests (shop_user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_requests_user_created ON Requests (user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointments_user_created ON Appointments (user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointments_shop_created ON Appointments (shop_user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fuel_vehicle_date ON FuelEntries (vehicle_id, date, amount_tl, amount_liter, distance_km)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shops_city ON Shops (city)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vehicles_user ON Vehicles (user_id)")
+
+def migration_003_shop_brands(cursor):
+    # Marka araması için Shops.serviced_brands virgüllü metninin normalize edilmiş hali;
+    # city, (brand, city) indeksinin arama için yeterli olması amacıyla burada da tutulur.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ShopBrands (
+            shop_user_id INTEGER NOT NULL,
+            brand TEXT NOT NULL,
+            city TEXT,
+            PRIMARY KEY (shop_user_id, brand),
+            FOREIGN KEY (shop_user_id) REFERENCES Shops (user_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shop_brands_brand_city ON ShopBrands (brand, city, shop_user_id)")
+    shops = cursor.execute("SELECT user_id, city, serviced_brands FROM Shops WHERE serviced_brands IS NOT NULL AND serviced_brands != ''").fetchall()
+    for shop_user_id, city, serviced_brands in shops:
+        sync_shop_brands(cursor, shop_user_id, city, serviced_brands.split(','))
+
+def migration_004_fuel_monthly_rollup(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS FuelMonthlyRollup (
+            vehicle_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            total_tl REAL NOT NULL DEFAULT 0,
+            total_liter REAL NOT NULL DEFAULT 0,
+            total_km REAL NOT NULL DEFAULT 0,
+            entry_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (vehicle_id, month),
+            FOREIGN KEY (vehicle_id) REFERENCES Vehicles (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO FuelMonthlyRollup (vehicle_id, month, total_tl, total_liter, total_km, entry_count)
+        SELECT vehicle_id, substr(date, 1, 7), COALESCE(SUM(amount_tl), 0), COALESCE(SUM(amount_liter), 0),
+               COALESCE(SUM(distance_km), 0), COUNT(*)
+        FROM FuelEntries GROUP BY vehicle_id, substr(date, 1, 7)
+    ''')
+
+def migration_005_outbound_jobs(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS OutboundJobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            locked_until REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbound_jobs_status_next ON OutboundJobs (status, next_attempt_at)")
+
+def migration_006_shop_locations(cursor):
+    # Koordinatlar Shops'ta tam hassasiyetle, ShopLocations R*Tree'de ise yarıçap araması için
+    # nokta kutusu olarak tutulur. R*Tree'de yabancı anahtar olmadığından silme tetikleyiciyle yapılır.
+    add_column_if_not_exists(cursor, "Shops", "latitude", "REAL")
+    add_column_if_not_exists(cursor, "Shops", "longitude", "REAL")
+    cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS ShopLocations USING rtree(shop_user_id, min_lat, max_lat, min_lng, max_lng)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_shops_delete_location AFTER DELETE ON Shops
+        BEGIN
+            DELETE FROM ShopLocations WHERE shop_user_id = OLD.user_id;
+        END
+    ''')
+    # Mevcut işletmelerin koordinatları Places'ten bir kez, iş kuyruğu üzerinden alınır.
+    shops = cursor.execute("SELECT user_id, google_place_id FROM Shops WHERE google_place_id IS NOT NULL AND google_place_id != '' AND latitude IS NULL").fetchall()
+    for shop_user_id, place_id in shops:
+        enqueue_job(cursor, "shop_location", {"shop_user_id": shop_user_id, "place_id": place_id})
+
+def migration_007_shop_reputation(cursor):
+    # Places puanı ve yorumlarının arka planda yenilenen kopyası; find_shops yalnızca bunu okur.
+    # place_id, kaydın hangi Place ID için alındığını tutar; işletme Place ID'sini değiştirirse
+    # eski kayıt eşleşmez ve yenileyici onu öncelikli olarak yeniden alır.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ShopReputation (
+            shop_user_id INTEGER PRIMARY KEY,
+            place_id TEXT NOT NULL,
+            name TEXT,
+            rating REAL,
+            user_ratings_total INTEGER,
+            reviews TEXT,
+            formatted_phone_number TEXT,
+            url TEXT,
+            refreshed_at REAL,
+            checked_at REAL NOT NULL,
+            FOREIGN KEY (shop_user_id) REFERENCES Shops (user_id) ON DELETE CASCADE
+        )
+    ''')
+
+def migration_008_shop_reputation_schedule(cursor):
+    # Bir sonraki deneme zamanı kayıtla birlikte tutulur: başarıdan sonra SHOP_REPUTATION_MAX_AGE,
+    # başarısız denemeden sonra (puanı önceden alınmış olsa bile) SHOP_REPUTATION_RETRY_SECONDS.
+    add_column_if_not_exists(cursor, "ShopReputation", "next_check_at", "REAL")
+    cursor.execute(
+        "UPDATE ShopReputation SET next_check_at = CASE WHEN refreshed_at IS NULL THEN checked_at + ? ELSE checked_at + ? END WHERE next_check_at IS NULL",
+        (SHOP_REPUTATION_RETRY_SECONDS, SHOP_REPUTATION_MAX_AGE)
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shop_reputation_next_check ON ShopReputation (next_check_at)")
+
+def migration_009_shop_brands_casefold(cursor):
+    # Eski LIKE araması büyük/küçük harf duyarsızdı; ShopBrands satırları normalize_brand ile
+    # yeniden üretilir, böylece "bmw" araması "BMW" kaydını bulur.
+    shops = cursor.execute("SELECT user_id, city, serviced_brands FROM Shops WHERE serviced_brands IS NOT NULL AND serviced_brands != ''").fetchall()
+    for shop_user_id, city, serviced_brands in shops:
+        sync_shop_brands(cursor, shop_user_id, city, serviced_brands.split(','))
+
+MIGRATIONS = [
+    (1, "Temel şema", migration_001_base_schema),
+    (2, "Erişim yolu indeksleri", migration_002_access_path_indexes),
+    (3, "ShopBrands marka-şehir tablosu", migration_003_shop_brands),
+    (4, "Aylık yakıt özet tablosu", migration_004_fuel_monthly_rollup),
+    (5, "Giden işler kuyruğu", migration_005_outbound_jobs),
+    (6, "İşletme konumları ve R*Tree indeksi", migration_006_shop_locations),
+    (7, "İşletme puanları tablosu", migration_007_shop_reputation),
+    (8, "İşletme puanı yenileme zamanı", migration_008_shop_reputation_schedule),
+    (9, "ShopBrands markalarının küçük harfe çevrilmesi", migration_009_shop_brands_casefold),
+]
+
+def normalize_brand(brand):
+    # ShopBrands'e yazarken ve ararken aynı biçim kullanılır; Shops.serviced_brands girildiği gibi kalır.
+    return brand.strip().lower()
+
+def sync_shop_brands(conn, shop_user_id, city, brands):
+    conn.execute("DELETE FROM ShopBrands WHERE shop_user_id = ?", (shop_user_id,))
+    brands = {normalize_brand(brand) for brand in brands if brand and brand.strip()}
+    conn.executemany(
+        "INSERT INTO ShopBrands (shop_user_id, brand, city) VALUES (?, ?, ?)",
+        [(shop_user_id, brand, city) for brand in sorted(brands)]
+    )
+
+def set_shop_location(conn, shop_user_id, latitude, longitude):
+    conn.execute("UPDATE Shops SET latitude = ?, longitude = ? WHERE user_id = ?", (latitude, longitude, shop_user_id))
+    if latitude is None or longitude is None:
+        conn.execute("DELETE FROM ShopLocations WHERE shop_user_id = ?", (shop_user_id,))
+    else:
+        conn.execute(
+            "INSERT OR REPLACE INTO ShopLocations (shop_user_id, min_lat, max_lat, min_lng, max_lng) VALUES (?, ?, ?, ?, ?)",
+            (shop_user_id, latitude, latitude, longitude, longitude)
+        )
+
+def current_schema_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def run_migrations(conn):
+    if current_schema_version(conn) >= MIGRATIONS[-1][0]:
+        return
+    # Aynı anda açılan worker'lardan yalnızca biri göçleri uygular.
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        conn = get_db_connection()
+        current = current_schema_version(conn)
         cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, google_id TEXT UNIQUE, email TEXT NOT NULL UNIQUE,
-                name TEXT NOT NULL, password_hash TEXT, user_type TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        add_column_if_not_exists(cursor, "Users", "phone_number", "TEXT")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Vehicles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, plate_number TEXT NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, brand TEXT, series TEXT, year TEXT, fuel TEXT, model TEXT,
-                last_inspection_date TEXT, tax_paid_jan INTEGER DEFAULT 0, tax_paid_jul INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE
-            )
-        ''')
-
-        add_column_if_not_exists(cursor, "Vehicles", "tax_paid_jan", "INTEGER DEFAULT 0")
-        add_column_if_not_exists(cursor, "Vehicles", "tax_paid_jul", "INTEGER DEFAULT 0")
-        add_column_if_not_exists(cursor, "Vehicles", "last_inspection_date", "TEXT")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Shops (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL UNIQUE, city TEXT,
-                phone TEXT, google_place_id TEXT, serviced_brands TEXT,
-                FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE
-            )
-        ''')
-
-        add_column_if_not_exists(cursor, "Shops", "serviced_brands", "TEXT")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, shop_user_id INTEGER NOT NULL,
-                vehicle_brand TEXT, vehicle_series TEXT, vehicle_year TEXT, vehicle_fuel TEXT, 
-                vehicle_model TEXT, vehicle_km INTEGER, city TEXT, maintenance_km INTEGER, 
-                selected_parts TEXT, status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                shop_google_place_id TEXT,
-                FOREIGN KEY (user_id) REFERENCES Users (id),
-                FOREIGN KEY (shop_user_id) REFERENCES Users (id)
-            )
-        ''')
-
-        add_column_if_not_exists(cursor, "Requests", "status", "TEXT DEFAULT 'pending'")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Quotes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                request_id INTEGER NOT NULL UNIQUE,
-                shop_user_id INTEGER NOT NULL,
-                parts_cost REAL,
-                labor_cost REAL,
-                total_cost REAL,
-                notes TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (request_id) REFERENCES Requests (id) ON DELETE CASCADE,
-                FOREIGN KEY (shop_user_id) REFERENCES Users (id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS FuelEntries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, vehicle_id INTEGER NOT NULL,
-                date TEXT NOT NULL, amount_tl REAL, amount_liter REAL, distance_km REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE,
-                FOREIGN KEY (vehicle_id) REFERENCES Vehicles (id) ON DELETE CASCADE
-            )
-        ''')
-
-        add_column_if_not_exists(cursor, "Appointments", "vehicle_plate", "TEXT")
-        add_column_if_not_exists(cursor, "Appointments", "vehicle_brand", "TEXT")
-        add_column_if_not_exists(cursor, "Appointments", "vehicle_model", "TEXT")              
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                shop_user_id INTEGER NOT NULL,
-                request_id INTEGER NOT NULL UNIQUE,
-                vehicle_plate TEXT,
-                vehicle_brand TEXT,
-                vehicle_model TEXT,
-                status TEXT DEFAULT 'tarih_bekleniyor',
-                appointment_date TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES Users (id),
-                FOREIGN KEY (shop_user_id) REFERENCES Users (id),
-                FOREIGN KEY (request_id) REFERENCES Requests (id) ON DELETE CASCADE
-            )
-        ''')
-
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(cursor)
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            logging.info(f"Şema göçü uygulandı: {version} - {description}")
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.execute("PRAGMA optimize")
+
+def init_db():
+    # Göçler havuz dışı bir bağlantıyla çalışır ve bağlantı kapatılır; içe aktarma sırasında açılan
+    # bir bağlantı havuzda kalıp fork'la worker'lara geçmesin.
+    conn = None
+    try:
+        conn = db_writer.connect()
+        run_migrations(conn)
         logging.info("Veritabanı başarıyla kontrol edildi.")
     except Exception as e:
         logging.error(f"Veritabanı başlatma hatası: {e}")
     finally:
-        if 'conn' in locals() and conn: conn.close()
+        if conn is not None:
+            conn.close()
+
+# find_shops sonuçları; puan ve yorumlar ShopReputation'dan gelir, istek sırasında Places'e gidilmez.
+SHOP_SEARCH_COLUMNS = """
+    u.id AS shop_user_id, u.name, s.phone, s.city, s.google_place_id,
+    rep.refreshed_at AS reputation_refreshed_at, rep.name AS place_name, rep.rating, rep.user_ratings_total,
+    rep.reviews, rep.formatted_phone_number, rep.url
+"""
+SHOP_REPUTATION_JOIN = "LEFT JOIN ShopReputation rep ON rep.shop_user_id = s.user_id AND rep.place_id = s.google_place_id"
+CITY_SHOPS_QUERY = f"""
+    SELECT {SHOP_SEARCH_COLUMNS}
+    FROM ShopBrands sb
+    JOIN Shops s ON s.user_id = sb.shop_user_id
+    JOIN Users u ON u.id = sb.shop_user_id
+    {SHOP_REPUTATION_JOIN}
+    WHERE sb.brand = ? AND sb.city = ?
+"""
+CITY_SHOPS_BY_RATING_QUERY = CITY_SHOPS_QUERY + " ORDER BY COALESCE(rep.rating, 0) DESC, COALESCE(rep.user_ratings_total, 0) DESC, u.id"
+
+# Aday işletmeler R*Tree kutusundan gelir; kesin mesafe ve sıralama SQL içinde distance_km ile yapılır.
+# CROSS JOIN, planlayıcının markaya göre tüm ülkeyi tarayıp R*Tree'ye satır satır bakmasını önler.
+# Sıralama anahtarı keyset imleci olarak döner, böylece sonraki sayfalar da aynı sorguyla alınır.
+# Koordinatlar yalnızca yakın arama yanıtına eklenir; şehir araması eski yanıt biçimini korur.
+NEARBY_SHOPS_QUERY_TEMPLATE = """
+    SELECT {columns}, s.latitude, s.longitude, distance_km(?, ?, s.latitude, s.longitude) AS distance, COALESCE(rep.rating, 0) AS rating_key
+    FROM ShopLocations loc
+    CROSS JOIN ShopBrands sb ON sb.shop_user_id = loc.shop_user_id AND sb.brand = ?
+    JOIN Shops s ON s.user_id = loc.shop_user_id
+    JOIN Users u ON u.id = loc.shop_user_id
+    {reputation_join}
+    WHERE loc.min_lat <= ? AND loc.max_lat >= ? AND loc.min_lng <= ? AND loc.max_lng >= ?
+      AND distance <= ? AND {after}
+    ORDER BY {order} LIMIT ?
+"""
+NEARBY_SHOPS_QUERY = NEARBY_SHOPS_QUERY_TEMPLATE.format(
+    columns=SHOP_SEARCH_COLUMNS, reputation_join=SHOP_REPUTATION_JOIN,
+    after="(distance, u.id) > (?, ?)", order="distance, u.id"
+)
+NEARBY_SHOPS_BY_RATING_QUERY = NEARBY_SHOPS_QUERY_TEMPLATE.format(
+    columns=SHOP_SEARCH_COLUMNS, reputation_join=SHOP_REPUTATION_JOIN,
+    after="(rating_key < ? OR (rating_key = ? AND (distance, u.id) > (?, ?)))", order="rating_key DESC, distance, u.id"
+)
 
-def add_column_if_not_exists(cursor, table_name, column_name, column_def):
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [row[1] for row in cursor.fetchall()]
-    if column_name not in columns:
-        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}")
-        logging.info(f"'{column_name}' sütunu '{table_name}' tablosuna eklendi.")
+# Sık çalışan sorgular; check-query-plans komutu ve testler bunların tam tablo taraması yapmadığını
+# doğrular. Sorgular uçların kullandığı sabit ve kurucu fonksiyonlardan üretilir, kopya tutulmaz.
+def hot_query_plans():
+    plans = []
+    listings = (
+        ("get_requests (işletme)", BUSINESS_REQUEST_FIELDS, BUSINESS_REQUESTS_FROM, 'r', 'shop_user_id'),
+        ("get_requests (araç sahibi)", OWNER_REQUEST_FIELDS, OWNER_REQUESTS_FROM, 'r', 'user_id'),
+        ("get_appointments (araç sahibi)", OWNER_APPOINTMENT_FIELDS, OWNER_APPOINTMENTS_FROM, 'a', 'user_id'),
+        ("get_appointments (işletme)", BUSINESS_APPOINTMENT_FIELDS, BUSINESS_APPOINTMENTS_FROM, 'a', 'shop_user_id'),
+    )
+    for name, field_map, from_clause, alias, owner_column in listings:
+        select_list = select_list_for(field_map, list(field_map))
+        plans.append((name, *build_listing_query(select_list, from_clause, alias, owner_column, 1, [], None, LISTING_DEFAULT_LIMIT)))
+        plans.append((f"{name} (sayfalı)", *build_listing_query(select_list, from_clause, alias, owner_column, 1, ['pending'], ('2024-01-01', 10), LISTING_DEFAULT_LIMIT)))
+    plans.extend([
+        ("manage_fuel_entries", *build_fuel_entries_query(1, '2024-01-01', '2024-12-31', None, FUEL_ENTRIES_DEFAULT_LIMIT)),
+        ("manage_fuel_entries (sayfalı)", *build_fuel_entries_query(1, '2024-01-01', '2024-12-31', ('2024-06-01', 10), FUEL_ENTRIES_DEFAULT_LIMIT)),
+        ("export_fuel_entries", FUEL_EXPORT_QUERY, (1, '0000-01-01', '9999-12-31')),
+        ("fuel_totals (kısmi ay)", FUEL_ENTRY_TOTALS_QUERY, (1, '2024-01-15', '2024-01-31')),
+        ("fuel_totals (aylık)", FUEL_ROLLUP_TOTALS_QUERY, (1, '2020-01', '2024-12')),
+        ("get_dashboard (araçlar)", OWNER_VEHICLES_QUERY, (1,)),
+        ("get_dashboard (yakıt)", DASHBOARD_FUEL_QUERY, (1, '2024-01', '2024-12')),
+        ("get_dashboard (son talep)", DASHBOARD_LATEST_REQUEST_QUERY, (1,)),
+        ("get_dashboard (talep sayıları)", DASHBOARD_REQUEST_COUNTS_QUERY, (1,)),
+        ("find_shops", CITY_SHOPS_QUERY, ('BMW', 'Ankara')),
+        ("find_shops (puan)", CITY_SHOPS_BY_RATING_QUERY, ('BMW', 'Ankara')),
+        ("find_shops (yakın)", NEARBY_SHOPS_QUERY, (41.0, 29.0, 'BMW', 41.3, 40.7, 29.3, 28.7, 25, -1, 0, 21)),
+        ("find_shops (yakın, puan)", NEARBY_SHOPS_BY_RATING_QUERY, (41.0, 29.0, 'BMW', 41.3, 40.7, 29.3, 28.7, 25, 5, 5, -1, 0, 21)),
+    ])
+    return plans
+# Hesaplanan mesafe ve puana göre sıralama indeksle yapılamaz; yalnızca şehir/marka ya da R*Tree
+# kutusundaki adaylar sıralanır.
+COMPUTED_ORDER_QUERIES = {"find_shops (puan)", "find_shops (yakın)", "find_shops (yakın, puan)"}
+
+def find_query_plan_problems(conn):
+    problems = []
+    for name, query, params in hot_query_plans():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall():
+            detail = row[3]
+            # Eşit tarihler içindeki küçük sıralama (RIGHT PART OF ORDER BY) sorun sayılmaz.
+            # Kısıtlı R*Tree taraması (VIRTUAL TABLE INDEX n:B0D1...) indeks araması sayılır; alt sorgu
+            # (co-routine) taraması da yalnızca içte indeksle bulunmuş satırları dolaşır.
+            full_scan = (
+                detail.startswith("SCAN ") and " USING " not in detail and not detail.startswith("SCAN (subquery-")
+                and not re.search(r"VIRTUAL TABLE INDEX \d+:\w", detail)
+            )
+            unindexed_sort = "TEMP B-TREE FOR ORDER BY" in detail and name not in COMPUTED_ORDER_QUERIES
+            if full_scan or unindexed_sort:
+                problems.append(f"{name}: {detail}")
+    return problems
+
+# --- Statik Yanıtlar ---
+# Şehir ve katalog gibi değişmeyen yanıtlar bir kez JSON, gzip ve (brotli kuruluysa) br
+# olarak hazırlanır; istek sırasında yalnızca istemcinin kabul ettiği kodlama seçilir.
+# Her kodlamanın ayrı bir güçlü ETag'i olur.
+StaticPayload = namedtuple('StaticPayload', 'body gzip br etag')
+
+def compress_static_body(body):
+    if len(body) < STATIC_COMPRESS_MIN_SIZE:
+        return b'', b''
+    gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+    br_body = brotli.compress(body, quality=11) if brotli else b''
+    # Sıkıştırma kazandırmıyorsa o kodlama hiç sunulmaz.
+    return (gzip_body if len(gzip_body) < len(body) else b''), (br_body if len(br_body) < len(body) else b'')
+
+def make_static_payload(body):
+    gzip_body, br_body = compress_static_body(body)
+    return StaticPayload(body, gzip_body, br_body, hashlib.blake2b(body, digest_size=16).hexdigest())
+
+def static_content_response(payload):
+    if payload.br and request.accept_encodings['br']:
+        body, encoding = payload.br, 'br'
+    elif payload.gzip and request.accept_encodings['gzip']:
+        body, encoding = payload.gzip, 'gzip'
+    else:
+        body, encoding = payload.body, None
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f"{payload.etag}-{encoding}" if encoding else payload.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = STATIC_CACHE_MAX_AGE
+    return response.make_conditional(request)
+
+EMPTY_LIST_PAYLOAD = make_static_payload(b'[]')
+
+# --- Araç Kataloğu ---
+# tum_data.json bir kez derlenip tum_data.cat dosyasına yazılır. Dosya; yol anahtarı
+# (marka\x1fseri\x1fyıl\x1fyakıt) -> hazır JSON, gzip ve br baytlarını ve ETag'i tutan açık
+# adresli bir hash tablosudur. Worker'lar dosyayı mmap ile açar, sayfalar işletim sistemi önbelleğinden
+# paylaşılır; kaynak dosyanın mtime'ı değişince katalog atomik olarak yeniden derlenir.
+CATALOGUE_MAGIC = b'ARACAT02'
+CATALOGUE_HEADER = struct.Struct('<8sIIdQ?')
+CATALOGUE_SLOT = struct.Struct('<IIIIIIIII16s')
+CATALOGUE_KEY_SEP = '\x1f'
+
+def build_vehicle_catalogue(vehicle_data):
+    # marka -> seri -> yıl -> yakıt -> modeller ağacı bir kez kurulur; her seviyenin
+    # sıralı listesi JSON bayt olarak saklanır, dropdown istekleri tek sözlük erişimidir.
+    tree = {}
+    for item in vehicle_data:
+        brand, series, year, fuel = (sys.intern(str(item[k])) for k in ('marka', 'seri', 'yil', 'yakit'))
+        models = tree.setdefault(brand, {}).setdefault(series, {}).setdefault(year, {}).setdefault(fuel, set())
+        models.add(sys.intern(item['model']))
+    catalogue = {}
+    def add_level(path, children):
+        catalogue[path] = json.dumps(sorted(children), separators=(',', ':')).encode('utf-8')
+        if isinstance(children, dict):
+            for key, value in children.items():
+                add_level(path + (key,), value)
+    add_level((), tree)
+    return catalogue
+
+def catalogue_key(path):
+    return CATALOGUE_KEY_SEP.join(path).encode('utf-8')
+
+def write_catalogue_file(catalogue, target_path, source_mtime, source_size):
+    n_slots = 1
+    while n_slots < len(catalogue) * 2:
+        n_slots *= 2
+    slots = [None] * n_slots
+    data = bytearray()
+    data_offset = CATALOGUE_HEADER.size + n_slots * CATALOGUE_SLOT.size
+    for path, body in catalogue.items():
+        key = catalogue_key(path)
+        payload = make_static_payload(body)
+        slot = [zlib.crc32(key)]
+        for chunk in (key, payload.body, payload.gzip, payload.br):
+            slot += [data_offset + len(data), len(chunk)]
+            data += chunk
+        slot.append(bytes.fromhex(payload.etag))
+        index = zlib.crc32(key) & (n_slots - 1)
+        while slots[index] is not None:
+            index = (index + 1) & (n_slots - 1)
+        slots[index] = slot
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(CATALOGUE_HEADER.pack(CATALOGUE_MAGIC, n_slots, len(catalogue), source_mtime, source_size, brotli is not None))
+        empty_slot = CATALOGUE_SLOT.pack(0, 0, 0, 0, 0, 0, 0, 0, 0, b'')
+        for slot in slots:
+            f.write(CATALOGUE_SLOT.pack(*slot) if slot else empty_slot)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, target_path)
+
+class CatalogueStore:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_slots, self.n_entries, self.source_mtime, self.source_size, _ = CATALOGUE_HEADER.unpack_from(self._mm, 0)
+        if magic != CATALOGUE_MAGIC:
+            raise ValueError(f"{path} geçerli bir katalog dosyası değil.")
+
+    def get(self, path):
+        key = catalogue_key(path)
+        key_hash = zlib.crc32(key)
+        mask = self.n_slots - 1
+        index = key_hash & mask
+        for _ in range(self.n_slots):
+            slot_hash, key_off, key_len, val_off, val_len, gz_off, gz_len, br_off, br_len, etag = CATALOGUE_SLOT.unpack_from(
+                self._mm, CATALOGUE_HEADER.size + index * CATALOGUE_SLOT.size
+            )
+            if val_len == 0:
+                return None
+            if slot_hash == key_hash and self._mm[key_off:key_off + key_len] == key:
+                return StaticPayload(
+                    self._mm[val_off:val_off + val_len], self._mm[gz_off:gz_off + gz_len],
+                    self._mm[br_off:br_off + br_len], etag.hex()
+                )
+            index = (index + 1) & mask
+        return None
 
-def load_vehicle_data():
-    global all_vehicle_data
-    if not all_vehicle_data:
+def catalogue_file_is_current(source_stat):
+    try:
+        with open(CATALOGUE_PATH, 'rb') as f:
+            magic, _, _, source_mtime, source_size, has_brotli = CATALOGUE_HEADER.unpack(f.read(CATALOGUE_HEADER.size))
+    except (OSError, struct.error):
+        return False
+    # brotli sonradan kurulduysa katalog br sürümleriyle yeniden derlenir.
+    return (
+        magic == CATALOGUE_MAGIC and source_mtime == source_stat.st_mtime and source_size == source_stat.st_size
+        and has_brotli == (brotli is not None)
+    )
+
+def build_catalogue_file(force=False):
+    # Birden fazla worker aynı anda fark ederse yalnızca biri derler, diğerleri kilidi bekler.
+    with open(CATALOGUE_PATH + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        source_stat = os.stat(VEHICLE_DATA_PATH)
+        if not force and catalogue_file_is_current(source_stat):
+            return False
+        started = time.monotonic()
+        with open(VEHICLE_DATA_PATH, 'r', encoding='utf-8') as f:
+            catalogue = build_vehicle_catalogue(json.load(f))
+        write_catalogue_file(catalogue, CATALOGUE_PATH, source_stat.st_mtime, source_stat.st_size)
+        logging.info(f"Araç kataloğu derlendi: {len(catalogue)} kayıt, {time.monotonic() - started:.2f} sn.")
+        return True
+
+catalogue_store = None
+_catalogue_checked_at = 0.0
+_catalogue_lock = threading.Lock()
+
+def get_catalogue_store():
+    global catalogue_store, _catalogue_checked_at
+    if catalogue_store is not None and time.monotonic() - _catalogue_checked_at < CATALOGUE_CHECK_INTERVAL:
+        return catalogue_store
+    with _catalogue_lock:
+        if catalogue_store is not None and time.monotonic() - _catalogue_checked_at < CATALOGUE_CHECK_INTERVAL:
+            return catalogue_store
+        _catalogue_checked_at = time.monotonic()
         try:
-            with open(VEHICLE_DATA_PATH, 'r', encoding='utf-8') as f:
-                all_vehicle_data = json.load(f)
+            if not catalogue_file_is_current(os.stat(VEHICLE_DATA_PATH)):
+                build_catalogue_file()
+            # Eski mmap kapatılmaz; okuyan iş parçacıkları bitince çöp toplayıcı kapatır.
+            if catalogue_store is None or catalogue_store.inode != os.stat(CATALOGUE_PATH).st_ino:
+                catalogue_store = CatalogueStore(CATALOGUE_PATH)
         except Exception as e:
-            logging.error(f"{VEHICLE_DATA_PATH} okunurken hata: {e}")
+            logging.error(f"Araç kataloğu yüklenemedi: {e}")
+    return catalogue_store
+
+def catalogue_response(*path):
+    store = get_catalogue_store()
+    payload = store.get(path) if store else None
+    return static_content_response(payload or EMPTY_LIST_PAYLOAD)
+
+def load_cities_payload():
+    try:
+        with open(CITIES_DATA_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        city_names = sorted(city['isim'] for city in data.get('sehirler', []))
+        return make_static_payload(json.dumps(city_names, ensure_ascii=False).encode('utf-8'))
+    except Exception as e:
+        logging.error(f"Şehir dosyası okunurken hata: {e}")
+        return None
 
 def validate_plate_number(plate):
     cleaned_plate = re.sub(r'\s+', '', plate.upper())
@@ -202,13 +1598,890 @@ def format_plate_for_db(plate):
 def validate_phone_number(phone):
     return re.fullmatch(r'^0\d{10}$', phone) if phone else True
 
+# --- Google Places Detay Önbelleği ---
+places_executor = ThreadPoolExecutor(max_workers=PLACES_MAX_WORKERS, thread_name_prefix="places")
+places_http = requests.Session()
+places_http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=PLACES_MAX_WORKERS))
+
+class PlacesDetailsCache:
+    # Süreç içi LRU -> Redis -> Google sırasıyla bakılır. Süresi dolan (ama stale
+    # penceresindeki) kayıtlar hemen döndürülür, yenilemesi arka planda yapılır.
+    # Başarısız istekler kayda failed_at olarak yazılır; negative_ttl boyunca Google'a tekrar gidilmez.
+    def __init__(self, ttl, stale_ttl, max_items, negative_ttl=PLACES_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_items = max_items
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {"memory_hits": 0, "redis_hits": 0, "stale_hits": 0, "negative_hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def _key(place_id, fields, language):
+        return f"places:details:{language}:{fields}:{place_id}"
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["lru_size"] = len(self._lru)
+        lookups = stats["memory_hits"] + stats["redis_hits"] + stats["stale_hits"] + stats["negative_hits"] + stats["misses"]
+        stats["in_process_ratio"] = round(stats["memory_hits"] / lookups, 4) if lookups else 0
+        return stats
+
+    def _lru_get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+            return entry
+
+    def _lru_put(self, key, entry):
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def _redis_get(self, key):
+        if not redis_pool.available():
+            return None
+        try:
+            raw = redis_client.get(key)
+            return json.loads(raw) if raw else None
+        except (redis.exceptions.RedisError, ValueError) as e:
+            logging.warning(f"Places önbelleği Redis'ten okunamadı: {e}")
+            return None
+
+    def _redis_put(self, key, entry):
+        if not redis_pool.available():
+            return
+        expires_at = max(entry["fetched_at"] + self.ttl + self.stale_ttl, entry.get("failed_at", 0) + self.negative_ttl)
+        try:
+            redis_client.setex(key, max(1, math.ceil(expires_at - time.time())), json.dumps(entry))
+        except redis.exceptions.RedisError as e:
+            logging.warning(f"Places önbelleği Redis'e yazılamadı: {e}")
+
+    def _fetch(self, place_id, fields, language):
+        params = {"place_id": place_id, "fields": fields, "key": GOOGLE_PLACES_API_KEY, "language": language}
+        try:
+            with outbound_timer("google_places"):
+                response = places_http.get(PLACES_DETAILS_URL, params=params, timeout=5)
+            place_data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._count("errors")
+            logging.error(f"Google Places API isteği başarısız oldu (Place ID: {place_id}): {e}")
+            return None
+        if place_data.get("status") == "OK" and "result" in place_data:
+            return place_data["result"]
+        self._count("errors")
+        logging.warning(f"Google Places API sonuç döndürmedi (Place ID: {place_id}): {place_data.get('status')}")
+        return None
+
+    @staticmethod
+    def _written_at(entry):
+        return max(entry["fetched_at"], entry.get("failed_at", 0))
+
+    def _recently_failed(self, entry, now):
+        return now - entry.get("failed_at", 0) < self.negative_ttl
+
+    def _load(self, key, place_id, fields, language):
+        result = self._fetch(place_id, fields, language)
+        if result is None:
+            # Varsa eski sonuç korunur; yalnızca başarısızlık zamanı eklenir.
+            previous = self._lru_get(key) or {"fetched_at": 0, "result": None}
+            entry = dict(previous, failed_at=time.time())
+            self._lru_put(key, entry)
+            self._redis_put(key, entry)
+            return None
+        entry = {"fetched_at": time.time(), "result": result}
+        self._lru_put(key, entry)
+        self._redis_put(key, entry)
+        return result
+
+    def _submit(self, key, place_id, fields, language):
+        # Aynı anahtar için uçuştaki istek varsa ona bağlanılır.
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = places_executor.submit(self._load, key, place_id, fields, language)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _f: self._forget_inflight(key))
+            return future
+
+    def _forget_inflight(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def lookup(self, place_id, fields, language="tr"):
+        key = self._key(place_id, fields, language)
+        now = time.time()
+        entry = self._lru_get(key)
+        source = "memory_hits"
+        if entry is None or (now - entry["fetched_at"] >= self.ttl and not self._recently_failed(entry, now)):
+            # Yerel kayıt yoksa ya da bayatsa başka bir worker'ın yenilediği kayıt Redis'te olabilir.
+            shared = self._redis_get(key)
+            if shared is not None and (entry is None or self._written_at(shared) > self._written_at(entry)):
+                entry = shared
+                source = "redis_hits"
+                self._lru_put(key, entry)
+        if entry is not None:
+            age = now - entry["fetched_at"]
+            failed = self._recently_failed(entry, now)
+            if age < self.ttl:
+                self._count(source)
+                return True, entry["result"]
+            if age < self.ttl + self.stale_ttl:
+                self._count("stale_hits")
+                if not failed:
+                    self._submit(key, place_id, fields, language)
+                return True, entry["result"]
+            if failed:
+                self._count("negative_hits")
+                return True, None
+        return False, None
+
+    def fetch_async(self, place_id, fields, language="tr"):
+        self._count("misses")
+        return self._submit(self._key(place_id, fields, language), place_id, fields, language)
+
+    def get(self, place_id, fields, language="tr"):
+        found, result = self.lookup(place_id, fields, language)
+        if found:
+            return result
+        return self.fetch_async(place_id, fields, language).result()
+
+places_cache = PlacesDetailsCache(PLACES_CACHE_TTL, PLACES_CACHE_STALE_TTL, PLACES_CACHE_LRU_SIZE)
+
+def get_place_details(place_id, fields, language="tr"):
+    if not place_id or not GOOGLE_PLACES_API_KEY:
+        return None
+    return places_cache.get(place_id, fields, language)
+
+def get_many_place_details(place_ids, fields, language="tr", timeout=None):
+    # Önbellekte olmayanlar paralel istenir; süre dolduğunda yetişenlerle dönülür,
+    # yetişemeyenler arka planda tamamlanıp önbelleğe yazılır.
+    if not GOOGLE_PLACES_API_KEY:
+        return {}
+    results = {}
+    pending = {}
+    for place_id in set(filter(None, place_ids)):
+        found, result = places_cache.lookup(place_id, fields, language)
+        if found:
+            if result:
+                results[place_id] = result
+        else:
+            pending[places_cache.fetch_async(place_id, fields, language)] = place_id
+    if pending:
+        done, not_done = futures_wait(pending, timeout=PLACES_ENRICH_DEADLINE if timeout is None else timeout)
+        for future in done:
+            result = future.result()
+            if result:
+                results[pending[future]] = result
+        if not_done:
+            logging.warning(f"{len(not_done)} Google Places isteği süre sınırında tamamlanamadı, veritabanı bilgileri kullanılacak.")
+    return results
+
+# --- İşletme Puanları ---
+# ShopReputation arka planda, en uzun süredir bakılmayan işletmeden başlanarak doldurulur.
+# Her turda en fazla SHOP_REPUTATION_BATCH_SIZE Places isteği yapılır; Redis kilidi sayesinde
+# her turda tek bir worker dış servise gider. Kaydı olmayan veya Place ID'si değişen işletmeler önce alınır.
+SHOP_REPUTATION_DUE_QUERY = """
+    SELECT s.user_id, s.google_place_id
+    FROM Shops s
+    LEFT JOIN ShopReputation rep ON rep.shop_user_id = s.user_id
+    WHERE s.google_place_id IS NOT NULL AND s.google_place_id != ''
+      AND (rep.place_id IS NOT s.google_place_id OR IFNULL(rep.next_check_at, 0) <= ?)
+    ORDER BY CASE WHEN rep.place_id IS s.google_place_id THEN IFNULL(rep.next_check_at, 0) ELSE 0 END
+    LIMIT ?
+"""
+
+SHOP_REPUTATION_REFRESHED_UPSERT = """
+    INSERT OR REPLACE INTO ShopReputation
+        (shop_user_id, place_id, name, rating, user_ratings_total, reviews, formatted_phone_number, url, refreshed_at, checked_at, next_check_at)
+    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM Shops WHERE user_id = ?)
+"""
+SHOP_REPUTATION_FAILED_UPSERT = """
+    INSERT INTO ShopReputation (shop_user_id, place_id, checked_at, next_check_at)
+    SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM Shops WHERE user_id = ?)
+    ON CONFLICT (shop_user_id) DO UPDATE SET checked_at = excluded.checked_at, next_check_at = excluded.next_check_at
+"""
+
+class ShopReputationRefresher:
+    def __init__(self, interval, batch_size, max_age, retry_after):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._stats = {"runs": 0, "refreshed": 0, "failed": 0, "last_run_at": 0.0}
+
+    def start(self):
+        if not GOOGLE_PLACES_API_KEY or self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            threading.Thread(target=self._run, name="shop-reputation", daemon=True).start()
+
+    def _acquire_refresh_lock(self):
+        if not redis_pool.available():
+            return True
+        try:
+            return bool(redis_client.set(SHOP_REPUTATION_REDIS_LOCK, os.getpid(), nx=True, ex=max(1, int(self.interval * 0.8))))
+        except redis.exceptions.RedisError:
+            return True
+
+    def due_shops(self, limit):
+        conn = db_pool.acquire()
+        try:
+            return conn.execute(SHOP_REPUTATION_DUE_QUERY, (time.time(), limit)).fetchall()
+        finally:
+            db_pool.release(conn)
+
+    def refresh(self, limit=None):
+        shops = self.due_shops(self.batch_size if limit is None else limit)
+        if not shops:
+            return 0
+        # Önbellekteki bayat kopya yerine Places'ten taze sonuç istenir; sonuç önbelleğe de yazılır.
+        futures = {places_cache.fetch_async(place_id, SHOP_REPUTATION_FIELDS): (shop_user_id, place_id) for shop_user_id, place_id in shops}
+        futures_wait(futures, timeout=SHOP_REPUTATION_FETCH_TIMEOUT)
+        now = time.time()
+        refreshed_rows, failed_rows = [], []
+        for future, (shop_user_id, place_id) in futures.items():
+            result = future.result() if future.done() else None
+            if result:
+                refreshed_rows.append((
+                    shop_user_id, place_id, result.get('name'), result.get('rating'), result.get('user_ratings_total'),
+                    json.dumps(result.get('reviews', [])[:2]), result.get('formatted_phone_number'), result.get('url'),
+                    now, now, now + self.max_age, shop_user_id
+                ))
+            else:
+                failed_rows.append((shop_user_id, place_id, now, now + self.retry_after, shop_user_id))
+        # Satırlar yazıcı alınmadan hazırlanır; yazıcı yalnızca toplu yazma süresince tutulur.
+        # Yenileme sürerken silinen işletmeler EXISTS koşuluyla atlanır.
+        conn = db_writer.acquire()
+        try:
+            refreshed = conn.executemany(SHOP_REPUTATION_REFRESHED_UPSERT, refreshed_rows).rowcount
+            # Eski Place ID'ye ait puan tutulmaz; mevcut puan varsa bir sonraki denemeye kadar korunur.
+            conn.executemany("DELETE FROM ShopReputation WHERE shop_user_id = ? AND place_id IS NOT ?", [row[:2] for row in failed_rows])
+            failed = conn.executemany(SHOP_REPUTATION_FAILED_UPSERT, failed_rows).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            db_writer.release(conn)
+        with self._lock:
+            self._stats["refreshed"] += refreshed
+            self._stats["failed"] += failed
+        if failed:
+            logging.warning(f"{failed} işletmenin Places puanı alınamadı, {self.retry_after} sn sonra tekrar denenecek.")
+        return refreshed
+
+    def _run(self):
+        while True:
+            try:
+                if self._acquire_refresh_lock():
+                    self.refresh()
+                    with self._lock:
+                        self._stats["runs"] += 1
+                        self._stats["last_run_at"] = time.time()
+            except Exception as e:
+                logging.error(f"İşletme puanı yenileyicisinde beklenmedik hata: {e}")
+            time.sleep(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+shop_reputation = ShopReputationRefresher(SHOP_REPUTATION_REFRESH_INTERVAL, SHOP_REPUTATION_BATCH_SIZE, SHOP_REPUTATION_MAX_AGE, SHOP_REPUTATION_RETRY_SECONDS)
+
+# --- Sayfalı Listeleme ---
+# Listeler (created_at, id) üzerinden keyset ile sayfalanır; bir sonraki sayfanın imleci
+# X-Next-Cursor başlığında döner, böylece yanıt gövdesi eskisi gibi düz bir dizi kalır.
+REQUEST_COLUMNS = (
+    'id', 'user_id', 'shop_user_id', 'vehicle_brand', 'vehicle_series', 'vehicle_year', 'vehicle_fuel',
+    'vehicle_model', 'vehicle_km', 'city', 'maintenance_km', 'selected_parts', 'status', 'created_at',
+    'shop_google_place_id'
+)
+APPOINTMENT_COLUMNS = (
+    'id', 'user_id', 'shop_user_id', 'request_id', 'vehicle_plate', 'vehicle_brand', 'vehicle_model',
+    'status', 'appointment_date', 'created_at'
+)
+BUSINESS_REQUEST_FIELDS = dict(
+    {column: f"r.{column}" for column in REQUEST_COLUMNS},
+    customer_name="u.name AS customer_name", customer_phone="u.phone_number AS customer_phone", total_cost="q.total_cost"
+)
+OWNER_REQUEST_FIELDS = dict(
+    {column: f"r.{column}" for column in REQUEST_COLUMNS},
+    shop_name="u.name AS shop_name", shop_phone="s.phone AS shop_phone",
+    quote="q.parts_cost, q.labor_cost, q.total_cost, q.notes AS quote_notes, q.id AS quote_id"
+)
+OWNER_APPOINTMENT_FIELDS = dict({column: f"a.{column}" for column in APPOINTMENT_COLUMNS}, shop_name="u.name AS shop_name")
+BUSINESS_APPOINTMENT_FIELDS = dict({column: f"a.{column}" for column in APPOINTMENT_COLUMNS}, customer_name="u.name AS customer_name")
+BUSINESS_REQUESTS_FROM = "Requests r JOIN Users u ON r.user_id = u.id LEFT JOIN Quotes q ON r.id = q.request_id"
+OWNER_REQUESTS_FROM = """
+    Requests r
+    JOIN Users u ON r.shop_user_id = u.id
+    LEFT JOIN Shops s ON r.shop_user_id = s.user_id
+    LEFT JOIN Quotes q ON r.id = q.request_id
+"""
+OWNER_APPOINTMENTS_FROM = "Appointments a JOIN Users u ON a.shop_user_id = u.id"
+BUSINESS_APPOINTMENTS_FROM = "Appointments a JOIN Users u ON a.user_id = u.id"
+
+def encode_listing_cursor(created_at, row_id):
+    return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode('utf-8')).decode('ascii')
+
+def decode_listing_cursor(token):
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Geçersiz sayfa imleci.")
+
+def parse_listing_args(available_fields):
+    fields_param = request.args.get('fields')
+    if fields_param:
+        fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in available_fields]
+        if unknown:
+            raise ValueError(f"Bilinmeyen alan: {', '.join(unknown)}")
+    else:
+        fields = list(available_fields)
+    statuses = [status.strip() for status in request.args.get('status', '').split(',') if status.strip()]
+    try:
+        limit = int(request.args.get('limit', LISTING_DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("Geçersiz limit.")
+    if not 1 <= limit <= LISTING_MAX_LIMIT:
+        raise ValueError(f"limit 1 ile {LISTING_MAX_LIMIT} arasında olmalıdır.")
+    cursor = request.args.get('cursor')
+    position = decode_listing_cursor(cursor) if cursor else None
+    try:
+        ids = [int(row_id) for row_id in request.args.get('ids', '').split(',') if row_id.strip()]
+    except ValueError:
+        raise ValueError("Geçersiz kayıt kimliği.")
+    if len(ids) > LISTING_MAX_LIMIT:
+        raise ValueError(f"En fazla {LISTING_MAX_LIMIT} kayıt kimliği istenebilir.")
+    return fields, statuses, limit, position, ids
+
+def build_listing_query(select_list, from_clause, alias, owner_column, owner_id, statuses, position, limit, ids=()):
+    where = [f"{alias}.{owner_column} = ?"]
+    params = [owner_id]
+    if ids:
+        where.append(f"{alias}.id IN ({', '.join('?' for _ in ids)})")
+        params.extend(ids)
+    if statuses:
+        where.append(f"{alias}.status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    if position:
+        where.append(f"({alias}.created_at, {alias}.id) < (?, ?)")
+        params.extend(position)
+    params.append(limit + 1)
+    query = (
+        f"SELECT {', '.join(select_list)} FROM {from_clause} WHERE {' AND '.join(where)} "
+        f"ORDER BY {alias}.created_at DESC, {alias}.id DESC LIMIT ?"
+    )
+    return query, params
+
+def listing_response(items, rows, limit):
+    response = jsonify(items[:limit])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers['X-Next-Cursor'] = encode_listing_cursor(last['created_at'], last['id'])
+    return response
+
+def select_list_for(field_map, fields, required=()):
+    # id ve created_at imleç için her zaman seçilir.
+    wanted = list(dict.fromkeys(['id', 'created_at', *required, *fields]))
+    return [field_map[field] for field in wanted]
+
+# --- Konum Araması ---
+# lat/lng verilen işletme aramaları şehir sınırına bakmadan yarıçap içindeki en yakın
+# işletmeleri döndürür. Sonraki sayfanın imleci sıralama anahtarı olarak X-Next-Cursor'da gelir:
+# mesafeye göre (mesafe, id), puana göre (puan, mesafe, id).
+def encode_nearby_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+def decode_nearby_cursor(token, sort):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        if sort == 'rating':
+            rating, distance, shop_user_id = key
+            return float(rating), float(rating), float(distance), int(shop_user_id)
+        distance, shop_user_id = key
+        return float(distance), int(shop_user_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Geçersiz sayfa imleci.")
+
+def parse_nearby_args(sort):
+    try:
+        latitude = float(request.args['lat'])
+        longitude = float(request.args['lng'])
+        radius = float(request.args.get('radius_km', SHOP_SEARCH_DEFAULT_RADIUS_KM))
+        limit = int(request.args.get('limit', SHOP_SEARCH_DEFAULT_LIMIT))
+    except (KeyError, ValueError):
+        raise ValueError("Geçersiz konum, yarıçap veya limit.")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Geçersiz konum.")
+    if not 0 < radius <= SHOP_SEARCH_MAX_RADIUS_KM:
+        raise ValueError(f"radius_km 0 ile {SHOP_SEARCH_MAX_RADIUS_KM} arasında olmalıdır.")
+    if not 1 <= limit <= SHOP_SEARCH_MAX_LIMIT:
+        raise ValueError(f"limit 1 ile {SHOP_SEARCH_MAX_LIMIT} arasında olmalıdır.")
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_nearby_cursor(cursor, sort)
+    else:
+        position = (math.inf, math.inf, -1.0, 0) if sort == 'rating' else (-1.0, 0)
+    return latitude, longitude, radius, limit, position
+
+def nearby_bounding_box(latitude, longitude, radius):
+    # Yarıçapı içine alan enlem/boylam kutusu; kutbun yakınında boylam sınırı kaldırılır.
+    # Kutu 180. boylamı aşmaz, Türkiye için bu yeterlidir.
+    lat_delta = math.degrees(radius / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    lng_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+    return (
+        min(90.0, latitude + lat_delta), max(-90.0, latitude - lat_delta),
+        min(180.0, longitude + lng_delta), max(-180.0, longitude - lng_delta)
+    )
+
+def shop_search_result(row):
+    shop = dict(row)
+    refreshed_at = shop.pop('reputation_refreshed_at')
+    place_name = shop.pop('place_name')
+    reputation = {key: shop.pop(key) for key in ('rating', 'user_ratings_total', 'reviews', 'formatted_phone_number', 'url')}
+    shop.pop('rating_key', None)
+    if 'distance' in shop:
+        shop['distance_km'] = round(shop.pop('distance'), 2)
+    # Henüz puanı alınmamış işletmelerde Places alanları eskisi gibi hiç dönmez.
+    if refreshed_at is not None:
+        shop['name'] = place_name or shop['name']
+        shop['rating'] = reputation['rating'] or 0
+        shop['user_ratings_total'] = reputation['user_ratings_total'] or 0
+        shop['reviews'] = json.loads(reputation['reviews'] or '[]')
+        shop['formatted_phone_number'] = reputation['formatted_phone_number'] or shop['phone']
+        shop['url'] = reputation['url']
+    return shop
+
+# --- Yakıt Özetleri ---
+# Her yakıt girişi FuelMonthlyRollup'taki ay satırına da eklenir. Rapor aralığındaki tam
+# aylar bu tablodan, aralığın kısmi ilk/son ayları FuelEntries indeksinden toplanır.
+def add_fuel_entry_to_rollup(conn, vehicle_id, entry_date, amount_tl, amount_liter, distance_km):
+    conn.execute(
+        """
+        INSERT INTO FuelMonthlyRollup (vehicle_id, month, total_tl, total_liter, total_km, entry_count)
+        VALUES (?, substr(?, 1, 7), COALESCE(?, 0), COALESCE(?, 0), COALESCE(?, 0), 1)
+        ON CONFLICT (vehicle_id, month) DO UPDATE SET
+            total_tl = total_tl + excluded.total_tl,
+            total_liter = total_liter + excluded.total_liter,
+            total_km = total_km + excluded.total_km,
+            entry_count = entry_count + 1
+        """,
+        (vehicle_id, entry_date, amount_tl, amount_liter, distance_km)
+    )
+
+FUEL_ROLLUP_TOTALS_QUERY = "SELECT COALESCE(SUM(total_tl), 0), COALESCE(SUM(total_liter), 0), COALESCE(SUM(total_km), 0) FROM FuelMonthlyRollup WHERE vehicle_id = ? AND month BETWEEN ? AND ?"
+FUEL_ENTRY_TOTALS_QUERY = "SELECT COALESCE(SUM(amount_tl), 0), COALESCE(SUM(amount_liter), 0), COALESCE(SUM(distance_km), 0) FROM FuelEntries WHERE vehicle_id = ? AND date BETWEEN ? AND ?"
+
+def fuel_totals(conn, vehicle_id, start, end):
+    first_full_month = start if start.day == 1 else (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    if end.day == calendar.monthrange(end.year, end.month)[1]:
+        last_full_month_end = end
+    else:
+        last_full_month_end = end.replace(day=1) - timedelta(days=1)
+    totals = [0, 0, 0]
+    if first_full_month <= last_full_month_end:
+        row = conn.execute(
+            FUEL_ROLLUP_TOTALS_QUERY,
+            (vehicle_id, first_full_month.strftime('%Y-%m'), last_full_month_end.strftime('%Y-%m'))
+        ).fetchone()
+        totals = list(row)
+        partial_ranges = [(start, first_full_month - timedelta(days=1)), (last_full_month_end + timedelta(days=1), end)]
+    else:
+        partial_ranges = [(start, end)]
+    for range_start, range_end in partial_ranges:
+        if range_start > range_end:
+            continue
+        row = conn.execute(
+            FUEL_ENTRY_TOTALS_QUERY,
+            (vehicle_id, range_start.isoformat(), range_end.isoformat())
+        ).fetchone()
+        totals = [total + value for total, value in zip(totals, row)]
+    return totals
+
+def build_fuel_entries_query(vehicle_id, start, end, position, limit):
+    query = "SELECT * FROM FuelEntries WHERE vehicle_id = ? AND date BETWEEN ? AND ?"
+    params = [vehicle_id, start, end]
+    if position:
+        query += " AND (date, id) < (?, ?)"
+        params.extend(position)
+    query += " ORDER BY date DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    return query, params
+
+def fuel_summary(total_tl, total_liter, total_km):
+    avg_consumption = (total_liter / total_km * 100) if total_liter > 0 and total_km > 0 else 0
+    return {
+        "total_tl": total_tl,
+        "total_liter": total_liter,
+        "total_km": total_km,
+        "avg_consumption_liter_100km": avg_consumption
+    }
+
+# --- Toplu Yakıt Aktarımı ---
+# İçe aktarılan gövde akış halinde satır satır okunur. Geçerli satırlar FUEL_IMPORT_CHUNK_SIZE'lık
+# parçalar halinde tek executemany ve tek commit ile yazılır; aylık özet de parça başına bir kez
+# güncellenir. Dışa aktarma imleçten fetchmany ile okur, tüm liste bellekte hiç kurulmaz.
+# İçe aktarma hem date/unit/amount/distance hem de dışa aktarma sütunlarını kabul eder.
+FUEL_IMPORT_MIMETYPES = ('text/csv', 'application/x-ndjson', 'application/jsonl')
+FUEL_EXPORT_COLUMNS = ('id', 'date', 'amount_tl', 'amount_liter', 'distance_km')
+FUEL_EXPORT_QUERY = f"SELECT {', '.join(FUEL_EXPORT_COLUMNS)} FROM FuelEntries WHERE vehicle_id = ? AND date BETWEEN ? AND ? ORDER BY date, id"
+
+def iter_fuel_import_records(stream, mimetype):
+    text = io.TextIOWrapper(io.BufferedReader(stream), encoding='utf-8-sig', newline='')
+    if mimetype == 'text/csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+def fuel_record_from_export(record):
+    # Dışa aktarılan satırlar (amount_tl / amount_liter / distance_km) olduğu gibi geri yüklenebilir;
+    # CSV'de boş alan '' , NDJSON'da null olarak gelir.
+    amount_tl, amount_liter = record.get('amount_tl'), record.get('amount_liter')
+    has_tl, has_liter = amount_tl not in (None, ''), amount_liter not in (None, '')
+    if has_tl == has_liter:
+        raise ValueError("amount_tl ve amount_liter alanlarından yalnızca biri dolu olmalıdır.")
+    return {"date": record.get('date'), "unit": 'TL' if has_tl else 'Litre',
+            "amount": amount_tl if has_tl else amount_liter, "distance": record.get('distance_km')}
+
+def parse_fuel_import_record(record):
+    if not isinstance(record, dict):
+        raise ValueError("Satır okunamadı.")
+    if 'unit' not in record and ('amount_tl' in record or 'amount_liter' in record):
+        record = fuel_record_from_export(record)
+    try:
+        entry_date = date.fromisoformat(str(record.get('date') or '').strip()).isoformat()
+    except ValueError:
+        raise ValueError("Geçersiz tarih.")
+    unit = str(record.get('unit') or '').strip()
+    if unit not in ('TL', 'Litre'):
+        raise ValueError("Birim TL veya Litre olmalıdır.")
+    try:
+        amount = float(record.get('amount'))
+        distance = float(record.get('distance'))
+    except (TypeError, ValueError):
+        raise ValueError("Miktar ve mesafe sayı olmalıdır.")
+    if not (amount > 0 and distance > 0 and math.isfinite(amount) and math.isfinite(distance)):
+        raise ValueError("Miktar ve mesafe pozitif olmalıdır.")
+    return entry_date, (amount if unit == 'TL' else None), (amount if unit == 'Litre' else None), distance
+
+def add_fuel_entries_to_rollup(conn, vehicle_id, entries):
+    months = {}
+    for entry_date, amount_tl, amount_liter, distance_km in entries:
+        totals = months.setdefault(entry_date[:7], [0, 0, 0, 0])
+        totals[0] += amount_tl or 0
+        totals[1] += amount_liter or 0
+        totals[2] += distance_km
+        totals[3] += 1
+    conn.executemany(
+        """
+        INSERT INTO FuelMonthlyRollup (vehicle_id, month, total_tl, total_liter, total_km, entry_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (vehicle_id, month) DO UPDATE SET
+            total_tl = total_tl + excluded.total_tl,
+            total_liter = total_liter + excluded.total_liter,
+            total_km = total_km + excluded.total_km,
+            entry_count = entry_count + excluded.entry_count
+        """,
+        [(vehicle_id, month, *totals) for month, totals in months.items()]
+    )
+
+def store_fuel_import(conn, user_id, vehicle_id, records, progress):
+    chunk = []
+    def flush():
+        conn.executemany(
+            "INSERT INTO FuelEntries (user_id, vehicle_id, date, amount_tl, amount_liter, distance_km) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, vehicle_id, *entry) for entry in chunk]
+        )
+        add_fuel_entries_to_rollup(conn, vehicle_id, chunk)
+        conn.commit()
+        progress['imported'] += len(chunk)
+        chunk.clear()
+    for line_no, record in records:
+        if progress['imported'] + len(chunk) + progress['skipped'] >= FUEL_IMPORT_MAX_ROWS:
+            progress['truncated'] = True
+            break
+        try:
+            chunk.append(parse_fuel_import_record(record))
+        except ValueError as e:
+            progress['skipped'] += 1
+            if len(progress['errors']) < FUEL_IMPORT_MAX_ERRORS:
+                progress['errors'].append({"line": line_no, "description": str(e)})
+            continue
+        if len(chunk) >= FUEL_IMPORT_CHUNK_SIZE:
+            flush()
+    if chunk:
+        flush()
+
+def fuel_export_stream(conn, vehicle_id, start, end, export_format):
+    cursor = conn.execute(FUEL_EXPORT_QUERY, (vehicle_id, start, end))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(FUEL_EXPORT_COLUMNS)
+    while True:
+        rows = cursor.fetchmany(FUEL_EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        if export_format == 'csv':
+            writer.writerows(rows)
+        else:
+            buffer.writelines(json.dumps(dict(row)) + '\n' for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+# --- Yakıt Fiyatları Önbelleği ---
+# apisepeti.com arka planda periyodik olarak çekilir; uç nokta yalnızca bellekteki son
+# geçerli kopyayı döndürür. Redis üzerindeki kilit sayesinde her periyotta tek bir worker
+# dış servise gider, diğerleri sonucu Redis'ten okur.
+class FuelPriceCache:
+    def __init__(self, url, interval):
+        self.url = url
+        self.interval = interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+
+    def _redis_load(self):
+        if not redis_pool.available():
+            return None
+        try:
+            raw = redis_client.get(FUEL_PRICES_REDIS_KEY)
+            if not raw:
+                return None
+            snapshot = json.loads(raw)
+            snapshot['body'] = snapshot['body'].encode('utf-8')
+            return snapshot
+        except (redis.exceptions.RedisError, ValueError, KeyError) as e:
+            logging.warning(f"Yakıt fiyatları Redis'ten okunamadı: {e}")
+            return None
+
+    def _redis_store(self, snapshot):
+        if not redis_pool.available():
+            return
+        try:
+            redis_client.set(FUEL_PRICES_REDIS_KEY, json.dumps(dict(snapshot, body=snapshot['body'].decode('utf-8'))))
+        except redis.exceptions.RedisError as e:
+            logging.warning(f"Yakıt fiyatları Redis'e yazılamadı: {e}")
+
+    def _acquire_refresh_lock(self):
+        if not redis_pool.available():
+            return True
+        try:
+            return bool(redis_client.set(FUEL_PRICES_REDIS_KEY + ':lock', os.getpid(), nx=True, ex=max(1, int(self.interval * 0.8))))
+        except redis.exceptions.RedisError:
+            return True
+
+    def refresh(self):
+        current = self._snapshot or self._redis_load()
+        headers = {}
+        if current:
+            if current.get('upstream_etag'):
+                headers['If-None-Match'] = current['upstream_etag']
+            if current.get('upstream_last_modified'):
+                headers['If-Modified-Since'] = current['upstream_last_modified']
+        try:
+            with outbound_timer("fuel_prices"):
+                response = requests.get(self.url, headers=headers, timeout=10)
+            if response.status_code == 304 and current:
+                snapshot = dict(current, fetched_at=time.time())
+            else:
+                response.raise_for_status()
+                body = json.dumps(response.json(), separators=(',', ':')).encode('utf-8')
+                etag = hashlib.sha1(body).hexdigest()[:20]
+                unchanged = current is not None and current['etag'] == etag
+                snapshot = {
+                    "body": body,
+                    "etag": etag,
+                    "last_modified": current['last_modified'] if unchanged else time.time(),
+                    "fetched_at": time.time(),
+                    "upstream_etag": response.headers.get('ETag'),
+                    "upstream_last_modified": response.headers.get('Last-Modified'),
+                }
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Harici yakıt API'sine ulaşılamadı, son geçerli fiyatlar kullanılacak: {e}")
+            return
+        with self._lock:
+            self._snapshot = snapshot
+        self._redis_store(snapshot)
+
+    def _run(self):
+        while True:
+            try:
+                if self._acquire_refresh_lock():
+                    self.refresh()
+                else:
+                    shared = self._redis_load()
+                    if shared:
+                        with self._lock:
+                            self._snapshot = shared
+            except Exception as e:
+                logging.error(f"Yakıt fiyatı yenileyicisinde beklenmedik hata: {e}")
+            if self._snapshot is not None:
+                self._ready.set()
+            # Henüz hiç fiyat yoksa kısa aralıklarla yeniden denenir.
+            time.sleep(self.interval if self._snapshot is not None else 5)
+
+    def get(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._snapshot = self._redis_load()
+                    self._thread = threading.Thread(target=self._run, name="fuel-prices", daemon=True)
+                    self._thread.start()
+        if self._snapshot is None:
+            self._ready.wait(FUEL_PRICES_COLD_START_WAIT)
+        return self._snapshot
+
+fuel_prices = FuelPriceCache(FUEL_PRICES_URL, FUEL_PRICES_REFRESH_INTERVAL)
+
+# --- Bakım Takvimi ---
+class MaintenanceSchedule:
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, 'r', encoding='utf-8') as f:
+            self.details = {int(k): v for k, v in json.load(f).items()}
+        self.breakpoints = sorted(self.details)
+        self.cycle_km = self.breakpoints[-1] if self.breakpoints else 120000
+
+    def options(self, current_km):
+        breakpoints = self.breakpoints
+        base_km = math.floor(current_km / self.cycle_km) * self.cycle_km
+        relative_km = current_km % self.cycle_km
+        index = bisect.bisect_right(breakpoints, relative_km)
+        previous_km_point = breakpoints[index - 1] if index > 0 else 0
+        # Tam bakım noktasındaki araç için bir önceki bakım sorulur.
+        if relative_km == previous_km_point and previous_km_point != 0 and index > 1:
+            previous_km_point = breakpoints[index - 2]
+        if index < len(breakpoints):
+            next_km_point = breakpoints[index]
+            next_service_km = base_km + next_km_point
+        else:
+            next_km_point = breakpoints[0]
+            next_service_km = base_km + self.cycle_km + next_km_point
+        question_km = base_km + previous_km_point
+        return {
+            "question_km": question_km if question_km > 0 else "ilk",
+            "missed_service": {"km": question_km, "details": self.details.get(previous_km_point, None)},
+            "next_service": {"km": next_service_km, "details": self.details.get(next_km_point, None)}
+        }
+
+maintenance_schedules = {}
+_maintenance_lock = threading.Lock()
+
+def get_maintenance_schedule(fuel):
+    path = DIZEL_MAINTENANCE_PATH if 'dizel' in fuel.lower() else BENZIN_MAINTENANCE_PATH
+    schedule = maintenance_schedules.get(path)
+    if schedule is None or schedule.mtime != os.stat(path).st_mtime:
+        with _maintenance_lock:
+            schedule = maintenance_schedules.get(path)
+            if schedule is None or schedule.mtime != os.stat(path).st_mtime:
+                schedule = MaintenanceSchedule(path)
+                maintenance_schedules[path] = schedule
+    return schedule
+
+# --- Araç Paneli ---
+OWNER_VEHICLES_QUERY = 'SELECT id, plate_number, brand, series, year, model, fuel, tax_paid_jan, tax_paid_jul, last_inspection_date FROM Vehicles WHERE user_id = ?'
+DASHBOARD_FUEL_QUERY = """
+    SELECT vehicle_id, SUM(total_tl), SUM(total_liter), SUM(total_km)
+    FROM FuelMonthlyRollup
+    WHERE vehicle_id IN (SELECT id FROM Vehicles WHERE user_id = ?) AND month BETWEEN ? AND ?
+    GROUP BY vehicle_id
+"""
+# Talepler araç kimliği taşımaz; araç, accept_quote'taki gibi marka/seri/yıl/model ile eşlenir.
+DASHBOARD_LATEST_REQUEST_QUERY = """
+    SELECT vehicle_id, vehicle_km, created_at FROM (
+        SELECT v.id AS vehicle_id, r.vehicle_km, r.created_at,
+               ROW_NUMBER() OVER (PARTITION BY v.id ORDER BY r.created_at DESC, r.id DESC) AS rn
+        FROM Vehicles v
+        JOIN Requests r ON r.user_id = v.user_id AND r.vehicle_brand = v.brand AND r.vehicle_series = v.series
+                        AND r.vehicle_year = v.year AND r.vehicle_model = v.model
+        WHERE v.user_id = ?
+    ) WHERE rn = 1
+"""
+DASHBOARD_REQUEST_COUNTS_QUERY = "SELECT status, COUNT(*) FROM Requests WHERE user_id = ? GROUP BY status"
+
+# /api/dashboard tüm araçların verisini araç sayısından bağımsız, sabit sayıda küme tabanlı
+# sorguyla toplar. Vergi ve muayene tarihleri araç satırlarından Python'da hesaplanır;
+# bakım noktası, araca ait en son talepteki kilometreden bakım takvimiyle bulunur.
+def add_years(start, years):
+    try:
+        return start.replace(year=start.year + years)
+    except ValueError:
+        return start.replace(year=start.year + years, day=28)
+
+def inspection_deadline(vehicle, today):
+    try:
+        last_inspection = date.fromisoformat(vehicle['last_inspection_date'] or '')
+    except ValueError:
+        return None
+    try:
+        vehicle_age = today.year - int(vehicle['year'])
+    except (TypeError, ValueError):
+        vehicle_age = None
+    # Yeni araçlar (en fazla 1 yaşında) 3 yılda, diğerleri 2 yılda bir muayeneye girer.
+    interval = 3 if vehicle_age is not None and vehicle_age <= 1 else 2
+    due_date = add_years(last_inspection, interval)
+    days_remaining = (due_date - today).days
+    if days_remaining < 0:
+        status = 'overdue'
+    elif days_remaining <= INSPECTION_WARNING_DAYS:
+        status = 'upcoming'
+    else:
+        status = 'ok'
+    return {"due_date": due_date.isoformat(), "days_remaining": days_remaining, "status": status}
+
+def mtv_installments(vehicle, today):
+    # MTV ocak ve temmuz aylarının sonuna kadar iki taksitte ödenir.
+    return [
+        {
+            "period": period,
+            "due_date": due_date.isoformat(),
+            "paid": bool(vehicle[f"tax_paid_{period}"]),
+            "days_remaining": (due_date - today).days
+        }
+        for period, due_date in (('jan', date(today.year, 1, 31)), ('jul', date(today.year, 7, 31)))
+    ]
+
+def month_offset(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
 def send_welcome_email(user_name, user_email):
     if not BREVO_API_KEY:
         logging.error("Brevo API anahtarı bulunamadı. E-posta gönderilemiyor.")
         return
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+    api_instance = get_brevo_api()
     subject = f"Aramıza Hoş Geldin, {user_name}!"
     html_content = f"""
     <!DOCTYPE html>
@@ -248,14 +2521,361 @@ def send_welcome_email(user_name, user_email):
     to = [{"email":user_email,"name":user_name}]
     send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(to=to, html_content=html_content, sender=sender, subject=subject)
     try:
-        api_instance.send_transac_email(send_smtp_email)
+        with outbound_timer("brevo"):
+            api_instance.send_transac_email(send_smtp_email)
         logging.info(f"Hoş geldin e-postası başarıyla gönderildi: {user_email}")
     except ApiException as e:
         logging.error(f"Brevo API hatası: E-posta gönderilemedi ({user_email}). Hata Kodu: {e.status}, Hata Sebebi: {e.reason}")
         logging.error(f"Brevo API Hata Detayı: {e.body}")
+        raise
+
+_brevo_api = None
+_brevo_lock = threading.Lock()
+
+def get_brevo_api():
+    # ApiClient ve bağlantı havuzu tüm gönderimlerde ortak kullanılır.
+    global _brevo_api
+    if _brevo_api is None:
+        with _brevo_lock:
+            if _brevo_api is None:
+                configuration = sib_api_v3_sdk.Configuration()
+                configuration.api_key['api-key'] = BREVO_API_KEY
+                if BREVO_API_HOST:
+                    configuration.host = BREVO_API_HOST
+                _brevo_api = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+    return _brevo_api
+
+# --- Arka Plan İş Kuyruğu ---
+# Dış servis yan etkileri OutboundJobs tablosuna, asıl kaydı yapan işlemle aynı transaction
+# içinde yazılır (outbox). Worker thread'leri işleri sırayla alır; başarısız işler üstel
+# bekleme ile tekrar denenir, deneme hakkı bitenler 'dead' durumunda bırakılır.
+def store_shop_location(shop_user_id, place_id):
+    # Koordinat işletmenin Place ID'si başına bir kez alınır; Place ID değişirse iş yeniden kuyruğa girer.
+    # Anahtar yoksa iş başarılı sayılıp silinmesin; kuyrukta kalır ve anahtar tanımlanınca tekrar denenir.
+    if not GOOGLE_PLACES_API_KEY:
+        raise RuntimeError(f"GOOGLE_PLACES_API_KEY tanımlı değil, işletme {shop_user_id} konumu alınamadı.")
+    result = get_place_details(place_id, "geometry")
+    if result is None:
+        raise RuntimeError(f"Places konum bilgisi alınamadı (Place ID: {place_id})")
+    location = (result.get('geometry') or {}).get('location') or {}
+    if location.get('lat') is None or location.get('lng') is None:
+        logging.warning(f"Places sonucunda koordinat yok (Place ID: {place_id}).")
+        return
+    conn = db_writer.acquire()
+    try:
+        shop = conn.execute("SELECT google_place_id FROM Shops WHERE user_id = ?", (shop_user_id,)).fetchone()
+        if shop and shop['google_place_id'] == place_id:
+            set_shop_location(conn, shop_user_id, float(location['lat']), float(location['lng']))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db_writer.release(conn)
+
+JOB_HANDLERS = {
+    "welcome_email": lambda payload: send_welcome_email(payload['name'], payload['email']),
+    "shop_location": lambda payload: store_shop_location(payload['shop_user_id'], payload['place_id']),
+}
+
+def enqueue_job(conn, kind, payload):
+    conn.execute(
+        "INSERT INTO OutboundJobs (kind, payload, next_attempt_at) VALUES (?, ?, ?)",
+        (kind, json.dumps(payload), time.time())
+    )
+
+class JobQueue:
+    def __init__(self, worker_count, max_attempts, retry_base, lease_seconds):
+        self.worker_count = worker_count
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.lease_seconds = lease_seconds
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def start(self):
+        # Gunicorn fork'undan sonra her süreç kendi worker'larını başlatır.
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            for index in range(self.worker_count):
+                threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True).start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _claim(self, conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = conn.execute(
+                """
+                SELECT * FROM OutboundJobs
+                WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'running' AND locked_until < ?)
+                ORDER BY next_attempt_at LIMIT 1
+                """,
+                (now, now)
+            ).fetchone()
+            if job:
+                conn.execute(
+                    "UPDATE OutboundJobs SET status = 'running', attempts = attempts + 1, locked_until = ? WHERE id = ?",
+                    (now + self.lease_seconds, job['id'])
+                )
+            conn.commit()
+            return job
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _finish(self, conn, job, error):
+        attempts = job['attempts'] + 1
+        if error is None:
+            conn.execute("DELETE FROM OutboundJobs WHERE id = ?", (job['id'],))
+        elif attempts >= self.max_attempts:
+            conn.execute("UPDATE OutboundJobs SET status = 'dead', last_error = ? WHERE id = ?", (error, job['id']))
+            logging.error(f"İş {job['id']} ({job['kind']}) {attempts} denemeden sonra dead-letter'a alındı: {error}")
+        else:
+            delay = min(self.retry_base * (2 ** (attempts - 1)), 3600)
+            conn.execute(
+                "UPDATE OutboundJobs SET status = 'pending', next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, job['id'])
+            )
+            logging.warning(f"İş {job['id']} ({job['kind']}) başarısız, {delay:.0f} sn sonra tekrar denenecek: {error}")
+        conn.commit()
+
+    def run_once(self):
+        # Dış servis çağrısı sürerken yazıcı bağlantı tutulmaz.
+        conn = db_writer.acquire()
+        try:
+            job = self._claim(conn)
+        finally:
+            db_writer.release(conn)
+        if job is None:
+            return False
+        try:
+            JOB_HANDLERS[job['kind']](json.loads(job['payload']))
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        conn = db_writer.acquire()
+        try:
+            self._finish(conn, job, error)
+        finally:
+            db_writer.release(conn)
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logging.error(f"İş kuyruğu worker hatası: {e}")
+            self._wakeup.wait(JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def stats(self):
+        conn = db_pool.acquire()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM OutboundJobs GROUP BY status").fetchall()
+            return {row[0]: row[1] for row in rows}
+        finally:
+            db_pool.release(conn)
+
+job_queue = JobQueue(JOB_WORKER_THREADS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_LEASE_SECONDS)
+
+@app.before_request
+def start_background_workers():
+    job_queue.start()
+    shop_reputation.start()
+
+# --- Canlı Olaylar (SSE) ---
+# Talep, teklif ve randevu değişiklikleri commit sonrası ilgili kullanıcıların Redis kanalına
+# yayınlanır. Olaylar yalnızca kimlik ve durum taşır; istemci değişen kayıtları listeleme
+# uçlarından ids= parametresiyle çeker, tüm listeyi yeniden yüklemez.
+def publish_event(user_ids, event_type, **payload):
+    if not redis_pool.available():
+        return
+    message = json.dumps(dict(payload, type=event_type, at=time.time()))
+    try:
+        for user_id in set(user_ids):
+            redis_client.publish(f"{EVENTS_CHANNEL_PREFIX}{user_id}", message)
+    except redis.exceptions.RedisError as e:
+        logging.warning(f"Olay yayınlanamadı ({event_type}): {e}")
+
+def event_stream(pubsub):
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < SSE_MAX_STREAM_SECONDS:
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_INTERVAL)
+            if message is not None:
+                data = message['data'].decode('utf-8')
+                yield f"event: {json.loads(data)['type']}\ndata: {data}\n\n"
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+    except redis.exceptions.RedisError as e:
+        logging.warning(f"Olay akışı kesildi: {e}")
+    finally:
+        pubsub.close()
+
+# Her açık akış bir sunucu iş parçacığını SSE_MAX_STREAM_SECONDS boyunca tutar; bu yüzden
+# süreç başına toplam ve kullanıcı başına akış sayısı sınırlıdır. Yuva, yanıt kapandığında
+# (istemci ayrıldığında ya da akış süresi dolduğunda) serbest bırakılır.
+class EventStreamSlots:
+    def __init__(self, max_streams, max_per_user):
+        self.max_streams = max_streams
+        self.max_per_user = max_per_user
+        self._lock = threading.Lock()
+        self._per_user = {}
+        self._rejected = 0
+
+    def acquire(self, user_id):
+        with self._lock:
+            if sum(self._per_user.values()) >= self.max_streams or self._per_user.get(user_id, 0) >= self.max_per_user:
+                self._rejected += 1
+                return False
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+            return True
+
+    def release(self, user_id):
+        with self._lock:
+            remaining = self._per_user.get(user_id, 0) - 1
+            if remaining > 0:
+                self._per_user[user_id] = remaining
+            else:
+                self._per_user.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"open": sum(self._per_user.values()), "users": len(self._per_user), "max_streams": self.max_streams, "max_per_user": self.max_per_user, "rejected": self._rejected}
+
+event_streams = EventStreamSlots(SSE_MAX_STREAMS, SSE_MAX_STREAMS_PER_USER)
+
+# --- Değişiklik Sürümleri ve Koşullu GET ---
+# Her kullanıcının Redis'te tekdüze artan bir değişiklik sürümü vardır; yazma uçları commit
+# sonrası etkilenen kullanıcıların sürümünü artırır. Listeleme uçlarının ETag'i bu sürümden
+# türetilir, böylece değişmemiş bir listenin yeniden doğrulanması SQL çalıştırmadan tek bir
+# Redis GET ile 304 döner. Redis'e ulaşılamazsa ETag üretilmez ve uçlar normal çalışır.
+def bump_change_versions(user_ids):
+    if not redis_pool.available():
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in set(user_ids):
+            key = f"{CHANGE_VERSION_PREFIX}{user_id}"
+            # Anahtar silinmişse sayaç eski ETag'lerle çakışmasın diye zaman damgasından başlar.
+            pipe.set(key, int(time.time() * 1000), nx=True)
+            pipe.incr(key)
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logging.warning(f"Değişiklik sürümü artırılamadı: {e}")
+
+def notify_change(user_ids, event_type, **payload):
+    bump_change_versions(user_ids)
+    publish_event(user_ids, event_type, **payload)
+
+def related_user_ids(conn, user_id):
+    rows = conn.execute(
+        "SELECT user_id FROM Requests WHERE shop_user_id = ? UNION SELECT shop_user_id FROM Requests WHERE user_id = ?",
+        (user_id, user_id)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def user_change_version(user_id):
+    key = f"{CHANGE_VERSION_PREFIX}{user_id}"
+    version = redis_client.get(key)
+    if version is None:
+        redis_client.set(key, int(time.time() * 1000), nx=True)
+        version = redis_client.get(key)
+    return version.decode('ascii')
+
+def user_versioned_etag(places_enriched=False, daily=False):
+    if not redis_pool.available() or 'user_id' not in session:
+        return None
+    try:
+        version = user_change_version(session['user_id'])
+    except redis.exceptions.RedisError as e:
+        logging.warning(f"Değişiklik sürümü okunamadı: {e}")
+        return None
+    parts = [version, str(session['user_id']), str(session.get('user_type')), request.full_path]
+    if places_enriched:
+        # Google Places'ten gelen alanlar yazma olmadan da değişebilir; ETag önbellek süresiyle döner.
+        parts.append(str(int(time.time() // PLACES_CACHE_TTL)))
+    if daily:
+        # Kalan gün gibi tarihe bağlı alanlar için ETag gün değişince yenilenir.
+        parts.append(date.today().isoformat())
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+def user_versioned(places_enriched=False, daily=False):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = user_versioned_etag(places_enriched, daily) if request.method == 'GET' else None
+            if etag and request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if not etag or response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+# --- İstek Ölçüm Kancaları ---
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_totals = {"sql_statements": 0, "sql_seconds": 0.0, "redis_seconds": 0.0, "outbound_seconds": 0.0}
+    g.metrics_profiler = request_profiler.start(metrics_endpoint())
+
+def record_request_metrics(response):
+    if 'metrics_started' not in g:
+        return response
+    endpoint = metrics_endpoint()
+    labels = {"endpoint": endpoint, "method": request.method}
+    metrics.observe("aracabak_http_request_duration_seconds", labels, time.perf_counter() - g.metrics_started)
+    metrics.inc("aracabak_http_requests_total", dict(labels, status=response.status_code))
+    totals = g.metrics_totals
+    metrics.observe("aracabak_request_sql_statements", labels, totals["sql_statements"], buckets=COUNT_BUCKETS)
+    for key in ("sql_seconds", "redis_seconds", "outbound_seconds"):
+        metrics.inc(f"aracabak_request_{key}_total", {"endpoint": endpoint}, totals[key])
+    return response
+
+def finish_request_profile(exception):
+    profiler = g.pop('metrics_profiler', None)
+    if profiler is not None:
+        request_profiler.finish(profiler, metrics_endpoint())
+
+if METRICS_ENABLED:
+    # Ölçüm kancası limiter'dan önce çalışsın ki 429 yanıtları da sayılsın.
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request_metrics)
+    app.after_request(record_request_metrics)
+    app.teardown_request(finish_request_profile)
+
+# Ölçüm ve istatistik uçları yalnızca METRICS_TOKEN ile açılır; jeton tanımlı değilse kapalıdır.
+def metrics_authorized():
+    if not METRICS_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), f"Bearer {METRICS_TOKEN}".encode('utf-8'))
+
+if METRICS_ENABLED and not METRICS_TOKEN:
+    logging.warning("METRICS_TOKEN tanımlı değil; /metrics, /metrics/profiles ve /api/internal/stats 403 döndürecek.")
 
 with app.app_context():
     init_db()
+
+# Statik yanıtlar ilk istekten önce hazırlanır.
+cities_payload = load_cities_payload()
+get_catalogue_store()
     
 # --- API Endpoint'leri ---
 @app.route('/api/auth/status')
@@ -281,50 +2901,127 @@ def get_config():
         "googleMapsApiKey": GOOGLE_MAPS_API_KEY
     })
 
+@app.route('/api/internal/stats')
+@limiter.limit("30 per minute")
+def internal_stats():
+    if not metrics_authorized():
+        return jsonify({"description": "Yetkisiz işlem."}), 403
+    return jsonify({"places_cache": places_cache.stats(), "db_pool": db_pool.stats(), "db_writer": db_writer.stats(), "group_commit": group_commit.stats() if group_commit else None, "redis_pool": redis_pool.stats(), "redis_pubsub_pool": pubsub_pool.stats(), "jobs": job_queue.stats(), "shop_reputation": shop_reputation.stats(), "event_streams": event_streams.stats()})
+
+@app.route('/metrics')
+@limiter.exempt
+def prometheus_metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"description": "Ölçümler kapalı."}), 404
+    if not metrics_authorized():
+        return jsonify({"description": "Yetkisiz işlem."}), 403
+    gauges = []
+    for prefix, stats in (("db_pool", db_pool.stats()), ("db_writer", db_writer.stats()), ("group_commit", group_commit.stats() if group_commit else {}), ("redis_pool", redis_pool.stats()), ("redis_pubsub_pool", pubsub_pool.stats()), ("places_cache", places_cache.stats()), ("shop_reputation", shop_reputation.stats()), ("event_streams", event_streams.stats())):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                gauges.append((f"aracabak_{prefix}_{key}", int(value) if isinstance(value, bool) else value))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profiles', methods=['GET', 'POST'])
+@limiter.exempt
+def profile_dumps():
+    # Profil örnekleri süreç başınadır; POST yalnızca isteği alan worker'ı kurar.
+    if not METRICS_ENABLED:
+        return jsonify({"description": "Ölçümler kapalı."}), 404
+    if not metrics_authorized():
+        return jsonify({"description": "Yetkisiz işlem."}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            count = int(data.get('count', 10))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= 1000:
+            return jsonify({"description": "count 1 ile 1000 arasında olmalıdır."}), 400
+        request_profiler.arm(count, data.get('endpoint'))
+        return jsonify({"status": "success", "armed": count, "endpoint": data.get('endpoint')}), 202
+    name = request.args.get('name')
+    if name:
+        try:
+            return Response(request_profiler.summary(name), mimetype='text/plain')
+        except (OSError, EOFError, ValueError):
+            return jsonify({"description": "Profil bulunamadı."}), 404
+    return jsonify({"profiles": request_profiler.dumps()})
+
 @app.route('/api/fuel_prices')
-@limiter.limit("10 per hour")
+@limiter.limit("60 per minute")
 def get_fuel_prices():
-    try:
-        url = "https://apisepeti.com/wp-json/petrol/v1/fiyatlar"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        return jsonify(data)
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Harici yakıt API'sine ulaşılamadı: {e}")
+    snapshot = fuel_prices.get()
+    if snapshot is None:
         return jsonify({"description": "Yakıt fiyatları servisine şu anda ulaşılamıyor."}), 503
-    except Exception as e:
-        logging.error(f"Yakıt fiyatları alınırken beklenmedik bir hata oluştu: {e}")
-        return jsonify({"description": "Sunucu hatası."}), 500
+    response = Response(snapshot['body'], mimetype='application/json')
+    response.set_etag(snapshot['etag'])
+    response.last_modified = datetime.fromtimestamp(int(snapshot['last_modified']), tz=timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
+
+@app.route('/api/events')
+@limiter.limit("20 per minute")
+def stream_events():
+    if 'user_id' not in session: return jsonify({"description": "Yetkilendirme gerekli."}), 401
+    if not pubsub_pool.available():
+        return jsonify({"description": "Canlı bildirim servisi şu anda kullanılamıyor."}), 503
+    user_id = session['user_id']
+    if not event_streams.acquire(user_id):
+        return jsonify({"description": "Çok fazla açık canlı bildirim bağlantısı var."}), 429
+    pubsub = pubsub_client.pubsub()
+    try:
+        pubsub.subscribe(f"{EVENTS_CHANNEL_PREFIX}{user_id}")
+    except redis.exceptions.RedisError as e:
+        pubsub.close()
+        event_streams.release(user_id)
+        logging.warning(f"Olay kanalına abone olunamadı: {e}")
+        return jsonify({"description": "Canlı bildirim servisi şu anda kullanılamıyor."}), 503
+
+    def close_stream():
+        # Üreteç hiç başlamadan kapatılırsa finally bloğu çalışmaz; temizlik burada da yapılır.
+        pubsub.close()
+        event_streams.release(user_id)
+
+    response = Response(event_stream(pubsub), mimetype='text/event-stream')
+    response.call_on_close(close_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/requests', methods=['GET'])
 @limiter.limit("30 per minute")
+@user_versioned(places_enriched=True)
 def get_requests():
     if 'user_id' not in session: return jsonify({"description": "Yetkilendirme gerekli."}), 401
+    user_id = session['user_id']
+    user_type = session['user_type']
+    if user_type == 'business':
+        field_map = BUSINESS_REQUEST_FIELDS
+        from_clause = BUSINESS_REQUESTS_FROM
+        owner_column = 'shop_user_id'
+    elif user_type == 'owner':
+        field_map = OWNER_REQUEST_FIELDS
+        from_clause = OWNER_REQUESTS_FROM
+        owner_column = 'user_id'
+    else:
+        return jsonify([])
+    try:
+        fields, statuses, limit, position, ids = parse_listing_args(field_map)
+    except ValueError as e:
+        return jsonify({"description": str(e)}), 400
     conn = get_db_connection()
     try:
-        user_id = session['user_id']
-        user_type = session['user_type']
-
-        if user_type == 'business':
-            query = "SELECT r.*, u.name as customer_name, u.phone_number as customer_phone, q.total_cost FROM Requests r JOIN Users u ON r.user_id = u.id LEFT JOIN Quotes q ON r.id = q.request_id WHERE r.shop_user_id = ? ORDER BY r.created_at DESC"
-            requests_cursor = conn.execute(query, (user_id,))
-        elif user_type == 'owner':
-            query = """
-                SELECT r.*, u.name as shop_name, s.phone as shop_phone, r.shop_google_place_id,
-                       q.parts_cost, q.labor_cost, q.total_cost, q.notes as quote_notes, q.id as quote_id
-                FROM Requests r
-                JOIN Users u ON r.shop_user_id = u.id
-                LEFT JOIN Shops s ON r.shop_user_id = s.user_id
-                LEFT JOIN Quotes q ON r.id = q.request_id
-                WHERE r.user_id = ? ORDER BY r.created_at DESC
-            """
-            requests_cursor = conn.execute(query, (user_id,))
-        else:
-            return jsonify([])
-        
+        enrich = user_type == 'owner' and ('shop_name' in fields or 'shop_phone' in fields)
+        select_list = select_list_for(field_map, fields, required=['shop_google_place_id'] if enrich else ())
+        query, params = build_listing_query(select_list, from_clause, 'r', owner_column, user_id, statuses, position, limit, ids)
+        rows = conn.execute(query, params).fetchall()
+        place_details = {}
+        if enrich:
+            place_details = get_many_place_details([row['shop_google_place_id'] for row in rows[:limit]], "name,formatted_phone_number")
         requests_list = []
-        for row in requests_cursor.fetchall():
+        for row in rows[:limit]:
             req = dict(row)
             if req.get('selected_parts'):
                 req['selected_parts'] = json.loads(req['selected_parts'])
@@ -341,28 +3038,20 @@ def get_requests():
                 for key in ['parts_cost', 'labor_cost', 'total_cost', 'quote_notes', 'quote_id']:
                     req.pop(key, None)
 
-                if req.get('shop_google_place_id') and GOOGLE_PLACES_API_KEY:
-                    try:
-                        place_id = req['shop_google_place_id']
-                        fields = "name,formatted_phone_number"
-                        url = f"https://maps.googleapis.com/maps/api/place/details/json?place_id={place_id}&fields={fields}&key={GOOGLE_PLACES_API_KEY}&language=tr"
-                        response = requests.get(url, timeout=5)
-                        place_data = response.json()
-                        if place_data.get("status") == "OK" and "result" in place_data:
-                            result = place_data['result']
-                            req['shop_name'] = result.get('name', req.get('shop_name'))
-                            req['shop_phone'] = result.get('formatted_phone_number', req.get('shop_phone'))
-                    except requests.exceptions.RequestException as e:
-                        logging.error(f"Google Places API isteği (talep listesi için) başarısız oldu: {e}")
+                result = place_details.get(req.get('shop_google_place_id'))
+                if result and 'shop_name' in req:
+                    req['shop_name'] = result.get('name', req['shop_name'])
+                if result and 'shop_phone' in req:
+                    req['shop_phone'] = result.get('formatted_phone_number', req['shop_phone'])
+                if 'shop_google_place_id' not in fields:
+                    req.pop('shop_google_place_id', None)
             requests_list.append(req)
 
-        return jsonify(requests_list)
+        return listing_response(requests_list, rows, limit)
 
     except Exception as e:
         logging.error(f"Talep listeleme hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 
 @app.route('/api/requests', methods=['POST'])
@@ -378,18 +3067,17 @@ def create_request():
             return jsonify({"description": "Eksik bilgi."}), 400
         vehicle = data['vehicle']
         selected_parts_json = json.dumps(data['selected_parts'])
-        conn.execute(
+        cursor = conn.execute(
             "INSERT INTO Requests (user_id, shop_user_id, shop_google_place_id, vehicle_brand, vehicle_series, vehicle_year, vehicle_fuel, vehicle_model, vehicle_km, city, maintenance_km, selected_parts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (user_id, data['shop_user_id'], data['shop_google_place_id'], vehicle['brand'], vehicle['series'], vehicle['year'], vehicle['fuel'], vehicle['model'], vehicle['km'], data['city'], data['maintenance_km'], selected_parts_json)
         )
         conn.commit()
+        notify_change([user_id, data['shop_user_id']], "request.created", request_id=cursor.lastrowid, status='pending')
         return jsonify({"status": "success", "description": "Talep iletildi."}), 201
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Talep oluşturma hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/requests/<int:request_id>', methods=['DELETE'])
 @limiter.limit("30 per minute")
@@ -401,9 +3089,9 @@ def delete_request(request_id):
         user_type = session['user_type']
 
         if user_type == 'business':
-            req_to_delete = conn.execute('SELECT id FROM Requests WHERE id = ? AND shop_user_id = ?', (request_id, user_id)).fetchone()
+            req_to_delete = conn.execute('SELECT id, user_id, shop_user_id FROM Requests WHERE id = ? AND shop_user_id = ?', (request_id, user_id)).fetchone()
         elif user_type == 'owner':
-            req_to_delete = conn.execute('SELECT id FROM Requests WHERE id = ? AND user_id = ?', (request_id, user_id)).fetchone()
+            req_to_delete = conn.execute('SELECT id, user_id, shop_user_id FROM Requests WHERE id = ? AND user_id = ?', (request_id, user_id)).fetchone()
         else:
             req_to_delete = None
         
@@ -414,14 +3102,13 @@ def delete_request(request_id):
         conn.execute('DELETE FROM Quotes WHERE request_id = ?', (request_id,))
         conn.execute('DELETE FROM Requests WHERE id = ?', (request_id,))
         conn.commit()
+        notify_change([req_to_delete['user_id'], req_to_delete['shop_user_id']], "request.deleted", request_id=request_id)
         return jsonify({"status": "success", "description": "Talep silindi."})
 
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Talep silme hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/requests/<int:request_id>/quote', methods=['POST', 'PUT', 'DELETE'])
 @limiter.limit("30 per minute")
@@ -447,7 +3134,7 @@ def manage_quote(request_id):
 
             total_cost = parts_cost + labor_cost
             
-            request_to_quote = conn.execute("SELECT id FROM Requests WHERE id = ? AND shop_user_id = ?", (request_id, user_id)).fetchone()
+            request_to_quote = conn.execute("SELECT id, user_id FROM Requests WHERE id = ? AND shop_user_id = ?", (request_id, user_id)).fetchone()
             if not request_to_quote:
                 return jsonify({"description": "Talep bulunamadı veya bu talebe teklif verme yetkiniz yok."}), 404
 
@@ -458,6 +3145,7 @@ def manage_quote(request_id):
                 )
                 conn.execute("UPDATE Requests SET status = 'quoted' WHERE id = ?", (request_id,))
                 conn.commit()
+                notify_change([request_to_quote['user_id'], user_id], "quote.created", request_id=request_id, status='quoted')
                 return jsonify({"status": "success", "description": "Teklif başarıyla gönderildi."}), 201
             
             elif request.method == 'PUT':
@@ -466,19 +3154,21 @@ def manage_quote(request_id):
                     (parts_cost, labor_cost, total_cost, notes, request_id, user_id)
                 )
                 conn.commit()
+                notify_change([request_to_quote['user_id'], user_id], "quote.updated", request_id=request_id, status='quoted')
                 return jsonify({"status": "success", "description": "Teklif başarıyla güncellendi."})
 
         if request.method == 'DELETE':
             if user_type != 'owner':
                 return jsonify({"description": "Bu işlemi yapmaya yetkiniz yok."}), 403
 
-            request_owner = conn.execute("SELECT user_id FROM Requests WHERE id = ?", (request_id,)).fetchone()
+            request_owner = conn.execute("SELECT user_id, shop_user_id FROM Requests WHERE id = ?", (request_id,)).fetchone()
             if not request_owner or request_owner['user_id'] != user_id:
                 return jsonify({"description": "Bu talebi yönetme yetkiniz yok."}), 404
 
             conn.execute("DELETE FROM Quotes WHERE request_id = ?", (request_id,))
             conn.execute("UPDATE Requests SET status = 'pending' WHERE id = ?", (request_id,))
             conn.commit()
+            notify_change([user_id, request_owner['shop_user_id']], "quote.rejected", request_id=request_id, status='pending')
             
             return jsonify({"status": "success", "description": "Teklif başarıyla reddedildi."})
 
@@ -489,8 +3179,6 @@ def manage_quote(request_id):
         if conn: conn.rollback()
         logging.error(f"Teklif yönetimi hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
         
 @app.route('/api/vehicles/<int:vehicle_id>/fuel_entries', methods=['GET', 'POST'])
 @limiter.limit("60 per minute")
@@ -508,85 +3196,198 @@ def manage_fuel_entries(vehicle_id):
             data = request.get_json()
             if not all(data.get(field) for field in ['date', 'amount', 'unit', 'distance']):
                 return jsonify({"description": "Tüm alanlar zorunludur."}), 400
-            
-            amount_tl = data.get('amount') if data.get('unit') == 'TL' else None
-            amount_liter = data.get('amount') if data.get('unit') == 'Litre' else None
-
-            conn.execute(
-                "INSERT INTO FuelEntries (user_id, vehicle_id, date, amount_tl, amount_liter, distance_km) VALUES (?, ?, ?, ?, ?, ?)",
-                (session['user_id'], vehicle_id, data['date'], amount_tl, amount_liter, data['distance'])
-            )
-            conn.commit()
+            # Tekli giriş de içe aktarmayla aynı kurallardan geçer; geçersiz tarih aylık özeti bozmasın.
+            try:
+                entry_date, amount_tl, amount_liter, distance = parse_fuel_import_record(data)
+            except ValueError as e:
+                return jsonify({"description": str(e)}), 400
+            user_id = session['user_id']
+
+            def insert_entry(write_conn):
+                write_conn.execute(
+                    "INSERT INTO FuelEntries (user_id, vehicle_id, date, amount_tl, amount_liter, distance_km) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, vehicle_id, entry_date, amount_tl, amount_liter, distance)
+                )
+                add_fuel_entry_to_rollup(write_conn, vehicle_id, entry_date, amount_tl, amount_liter, distance)
+            run_write(insert_entry)
+            bump_change_versions([session['user_id']])
             return jsonify({"status": "success", "description": "Yakıt verisi eklendi."}), 201
 
         if request.method == 'GET':
-            start_date = request.args.get('start_date')
-            end_date = request.args.get('end_date')
+            try:
+                start_date = date.fromisoformat(request.args.get('start_date', ''))
+                end_date = date.fromisoformat(request.args.get('end_date', ''))
+            except ValueError:
+                return jsonify({"description": "Geçerli bir tarih aralığı gereklidir."}), 400
 
-            query = "SELECT * FROM FuelEntries WHERE vehicle_id = ? AND date BETWEEN ? AND ? ORDER BY date DESC"
-            entries_cursor = conn.execute(query, (vehicle_id, start_date, end_date))
-            entries = [dict(row) for row in entries_cursor.fetchall()]
-            
-            total_tl = sum(e['amount_tl'] for e in entries if e['amount_tl'])
-            total_liter = sum(e['amount_liter'] for e in entries if e['amount_liter'])
-            total_km = sum(e['distance_km'] for e in entries if e['distance_km'])
-            
-            avg_consumption = (total_liter / total_km * 100) if total_liter > 0 and total_km > 0 else 0
-            
-            return jsonify({
-                "entries": entries,
-                "summary": {
-                    "total_tl": total_tl,
-                    "total_liter": total_liter,
-                    "total_km": total_km,
-                    "avg_consumption_liter_100km": avg_consumption
-                }
-            })
+            result = {"summary": fuel_summary(*fuel_totals(conn, vehicle_id, start_date, end_date))}
+
+            if request.args.get('include_entries') in ('1', 'true'):
+                try:
+                    limit = int(request.args.get('limit', FUEL_ENTRIES_DEFAULT_LIMIT))
+                    position = decode_listing_cursor(request.args['cursor']) if request.args.get('cursor') else None
+                except ValueError:
+                    return jsonify({"description": "Geçersiz sayfalama parametresi."}), 400
+                limit = max(1, min(limit, FUEL_ENTRIES_MAX_LIMIT))
+                query, params = build_fuel_entries_query(vehicle_id, start_date.isoformat(), end_date.isoformat(), position, limit)
+                rows = conn.execute(query, params).fetchall()
+                result["entries"] = [dict(row) for row in rows[:limit]]
+                if len(rows) > limit:
+                    result["next_cursor"] = encode_listing_cursor(rows[limit - 1]['date'], rows[limit - 1]['id'])
+
+            return jsonify(result)
 
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Yakıt girişi yönetimi hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
+
+@app.route('/api/vehicles/<int:vehicle_id>/fuel_entries/import', methods=['POST'])
+@limiter.limit("5 per minute")
+def import_fuel_entries(vehicle_id):
+    if 'user_id' not in session:
+        return jsonify({"description": "Yetkilendirme gerekli."}), 401
+    if request.mimetype not in FUEL_IMPORT_MIMETYPES:
+        return jsonify({"description": "Gövde text/csv veya application/x-ndjson olmalıdır."}), 415
+
+    conn = get_db_connection()
+    progress = {"imported": 0, "skipped": 0, "errors": [], "truncated": False}
+    try:
+        vehicle = conn.execute('SELECT id FROM Vehicles WHERE id = ? AND user_id = ?', (vehicle_id, session['user_id'])).fetchone()
+        if not vehicle:
+            return jsonify({"description": "Araç bulunamadı veya yetkiniz yok."}), 404
+        store_fuel_import(conn, session['user_id'], vehicle_id, iter_fuel_import_records(request.stream, request.mimetype), progress)
+        if progress['imported']:
+            bump_change_versions([session['user_id']])
+        return jsonify(dict(progress, status="success")), 201 if progress['imported'] else 200
+    except Exception as e:
+        if conn: conn.rollback()
+        if progress['imported']:
+            bump_change_versions([session['user_id']])
+        logging.error(f"Yakıt içe aktarma hatası: {e}\n{traceback.format_exc()}")
+        # Önceki parçalar commit edilmiş olabilir; istemci kaçıncı satırdan devam edeceğini bilmeli.
+        return jsonify({"description": "Sunucu hatası.", "imported": progress['imported']}), 500
+
+@app.route('/api/vehicles/<int:vehicle_id>/fuel_entries/export')
+@limiter.limit("10 per minute")
+def export_fuel_entries(vehicle_id):
+    if 'user_id' not in session:
+        return jsonify({"description": "Yetkilendirme gerekli."}), 401
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({"description": "Biçim csv veya ndjson olmalıdır."}), 400
+    try:
+        start_date = date.fromisoformat(request.args['start_date']).isoformat() if request.args.get('start_date') else '0000-01-01'
+        end_date = date.fromisoformat(request.args['end_date']).isoformat() if request.args.get('end_date') else '9999-12-31'
+    except ValueError:
+        return jsonify({"description": "Geçerli bir tarih aralığı gereklidir."}), 400
+
+    vehicle = get_db_connection().execute('SELECT id FROM Vehicles WHERE id = ? AND user_id = ?', (vehicle_id, session['user_id'])).fetchone()
+    if not vehicle:
+        return jsonify({"description": "Araç bulunamadı veya yetkiniz yok."}), 404
+    # Akış istek bağlamından uzun yaşar; bu yüzden havuzdan ayrı bir bağlantı alınır ve
+    # yanıt kapanınca (istemci yarıda bıraksa da) havuza geri verilir.
+    export_conn = db_pool.acquire()
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(fuel_export_stream(export_conn, vehicle_id, start_date, end_date, export_format), mimetype=mimetype)
+    response.call_on_close(lambda: db_pool.release(export_conn))
+    response.headers['Content-Disposition'] = f'attachment; filename="yakit_{vehicle_id}.{export_format}"'
+    return response
+
+@app.route('/api/dashboard')
+@limiter.limit("30 per minute")
+@user_versioned(daily=True)
+def get_dashboard():
+    if 'user_id' not in session: return jsonify({"description": "Yetkilendirme gerekli."}), 401
+    if session.get('user_type') != 'owner':
+        return jsonify({"description": "Araç paneli yalnızca araç sahipleri içindir."}), 403
+    try:
+        fuel_months = int(request.args.get('fuel_months', DASHBOARD_DEFAULT_FUEL_MONTHS))
+    except ValueError:
+        return jsonify({"description": "Geçersiz ay sayısı."}), 400
+    if not 1 <= fuel_months <= DASHBOARD_MAX_FUEL_MONTHS:
+        return jsonify({"description": f"fuel_months 1 ile {DASHBOARD_MAX_FUEL_MONTHS} arasında olmalıdır."}), 400
+
+    user_id = session['user_id']
+    today = date.today()
+    fuel_from = month_offset(today.replace(day=1), 1 - fuel_months)
+    conn = get_db_connection()
+    try:
+        vehicles = conn.execute(OWNER_VEHICLES_QUERY, (user_id,)).fetchall()
+        fuel_rows = conn.execute(DASHBOARD_FUEL_QUERY, (user_id, fuel_from.strftime('%Y-%m'), today.strftime('%Y-%m'))).fetchall()
+        latest_rows = conn.execute(DASHBOARD_LATEST_REQUEST_QUERY, (user_id,)).fetchall()
+        request_counts = conn.execute(DASHBOARD_REQUEST_COUNTS_QUERY, (user_id,)).fetchall()
+
+        fuel_by_vehicle = {row[0]: fuel_summary(*row[1:]) for row in fuel_rows}
+        latest_by_vehicle = {row['vehicle_id']: row for row in latest_rows}
+        result = []
+        for vehicle in vehicles:
+            item = dict(vehicle)
+            item['mtv'] = mtv_installments(vehicle, today)
+            item['inspection'] = inspection_deadline(vehicle, today)
+            item['fuel_summary'] = fuel_by_vehicle.get(vehicle['id'], fuel_summary(0, 0, 0))
+            item['maintenance'] = None
+            latest = latest_by_vehicle.get(vehicle['id'])
+            if latest is not None and vehicle['fuel']:
+                try:
+                    current_km = int(float(latest['vehicle_km']))
+                    item['maintenance'] = dict(
+                        get_maintenance_schedule(vehicle['fuel']).options(current_km),
+                        current_km=current_km, reported_at=latest['created_at']
+                    )
+                except (TypeError, ValueError, OSError) as e:
+                    logging.warning(f"Araç {vehicle['id']} için bakım noktası hesaplanamadı: {e}")
+            result.append(item)
+
+        return jsonify({
+            "vehicles": result,
+            "fuel_period": {"start_month": fuel_from.strftime('%Y-%m'), "end_month": today.strftime('%Y-%m')},
+            "requests": {row[0]: row[1] for row in request_counts}
+        })
+    except Exception as e:
+        logging.error(f"Araç paneli hatası: {e}\n{traceback.format_exc()}")
+        return jsonify({"description": "Sunucu hatası."}), 500
 
 @app.route('/api/find_shops')
 @limiter.limit("60 per minute")
 def find_shops():
     city = request.args.get('city')
     brand = request.args.get('brand')
-    if not all([city, brand]):
+    nearby = 'lat' in request.args or 'lng' in request.args
+    sort = request.args.get('sort', 'distance' if nearby else None)
+    if not brand or not brand.strip() or not (city or nearby):
         return jsonify({"description": "Şehir ve marka bilgisi gereklidir."}), 400
+    brand = normalize_brand(brand)
+    if sort not in (None, 'rating', 'distance') or (sort == 'distance' and not nearby):
+        return jsonify({"description": "Geçersiz sıralama."}), 400
+    if nearby:
+        try:
+            latitude, longitude, radius, limit, position = parse_nearby_args(sort)
+        except ValueError as e:
+            return jsonify({"description": str(e)}), 400
     conn = get_db_connection()
     try:
-        query = "SELECT u.id as shop_user_id, u.name, s.phone, s.city, s.google_place_id FROM Shops s JOIN Users u ON s.user_id = u.id WHERE s.city = ? AND s.serviced_brands LIKE ?"
-        brand_search_term = f"%{brand}%"
-        shops_cursor = conn.execute(query, (city, brand_search_term))
-        shops = [dict(row) for row in shops_cursor.fetchall()]
-        for shop in shops:
-            if shop.get('google_place_id') and GOOGLE_PLACES_API_KEY:
-                try:
-                    place_id = shop['google_place_id']
-                    fields = "name,rating,user_ratings_total,reviews,formatted_phone_number,url"
-                    url = f"https://maps.googleapis.com/maps/api/place/details/json?place_id={place_id}&fields={fields}&key={GOOGLE_PLACES_API_KEY}&language=tr"
-                    response = requests.get(url, timeout=5)
-                    place_data = response.json()
-                    if place_data.get("status") == "OK" and "result" in place_data:
-                        result = place_data['result']
-                        shop['name'] = result.get('name', shop.get('name'))
-                        shop['rating'] = result.get('rating', 0)
-                        shop['user_ratings_total'] = result.get('user_ratings_total', 0)
-                        shop['reviews'] = result.get('reviews', [])[:2]
-                        shop['formatted_phone_number'] = result.get('formatted_phone_number', shop.get('phone'))
-                        shop['url'] = result.get('url')
-                except requests.exceptions.RequestException as e:
-                    logging.error(f"Google Places API isteği başarısız oldu (Place ID: {place_id}): {e}")
-        return jsonify(shops)
+        next_cursor = None
+        if nearby:
+            max_lat, min_lat, max_lng, min_lng = nearby_bounding_box(latitude, longitude, radius)
+            rows = conn.execute(
+                NEARBY_SHOPS_BY_RATING_QUERY if sort == 'rating' else NEARBY_SHOPS_QUERY,
+                (latitude, longitude, brand, max_lat, min_lat, max_lng, min_lng, radius, *position, limit + 1)
+            ).fetchall()
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                key = (last['distance'], last['shop_user_id'])
+                next_cursor = encode_nearby_cursor((last['rating_key'], *key) if sort == 'rating' else key)
+            rows = rows[:limit]
+        else:
+            rows = conn.execute(CITY_SHOPS_BY_RATING_QUERY if sort == 'rating' else CITY_SHOPS_QUERY, (brand, city)).fetchall()
+        response = jsonify([shop_search_result(row) for row in rows])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
     except Exception as e:
         logging.error(f"İşletme arama sırasında hata: {e}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/shops', methods=['DELETE'])
 @limiter.limit("10 per minute")
@@ -598,14 +3399,15 @@ def delete_shop():
         if session['user_type'] != 'business':
             return jsonify({"description": "Yetkisiz işlem."}), 403
         conn.execute('DELETE FROM Shops WHERE user_id = ?', (user_id,))
+        conn.execute('DELETE FROM ShopBrands WHERE shop_user_id = ?', (user_id,))
+        conn.execute('DELETE FROM ShopReputation WHERE shop_user_id = ?', (user_id,))
         conn.commit()
+        bump_change_versions([user_id, *related_user_ids(conn, user_id)])
         return jsonify({"status": "success", "description": "İşletme profili silindi."})
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Dükkan silinirken hata: {e}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/vehicles', methods=['POST'])
 @app.route('/api/vehicles/<int:vehicle_id>', methods=['PUT', 'DELETE'])
@@ -632,6 +3434,7 @@ def manage_vehicles(vehicle_id=None):
                 (user_id, plate_number, data['brand'], data['series'], data['year'], data['fuel'], data['model'], data['last_inspection_date'])
             )
             conn.commit()
+            bump_change_versions([session['user_id']])
             return jsonify({"status": "success", "description": "Araç eklendi."}), 201
         elif request.method == 'PUT':
             vehicle = conn.execute('SELECT id FROM Vehicles WHERE id = ? AND user_id = ?', (vehicle_id, user_id)).fetchone()
@@ -646,21 +3449,22 @@ def manage_vehicles(vehicle_id=None):
                 (new_plate, data['brand'], data['series'], data['year'], data['fuel'], data['model'], data['last_inspection_date'], vehicle_id)
             )
             conn.commit()
+            bump_change_versions([session['user_id']])
             return jsonify({"status": "success", "description": "Araç güncellendi."})
         elif request.method == 'DELETE':
             vehicle = conn.execute('SELECT id FROM Vehicles WHERE id = ? AND user_id = ?', (vehicle_id, user_id)).fetchone()
             if not vehicle: return jsonify({"description": "Araç bulunamadı."}), 404
             conn.execute('DELETE FROM Vehicles WHERE id = ?', (vehicle_id,))
             conn.commit()
+            bump_change_versions([session['user_id']])
             return jsonify({"status": "success", "description": "Araç silindi."})
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Araç yönetimi hatası: {e}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/account', methods=['GET','POST'])
+@user_versioned()
 def account_details():
     if 'email' not in session: return jsonify({"description": "Yetkilendirme gerekli."}), 401
     email = session['email']
@@ -671,7 +3475,7 @@ def account_details():
         user_data = dict(user)
         if request.method == 'GET':
             if user_data['user_type'] == 'owner':
-                vehicles_cursor = conn.execute('SELECT id, plate_number, brand, series, year, model, fuel, tax_paid_jan, tax_paid_jul, last_inspection_date FROM Vehicles WHERE user_id = ?', (user['id'],))
+                vehicles_cursor = conn.execute(OWNER_VEHICLES_QUERY, (user['id'],))
                 user_data['vehicles'] = [dict(row) for row in vehicles_cursor.fetchall()]
             elif user_data['user_type'] == 'business':
                 shop = conn.execute('SELECT city, phone, google_place_id, serviced_brands FROM Shops WHERE user_id = ?', (user['id'],)).fetchone()
@@ -682,13 +3486,15 @@ def account_details():
         
         if request.method == 'POST':
             data = request.get_json()
+            location_requested = False
             phone_number = data.get('phone_number')
             if not phone_number or not validate_phone_number(phone_number): 
                 return jsonify({"description": "Geçersiz telefon no."}), 400
             conn.execute('UPDATE Users SET phone_number = ? WHERE id = ?', (phone_number, user['id']))
             if user['user_type'] == 'business':
-                serviced_brands_str = ",".join(data.get('serviced_brands', []))
-                shop = conn.execute('SELECT id FROM Shops WHERE user_id = ?', (user['id'],)).fetchone()
+                serviced_brands = data.get('serviced_brands', [])
+                serviced_brands_str = ",".join(serviced_brands)
+                shop = conn.execute('SELECT id, google_place_id FROM Shops WHERE user_id = ?', (user['id'],)).fetchone()
                 if shop:
                     conn.execute(
                         'UPDATE Shops SET city = ?, phone = ?, google_place_id = ?, serviced_brands = ? WHERE user_id = ?',
@@ -699,14 +3505,22 @@ def account_details():
                         'INSERT INTO Shops (user_id, city, phone, google_place_id, serviced_brands) VALUES (?, ?, ?, ?, ?)',
                         (user['id'], data.get('city'), data.get('shop_phone'), data.get('google_place_id'), serviced_brands_str)
                     )
+                sync_shop_brands(conn, user['id'], data.get('city'), serviced_brands)
+                if not shop or shop['google_place_id'] != data.get('google_place_id'):
+                    set_shop_location(conn, user['id'], None, None)
+                    if data.get('google_place_id'):
+                        enqueue_job(conn, "shop_location", {"shop_user_id": user['id'], "place_id": data.get('google_place_id')})
+                        location_requested = True
             conn.commit()
+            if location_requested:
+                job_queue.notify()
+            # Telefon numaraları karşı tarafın talep listesinde de görünür.
+            bump_change_versions([user['id'], *related_user_ids(conn, user['id'])])
             return jsonify({"status": "success", "description": "Hesap güncellendi."}), 200
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Hesap yönetimi hatası: {e}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/vehicles/tax_status', methods=['POST'])
 @limiter.limit("60 per minute")
@@ -724,70 +3538,53 @@ def update_tax_status():
         if not vehicle: return jsonify({"description": "Araç bulunamadı veya yetkiniz yok."}), 404
         column_to_update = f"tax_paid_{period}"
         status_int = 1 if status else 0
-        conn.execute(f'UPDATE Vehicles SET {column_to_update} = ? WHERE id = ?', (status_int, vehicle_id))
-        conn.commit()
+        run_write(lambda write_conn: write_conn.execute(f'UPDATE Vehicles SET {column_to_update} = ? WHERE id = ?', (status_int, vehicle_id)))
+        bump_change_versions([session['user_id']])
         return jsonify({"status": "success", "description": "Vergi durumu güncellendi."})
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Vergi durumu güncellenirken hata: {e}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
             
 @app.route('/api/cities')
 def get_cities():
-    try:
-        with open(CITIES_DATA_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        city_names = [city['isim'] for city in data.get('sehirler', [])]
-        return jsonify(sorted(city_names))
-    except Exception as e:
-        logging.error(f"Şehir dosyası okunurken hata: {e}")
+    if cities_payload is None:
         return jsonify([]), 500
+    return static_content_response(cities_payload)
 
 @app.route('/api/brands')
 def get_brands():
-    load_vehicle_data()
-    brands = sorted(list(set(item['marka'] for item in all_vehicle_data)))
-    return jsonify(brands)
+    return catalogue_response()
     
 @app.route('/api/series')
 def get_series():
-    load_vehicle_data()
     brand = request.args.get('brand')
     if not brand: return jsonify([])
-    series = sorted(list(set(item['seri'] for item in all_vehicle_data if item['marka'] == brand)))
-    return jsonify(series)
+    return catalogue_response(brand)
 
 @app.route('/api/years')
 def get_years():
-    load_vehicle_data()
     brand = request.args.get('brand')
     series = request.args.get('series')
     if not brand or not series: return jsonify([])
-    years = sorted(list(set(item['yil'] for item in all_vehicle_data if item['marka'] == brand and item['seri'] == series)))
-    return jsonify(years)
+    return catalogue_response(brand, series)
 
 @app.route('/api/fuels')
 def get_fuels():
-    load_vehicle_data()
     brand = request.args.get('brand')
     series = request.args.get('series')
     year = request.args.get('year')
     if not all([brand, series, year]): return jsonify([])
-    fuels = sorted(list(set(item['yakit'] for item in all_vehicle_data if item['marka'] == brand and item['seri'] == series and item['yil'] == year)))
-    return jsonify(fuels)
+    return catalogue_response(brand, series, year)
     
 @app.route('/api/models')
 def get_models():
-    load_vehicle_data()
     brand = request.args.get('brand')
     series = request.args.get('series')
     year = request.args.get('year')
     fuel = request.args.get('fuel')
     if not all([brand, series, year, fuel]): return jsonify([])
-    models = sorted(list(set(item['model'] for item in all_vehicle_data if item['marka'] == brand and item['seri'] == series and item['yil'] == year and item['yakit'] == fuel)))
-    return jsonify(models)
+    return catalogue_response(brand, series, year, fuel)
 
 @app.route('/api/maintenance_options')
 @limiter.limit("60 per minute")
@@ -799,42 +3596,40 @@ def get_maintenance_options():
         return jsonify({"description": "Geçerli bir kilometre gereklidir."}), 400
     if not fuel:
         return jsonify({"description": "Yakıt tipi gereklidir."}), 400
-    file_path = DIZEL_MAINTENANCE_PATH if 'dizel' in fuel.lower() else BENZIN_MAINTENANCE_PATH
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            schedule_data = {int(k): v for k, v in json.load(f).items()}
-        sorted_kms = sorted(schedule_data.keys())
-        cycle_km = sorted_kms[-1] if sorted_kms else 120000
-        base_km = math.floor(current_km / cycle_km) * cycle_km
-        relative_km = current_km % cycle_km
-        previous_km_point = 0
-        next_km_point = sorted_kms[0]
-        for km_point in sorted_kms:
-            if relative_km >= km_point:
-                previous_km_point = km_point
-            else:
-                next_km_point = km_point
-                break
-        if relative_km == previous_km_point and previous_km_point != 0:
-            current_index = sorted_kms.index(previous_km_point)
-            if current_index > 0:
-                 previous_km_point = sorted_kms[current_index - 1]
-        question_km = base_km + previous_km_point
-        missed_service_km = question_km
-        next_service_km = base_km + next_km_point
-        if relative_km >= next_km_point and next_km_point != sorted_kms[0]:
-             next_service_km = base_km + cycle_km + sorted_kms[0]
-        return jsonify({
-            "question_km": question_km if question_km > 0 else "ilk",
-            "missed_service": { "km": missed_service_km, "details": schedule_data.get(previous_km_point, None) },
-            "next_service": { "km": next_service_km, "details": schedule_data.get(next_km_point, None) }
-        })
+        return jsonify(get_maintenance_schedule(fuel).options(current_km))
     except FileNotFoundError:
         return jsonify({"description": f"Bakım dosyası bulunamadı."}), 404
     except Exception as e:
-        logging.error(f"{file_path} okunurken hata: {e}")
+        logging.error(f"{fuel} bakım takvimi okunurken hata: {e}")
         return jsonify({"description": "Sunucu hatası."}), 500
 
+@app.route('/api/maintenance_options/batch', methods=['POST'])
+@limiter.limit("30 per minute")
+def get_maintenance_options_batch():
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items or len(items) > MAINTENANCE_BATCH_LIMIT:
+        return jsonify({"description": f"1 ile {MAINTENANCE_BATCH_LIMIT} arasında sorgu gönderilmelidir."}), 400
+    results = []
+    for item in items:
+        fuel = item.get('fuel') if isinstance(item, dict) else None
+        try:
+            current_km = int(item.get('km')) if isinstance(item, dict) else None
+        except (ValueError, TypeError):
+            current_km = None
+        if not fuel or current_km is None:
+            results.append({"description": "Yakıt tipi ve geçerli bir kilometre gereklidir."})
+            continue
+        try:
+            results.append(get_maintenance_schedule(fuel).options(current_km))
+        except FileNotFoundError:
+            results.append({"description": "Bakım dosyası bulunamadı."})
+        except Exception as e:
+            logging.error(f"{fuel} bakım takvimi okunurken hata: {e}")
+            results.append({"description": "Sunucu hatası."})
+    return jsonify({"results": results})
+
 @app.route('/api/auth/google', methods=['POST'])
 @limiter.limit("10 per minute")
 def google_auth():
@@ -843,7 +3638,6 @@ def google_auth():
         idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), GOOGLE_CLIENT_ID)
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM Users WHERE email = ?', (idinfo['email'],)).fetchone()
-        conn.close()
         if user:
             session.clear()
             session['user_id'] = user['id']
@@ -883,24 +3677,20 @@ def google_register_complete():
         user_id = cursor.lastrowid
         if user_type == 'business':
             cursor.execute('INSERT INTO Shops (user_id, phone) VALUES (?, ?)',(user_id, phone_number))
+        enqueue_job(conn, "welcome_email", {"name": name, "email": email})
         conn.commit()
+        job_queue.notify()
         new_user = conn.execute('SELECT * FROM Users WHERE id = ?', (user_id,)).fetchone()
         session.clear()
         session['user_id'] = new_user['id']
         session['email'] = new_user['email']
         session['name'] = new_user['name']
         session['user_type'] = new_user['user_type']
-        try:
-            send_welcome_email(new_user['name'], new_user['email'])
-        except Exception as email_error:
-            logging.error(f"E-posta gönderme başarısız oldu, ancak kullanıcı kaydı başarılı: {email_error}")
         return jsonify({"status": "login_success", "userName": new_user['name'], "userType": new_user['user_type']}), 201
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Kayıt tamamlama sırasında kritik hata: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/requests/<int:request_id>/accept', methods=['POST'])
 @limiter.limit("10 per minute")
@@ -926,7 +3716,7 @@ def accept_quote(request_id):
         if not vehicle:
              logging.warning(f"Kullanıcı {session['user_id']} için talep ID {request_id} onaylanırken eşleşen araç bulunamadı.")
 
-        conn.execute(
+        cursor = conn.execute(
             """
             INSERT INTO Appointments (user_id, shop_user_id, request_id, vehicle_plate, vehicle_brand, vehicle_model)
             VALUES (?, ?, ?, ?, ?, ?)
@@ -937,6 +3727,10 @@ def accept_quote(request_id):
         conn.execute("UPDATE Requests SET status = 'accepted' WHERE id = ?", (request_id,))
         
         conn.commit()
+        notify_change(
+            [request_data['user_id'], request_data['shop_user_id']], "appointment.created",
+            request_id=request_id, appointment_id=cursor.lastrowid, status='accepted'
+        )
         return jsonify({"status": "success", "description": "Teklif onaylandı ve randevu oluşturuldu."})
 
     except sqlite3.IntegrityError:
@@ -946,49 +3740,40 @@ def accept_quote(request_id):
         if conn: conn.rollback()
         logging.error(f"Teklif kabul etme hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/appointments', methods=['GET'])
 @limiter.limit("30 per minute")
+@user_versioned()
 def get_appointments():
     if 'user_id' not in session:
         return jsonify({"description": "Yetkilendirme gerekli."}), 401
     
+    user_id = session['user_id']
+    user_type = session['user_type']
+    if user_type == 'owner':
+        field_map = OWNER_APPOINTMENT_FIELDS
+        from_clause = OWNER_APPOINTMENTS_FROM
+        owner_column = 'user_id'
+    elif user_type == 'business':
+        field_map = BUSINESS_APPOINTMENT_FIELDS
+        from_clause = BUSINESS_APPOINTMENTS_FROM
+        owner_column = 'shop_user_id'
+    else:
+        return jsonify([])
+    try:
+        fields, statuses, limit, position, ids = parse_listing_args(field_map)
+    except ValueError as e:
+        return jsonify({"description": str(e)}), 400
     conn = get_db_connection()
     try:
-        user_id = session['user_id']
-        user_type = session['user_type']
-        
-        if user_type == 'owner':
-            query = """
-            SELECT a.*, u.name as shop_name 
-            FROM Appointments a 
-            JOIN Users u ON a.shop_user_id = u.id 
-            WHERE a.user_id = ? 
-            ORDER BY a.created_at DESC
-            """
-            cursor = conn.execute(query, (user_id,))
-        elif user_type == 'business':
-            query = """
-            SELECT a.*, u.name as customer_name, a.vehicle_plate
-            FROM Appointments a 
-            JOIN Users u ON a.user_id = u.id
-            WHERE a.shop_user_id = ? 
-            ORDER BY a.created_at DESC
-            """
-            cursor = conn.execute(query, (user_id,))
-        else:
-            return jsonify([])
-
-        appointments = [dict(row) for row in cursor.fetchall()]
-        return jsonify(appointments)
+        query, params = build_listing_query(select_list_for(field_map, fields), from_clause, 'a', owner_column, user_id, statuses, position, limit, ids)
+        rows = conn.execute(query, params).fetchall()
+        appointments = [dict(row) for row in rows[:limit]]
+        return listing_response(appointments, rows, limit)
 
     except Exception as e:
         logging.error(f"Randevu listeleme hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/appointments/<int:appointment_id>', methods=['PUT'])
 @limiter.limit("30 per minute")
@@ -1003,19 +3788,20 @@ def update_appointment(appointment_id):
 
     conn = get_db_connection()
     try:
-        appointment = conn.execute('SELECT id FROM Appointments WHERE id = ? AND shop_user_id = ?', (appointment_id, session['user_id'])).fetchone()
+        appointment = conn.execute('SELECT id, user_id, request_id FROM Appointments WHERE id = ? AND shop_user_id = ?', (appointment_id, session['user_id'])).fetchone()
         if not appointment:
             return jsonify({"description": "Randevu bulunamadı veya yetkiniz yok."}), 404
         
-        conn.execute("UPDATE Appointments SET appointment_date = ?, status = 'scheduled' WHERE id = ?", (appointment_date, appointment_id))
-        conn.commit()
+        run_write(lambda write_conn: write_conn.execute("UPDATE Appointments SET appointment_date = ?, status = 'scheduled' WHERE id = ?", (appointment_date, appointment_id)))
+        notify_change(
+            [appointment['user_id'], session['user_id']], "appointment.updated",
+            appointment_id=appointment_id, request_id=appointment['request_id'], status='scheduled'
+        )
         return jsonify({"status": "success", "description": "Randevu tarihi güncellendi."})
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Randevu güncelleme hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
 
 @app.route('/api/appointments/<int:appointment_id>/complete', methods=['POST'])
 @limiter.limit("30 per minute")
@@ -1025,19 +3811,35 @@ def complete_appointment(appointment_id):
     
     conn = get_db_connection()
     try:
-        appointment = conn.execute('SELECT id FROM Appointments WHERE id = ? AND shop_user_id = ?', (appointment_id, session['user_id'])).fetchone()
+        appointment = conn.execute('SELECT id, user_id, request_id FROM Appointments WHERE id = ? AND shop_user_id = ?', (appointment_id, session['user_id'])).fetchone()
         if not appointment:
             return jsonify({"description": "Randevu bulunamadı veya yetkiniz yok."}), 404
         
         conn.execute("UPDATE Appointments SET status = 'tamamlandi' WHERE id = ?", (appointment_id,))
         conn.commit()
+        notify_change(
+            [appointment['user_id'], session['user_id']], "appointment.completed",
+            appointment_id=appointment_id, request_id=appointment['request_id'], status='tamamlandi'
+        )
         return jsonify({"status": "success", "description": "Randevu tamamlandı olarak işaretlendi."})
     except Exception as e:
         if conn: conn.rollback()
         logging.error(f"Randevu tamamlama hatası: {e}\n{traceback.format_exc()}")
         return jsonify({"description": "Sunucu hatası."}), 500
-    finally:
-        if conn: conn.close()
+
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    with app.app_context():
+        problems = find_query_plan_problems(get_db_connection())
+    for problem in problems:
+        logging.error(f"İndekssiz sorgu planı: {problem}")
+    if problems:
+        raise SystemExit(1)
+    logging.info("Tüm sık sorgular indeks kullanıyor.")
+
+@app.cli.command("build-catalogue")
+def build_catalogue_command():
+    build_catalogue_file(force=True)
 
 # --- Uygulama Başlangıcı ---
 if __name__ == '__main__':
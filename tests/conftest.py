@@ -0,0 +1,110 @@
+import itertools
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# main_api yapılandırmayı içe aktarılırken okur; testler geçici bir veritabanı dizini ve
+# erişilemeyen bir Redis ile (yedek kip) çalışır, dış servislere gidilmez.
+os.environ["DATABASE_DIR"] = tempfile.mkdtemp(prefix="aracabak-test-")
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1/0"
+os.environ.pop("GOOGLE_PLACES_API_KEY", None)
+os.environ.pop("BREVO_API_KEY", None)
+os.environ.pop("METRICS_ENABLED", None)
+os.environ["JOB_WORKER_THREADS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main_api  # noqa: E402
+
+for _limiter in main_api.app.extensions.get("limiter", ()):
+    _limiter.enabled = False
+
+_user_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def api():
+    return main_api
+
+
+@pytest.fixture
+def create_user(api):
+    def create(user_type="owner", name=None):
+        number = next(_user_numbers)
+        conn = api.db_writer.acquire()
+        try:
+            user_id = conn.execute(
+                "INSERT INTO Users (email, name, user_type, phone_number) VALUES (?, ?, ?, ?)",
+                (f"user{number}@test.local", name or f"Kullanıcı {number}", user_type, "05551234567")
+            ).lastrowid
+            conn.commit()
+        finally:
+            api.db_writer.release(conn)
+        return user_id
+    return create
+
+
+@pytest.fixture
+def login(api):
+    def client_for(user_id, user_type):
+        client = api.app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+            session["user_type"] = user_type
+            session["email"] = f"user{user_id}@test.local"
+            session["name"] = f"Kullanıcı {user_id}"
+        return client
+    return client_for
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.requests.append({"method": self.command, "path": self.path, "headers": dict(self.headers), "body": body})
+        status, headers, payload = self.server.respond(self.command, self.path, self.headers, body)
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = _handle
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, respond):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.respond = respond
+        self.requests = []
+
+    def url(self, path=""):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+@pytest.fixture
+def stub_server():
+    # Dış servis taklidi: respond(method, path, headers, body) -> (status, headers, body)
+    servers = []
+
+    def start(respond):
+        server = StubServer(respond)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,18 @@
+def test_dashboard_keeps_fuel_type_next_to_fuel_summary(api, create_user, login):
+    owner_id = create_user("owner")
+    conn = api.db_writer.acquire()
+    try:
+        vehicle_id = conn.execute(
+            "INSERT INTO Vehicles (user_id, plate_number, brand, series, year, fuel, model) VALUES (?, '06 TST 01', 'BMW', 'BMW S1', '2018', 'Dizel', 'M1')",
+            (owner_id,)
+        ).lastrowid
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+    response = login(owner_id, "owner").get("/api/dashboard")
+    assert response.status_code == 200
+    [vehicle] = response.get_json()["vehicles"]
+    assert vehicle["id"] == vehicle_id
+    assert vehicle["fuel"] == "Dizel"
+    assert set(vehicle["fuel_summary"]) == {"total_tl", "total_liter", "total_km", "avg_consumption_liter_100km"}
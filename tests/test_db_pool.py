@@ -0,0 +1,81 @@
+import os
+import sqlite3
+
+import pytest
+
+
+def test_forked_child_does_not_reuse_parent_connections(api, tmp_path):
+    pool = api.SQLiteConnectionPool(str(tmp_path / "fork.db"), 2, 1)
+    parent_conn = pool.acquire()
+    pool.release(parent_conn)
+    assert pool.stats()["idle"] == 1
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            stats = pool.stats()
+            conn = pool.acquire()
+            ok = stats["idle"] == 0 and stats["size"] == 0 and conn is not parent_conn
+            conn.execute("CREATE TABLE IF NOT EXISTS child (id INTEGER)")
+            conn.commit()
+            pool.release(conn)
+            os.write(write_fd, b"1" if ok else b"0")
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b"1"
+    os.close(read_fd)
+    # Ebeveynin bağlantısı çocuktan etkilenmeden kullanılmaya devam eder.
+    conn = pool.acquire()
+    assert conn is parent_conn
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'child'").fetchone() is not None
+    pool.release(conn)
+
+
+def test_init_db_does_not_leave_a_pooled_connection(api):
+    before = api.db_writer.stats()
+    api.init_db()
+    after = api.db_writer.stats()
+    assert after["size"] == before["size"]
+    assert after["idle"] == before["idle"]
+
+
+def test_foreign_keys_are_not_enforced(api):
+    conn = api.db_writer.acquire()
+    try:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 0
+    finally:
+        api.db_writer.release(conn)
+
+
+def test_read_only_pool_rejects_writes(api):
+    conn = api.db_pool.acquire()
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("INSERT INTO Users (email, name, user_type) VALUES ('ro@test.local', 'RO', 'owner')")
+    finally:
+        api.db_pool.release(conn)
+
+
+def test_routed_connection_reads_from_pool_until_first_write(api):
+    conn = api.RoutedConnection()
+    try:
+        conn.execute("SELECT COUNT(*) FROM Users").fetchone()
+        assert conn._reader is not None and conn._writer is None
+        assert api.db_writer.stats()["in_use"] == 0
+
+        conn.execute("INSERT INTO Users (email, name, user_type) VALUES ('routed@test.local', 'Routed', 'owner')")
+        assert conn._writer is not None and conn.in_transaction
+        assert api.db_writer.stats()["in_use"] == 1
+        # Transaction içindeki okumalar yazıcıda çalışır ve henüz commit edilmemiş satırı görür.
+        assert conn.execute("SELECT 1 FROM Users WHERE email = 'routed@test.local'").fetchone() is not None
+
+        conn.rollback()
+        assert conn._writer is None
+        assert api.db_writer.stats()["in_use"] == 0
+        assert conn.execute("SELECT 1 FROM Users WHERE email = 'routed@test.local'").fetchone() is None
+    finally:
+        conn.close()
+    assert conn._reader is None
@@ -0,0 +1,59 @@
+import pytest
+import redis
+
+from test_fuel_entries import create_vehicle
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def versions(api, monkeypatch):
+    # Değişiklik sürümleri Redis'te tutulur; bu testler için çalışan bir (sahte) Redis verilir.
+    pool = api.InstrumentedRedisPool(connection_class=fakeredis.FakeRedisConnection, server=fakeredis.FakeServer())
+    monkeypatch.setattr(api, "redis_pool", pool)
+    monkeypatch.setattr(api, "redis_client", redis.Redis(connection_pool=pool))
+
+
+def test_unchanged_dashboard_is_revalidated_with_304(api, versions, create_user, login):
+    owner_id = create_user("owner")
+    client = login(owner_id, "owner")
+    first = client.get("/api/dashboard")
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert "private" in first.headers["Cache-Control"] and "no-cache" in first.headers["Cache-Control"]
+
+    again = client.get("/api/dashboard", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_own_write_bumps_version_and_other_users_do_not(api, versions, create_user, login):
+    owner_id, other_id = create_user("owner"), create_user("owner")
+    vehicle_id = create_vehicle(api, owner_id)
+    client = login(owner_id, "owner")
+    etag = client.get("/api/account").headers["ETag"]
+
+    api.bump_change_versions([other_id])
+    assert client.get("/api/account", headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.post(f"/api/vehicles/{vehicle_id}/fuel_entries",
+                       json={"date": "2024-05-01", "amount": 300, "unit": "TL", "distance": 200}).status_code == 201
+    changed = client.get("/api/account", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert client.get("/api/account", headers={"If-None-Match": changed.headers["ETag"]}).status_code == 304
+
+
+def test_etag_is_not_shared_between_users(api, versions, create_user, login):
+    first_id, second_id = create_user("owner"), create_user("owner")
+    etag = login(first_id, "owner").get("/api/appointments").headers["ETag"]
+    response = login(second_id, "owner").get("/api/appointments", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_no_etag_while_redis_is_down(api, create_user, login):
+    owner_id = create_user("owner")
+    response = login(owner_id, "owner").get("/api/account")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
@@ -0,0 +1,34 @@
+from test_listing import insert_requests
+
+
+def test_stream_slots_cap_per_user_and_in_total(api):
+    slots = api.EventStreamSlots(max_streams=3, max_per_user=2)
+    assert slots.acquire(1) and slots.acquire(1)
+    assert not slots.acquire(1)
+    assert slots.acquire(2)
+    assert not slots.acquire(3)
+    slots.release(1)
+    assert slots.acquire(3)
+    assert slots.stats()["open"] == 3
+    assert slots.stats()["rejected"] == 2
+
+
+def test_released_slots_are_reusable(api):
+    slots = api.EventStreamSlots(max_streams=1, max_per_user=1)
+    for _ in range(5):
+        assert slots.acquire(7)
+        slots.release(7)
+    assert slots.stats()["open"] == 0
+    assert slots.stats()["users"] == 0
+
+
+def test_changed_request_is_fetched_by_id(api, create_user, login):
+    owner_id, shop_id = create_user("owner"), create_user("business")
+    insert_requests(api, owner_id, shop_id, 3)
+    client = login(shop_id, "business")
+    request_ids = [item["id"] for item in client.get("/api/requests?fields=id").get_json()]
+    response = client.get(f"/api/requests?ids={request_ids[1]}")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.get_json()] == [request_ids[1]]
+    other_client = login(create_user("business"), "business")
+    assert other_client.get(f"/api/requests?ids={request_ids[1]}").get_json() == []
@@ -0,0 +1,68 @@
+import time
+
+
+def shop_ids(client, **params):
+    response = client.get("/api/find_shops", query_string=params)
+    assert response.status_code == 200
+    return [shop["shop_user_id"] for shop in response.get_json()]
+
+
+def test_brand_search_ignores_case(api, create_user, login):
+    shop_user_id = create_user("business")
+    shop = login(shop_user_id, "business")
+    response = shop.post("/api/account", json={
+        "phone_number": "05551234567", "city": "Bolu", "shop_phone": "05551234567",
+        "serviced_brands": [" Mercedes-Benz", "BMW"]
+    })
+    assert response.status_code == 200
+
+    client = api.app.test_client()
+    for brand in ["Mercedes-Benz", "mercedes-benz", "MERCEDES-BENZ", "bmw", "Bmw "]:
+        assert shop_ids(client, brand=brand, city="Bolu") == [shop_user_id]
+    assert shop_ids(client, brand="Audi", city="Bolu") == []
+
+
+def test_migration_lowercases_existing_brand_rows(api, create_user):
+    shop_user_id = create_user("business")
+    conn = api.db_writer.acquire()
+    try:
+        conn.execute("INSERT INTO Shops (user_id, city, serviced_brands) VALUES (?, 'Düzce', 'Volvo,Renault')", (shop_user_id,))
+        conn.executemany("INSERT INTO ShopBrands (shop_user_id, brand, city) VALUES (?, ?, 'Düzce')",
+                         [(shop_user_id, "Volvo"), (shop_user_id, "Renault")])
+        api.migration_009_shop_brands_casefold(conn.cursor())
+        conn.commit()
+        brands = [row[0] for row in conn.execute("SELECT brand FROM ShopBrands WHERE shop_user_id = ? ORDER BY brand", (shop_user_id,))]
+    finally:
+        api.db_writer.release(conn)
+    assert brands == ["renault", "volvo"]
+    assert shop_ids(api.app.test_client(), brand="VOLVO", city="Düzce") == [shop_user_id]
+
+
+CITY_RESULT_KEYS = {"shop_user_id", "name", "phone", "city", "google_place_id"}
+REPUTATION_KEYS = {"rating", "user_ratings_total", "reviews", "formatted_phone_number", "url"}
+
+
+def test_response_keys_by_search_mode(api, create_user):
+    unrated_id = create_user("business")
+    rated_id = create_user("business")
+    conn = api.db_writer.acquire()
+    try:
+        for shop_user_id in (unrated_id, rated_id):
+            conn.execute("INSERT INTO Shops (user_id, city, phone, google_place_id, serviced_brands) VALUES (?, 'Kars', '05551234567', ?, 'Fiat')",
+                         (shop_user_id, f"place-{shop_user_id}"))
+            api.sync_shop_brands(conn, shop_user_id, "Kars", ["Fiat"])
+            api.set_shop_location(conn, shop_user_id, 40.6, 43.1)
+        conn.execute("INSERT INTO ShopReputation (shop_user_id, place_id, name, rating, user_ratings_total, reviews, checked_at, refreshed_at) VALUES (?, ?, 'Servis', 4.2, 7, '[]', ?, ?)",
+                     (rated_id, f"place-{rated_id}", time.time(), time.time()))
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+    client = api.app.test_client()
+
+    shops = {shop["shop_user_id"]: shop for shop in client.get("/api/find_shops?city=Kars&brand=Fiat").get_json()}
+    assert set(shops[unrated_id]) == CITY_RESULT_KEYS
+    assert set(shops[rated_id]) == CITY_RESULT_KEYS | REPUTATION_KEYS
+
+    shops = {shop["shop_user_id"]: shop for shop in client.get("/api/find_shops?lat=40.6&lng=43.1&brand=Fiat").get_json()}
+    assert set(shops[unrated_id]) == CITY_RESULT_KEYS | {"latitude", "longitude", "distance_km"}
+    assert set(shops[rated_id]) == CITY_RESULT_KEYS | REPUTATION_KEYS | {"latitude", "longitude", "distance_km"}
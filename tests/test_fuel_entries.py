@@ -0,0 +1,102 @@
+import itertools
+import json
+
+_plate_numbers = itertools.count(1)
+
+
+def create_vehicle(api, owner_id):
+    conn = api.db_writer.acquire()
+    try:
+        vehicle_id = conn.execute(
+            "INSERT INTO Vehicles (user_id, plate_number, brand, series, year, fuel, model) VALUES (?, ?, 'Fiat', 'Fiat S1', '2019', 'Benzin', 'Egea')",
+            (owner_id, f"34 YKT {next(_plate_numbers):04d}")
+        ).lastrowid
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+    return vehicle_id
+
+
+def stored_rows(api, vehicle_id):
+    conn = api.db_writer.acquire()
+    try:
+        entries = conn.execute("SELECT date, amount_tl, amount_liter, distance_km FROM FuelEntries WHERE vehicle_id = ? ORDER BY date", (vehicle_id,)).fetchall()
+        months = conn.execute("SELECT month, entry_count FROM FuelMonthlyRollup WHERE vehicle_id = ? ORDER BY month", (vehicle_id,)).fetchall()
+        return [tuple(row) for row in entries], [tuple(row) for row in months]
+    finally:
+        api.db_writer.release(conn)
+
+
+def test_fuel_entry_with_invalid_date_is_rejected(api, create_user, login):
+    owner_id = create_user("owner")
+    vehicle_id = create_vehicle(api, owner_id)
+    client = login(owner_id, "owner")
+    url = f"/api/vehicles/{vehicle_id}/fuel_entries"
+
+    for bad_date in ["2024-02-30", "15.03.2024", "2024-03", "yarın"]:
+        response = client.post(url, json={"date": bad_date, "amount": 500, "unit": "TL", "distance": 320})
+        assert response.status_code == 400, bad_date
+        assert response.get_json()["description"] == "Geçersiz tarih."
+    assert stored_rows(api, vehicle_id) == ([], [])
+
+    response = client.post(url, json={"date": "2024-03-15", "amount": "40", "unit": "Litre", "distance": 510})
+    assert response.status_code == 201
+    assert stored_rows(api, vehicle_id) == ([("2024-03-15", None, 40.0, 510.0)], [("2024-03", 1)])
+
+
+def import_entries(client, vehicle_id, body, mimetype):
+    return client.post(f"/api/vehicles/{vehicle_id}/fuel_entries/import", data=body.encode("utf-8"), content_type=mimetype)
+
+
+def export_entries(client, vehicle_id, export_format):
+    response = client.get(f"/api/vehicles/{vehicle_id}/fuel_entries/export", query_string={"format": export_format})
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_import_counts_valid_rows_and_reports_failed_lines(api, create_user, login):
+    owner_id = create_user("owner")
+    vehicle_id = create_vehicle(api, owner_id)
+    client = login(owner_id, "owner")
+    body = "\n".join([
+        "date,unit,amount,distance",
+        "2024-01-05,TL,1500,420",
+        "2024-01-31,Litre,38.5,510",
+        "2024-02-30,TL,900,300",
+        "2024-02-10,Galon,12,200",
+        "2024-02-11,TL,-5,200",
+        "2024-03-01,Litre,41,530",
+    ]) + "\n"
+    response = import_entries(client, vehicle_id, body, "text/csv")
+    assert response.status_code == 201
+    result = response.get_json()
+    assert (result["imported"], result["skipped"], result["truncated"]) == (3, 3, False)
+    assert [error["line"] for error in result["errors"]] == [4, 5, 6]
+
+    response = import_entries(client, vehicle_id, '{"date": "2024-04-01"\n\n{"date": "yok", "unit": "TL", "amount": 1, "distance": 1}\n', "application/x-ndjson")
+    assert response.status_code == 200
+    assert (response.get_json()["imported"], response.get_json()["skipped"]) == (0, 2)
+    entries, months = stored_rows(api, vehicle_id)
+    assert len(entries) == 3
+    assert months == [("2024-01", 2), ("2024-03", 1)]
+
+
+def test_exported_entries_import_back_unchanged(api, create_user, login):
+    owner_id = create_user("owner")
+    source_id, csv_copy_id, ndjson_copy_id = (create_vehicle(api, owner_id) for _ in range(3))
+    client = login(owner_id, "owner")
+    rows = [("2023-12-30", "TL", 1200, 380), ("2024-01-02", "Litre", 35.2, 450), ("2024-01-02", "TL", 800.5, 260)]
+    body = "".join(json.dumps({"date": d, "unit": u, "amount": a, "distance": km}) + "\n" for d, u, a, km in rows)
+    assert import_entries(client, source_id, body, "application/x-ndjson").get_json()["imported"] == 3
+
+    csv_export = export_entries(client, source_id, "csv")
+    assert csv_export.splitlines()[0] == "id,date,amount_tl,amount_liter,distance_km"
+    assert import_entries(client, csv_copy_id, csv_export, "text/csv").get_json()["imported"] == 3
+    assert import_entries(client, ndjson_copy_id, export_entries(client, source_id, "ndjson"), "application/x-ndjson").get_json()["imported"] == 3
+
+    expected = stored_rows(api, source_id)
+    assert stored_rows(api, csv_copy_id) == expected
+    assert stored_rows(api, ndjson_copy_id) == expected
+    summary = lambda vehicle_id: client.get(f"/api/vehicles/{vehicle_id}/fuel_entries",
+                                           query_string={"start_date": "2023-01-01", "end_date": "2024-12-31"}).get_json()["summary"]
+    assert summary(csv_copy_id) == summary(source_id)
@@ -0,0 +1,50 @@
+import json
+
+
+def test_refresher_revalidates_and_serves_last_known_good(api, stub_server, monkeypatch):
+    upstream = {"mode": "ok", "payload": {"benzin": 42.5, "motorin": 43.1}}
+
+    def respond(method, path, headers, body):
+        if upstream["mode"] == "fail":
+            return 500, [], b"hata"
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, [("ETag", '"v1"')], b""
+        return 200, [("ETag", '"v1"'), ("Content-Type", "application/json")], json.dumps(upstream["payload"]).encode()
+
+    server = stub_server(respond)
+    cache = api.FuelPriceCache(server.url("/fiyatlar"), 3600)
+    monkeypatch.setattr(api, "fuel_prices", cache)
+    client = api.app.test_client()
+
+    first = client.get("/api/fuel_prices")
+    assert first.status_code == 200
+    assert first.get_json() == upstream["payload"]
+    etag = first.headers["ETag"]
+    assert client.get("/api/fuel_prices", headers={"If-None-Match": etag}).status_code == 304
+
+    fetched_at = cache.get()["fetched_at"]
+    cache.refresh()
+    assert server.requests[-1]["headers"].get("If-None-Match") == '"v1"'
+    snapshot = cache.get()
+    assert snapshot["fetched_at"] >= fetched_at
+    assert snapshot["etag"] == etag.strip('"')
+
+    upstream["mode"] = "fail"
+    cache.refresh()
+    assert len(server.requests) == 3
+    served = client.get("/api/fuel_prices")
+    assert served.status_code == 200
+    assert served.get_json() == upstream["payload"]
+
+
+def test_changed_upstream_body_changes_etag(api, stub_server, monkeypatch):
+    upstream = {"payload": {"benzin": 40}}
+    server = stub_server(lambda method, path, headers, body: (200, [], json.dumps(upstream["payload"]).encode()))
+    cache = api.FuelPriceCache(server.url("/fiyatlar"), 3600)
+    cache.refresh()
+    before = cache._snapshot
+    upstream["payload"] = {"benzin": 41}
+    cache.refresh()
+    after = cache._snapshot
+    assert after["etag"] != before["etag"]
+    assert json.loads(after["body"]) == {"benzin": 41}
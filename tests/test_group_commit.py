@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import Future
+
+import pytest
+
+from test_fuel_entries import create_vehicle
+
+
+@pytest.fixture
+def table(api):
+    conn = api.db_writer.acquire()
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS GroupCommitTest (value TEXT)")
+        conn.execute("DELETE FROM GroupCommitTest")
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+    def values():
+        conn = api.db_writer.acquire()
+        try:
+            return sorted(row[0] for row in conn.execute("SELECT value FROM GroupCommitTest"))
+        finally:
+            api.db_writer.release(conn)
+    return values
+
+
+def insert(value):
+    def unit(conn):
+        conn.execute("INSERT INTO GroupCommitTest (value) VALUES (?)", (value,))
+        return value
+    return unit
+
+
+def test_units_submitted_within_window_share_one_commit(api, table):
+    writer = api.GroupCommitWriter(window=0.5, max_batch=10, queue_size=100)
+    futures = [writer.submit(insert(f"v{index}")) for index in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [f"v{index}" for index in range(5)]
+    assert table() == [f"v{index}" for index in range(5)]
+    stats = writer.stats()
+    assert (stats["batches"], stats["units"], stats["largest_batch"]) == (1, 5, 5)
+
+
+def test_failing_unit_rolls_back_only_its_savepoint(api, table):
+    writer = api.GroupCommitWriter(window=0, max_batch=10, queue_size=100)
+
+    def failing(conn):
+        conn.execute("INSERT INTO GroupCommitTest (value) VALUES ('bad')")
+        raise ValueError("birim hatası")
+    batch = [(insert("first"), Future()), (failing, Future()), (insert("last"), Future())]
+    writer.run_batch(batch)
+
+    assert batch[0][1].result() == "first"
+    with pytest.raises(ValueError, match="birim hatası"):
+        batch[1][1].result()
+    assert batch[2][1].result() == "last"
+    assert table() == ["first", "last"]
+    assert writer.stats()["failed_units"] == 1
+
+
+def test_full_group_commit_queue_returns_503(api, create_user, login, monkeypatch):
+    owner_id = create_user("owner")
+    vehicle_id = create_vehicle(api, owner_id)
+    writer = api.GroupCommitWriter(window=0, max_batch=10, queue_size=1)
+    # Yazıcı thread'i çalışmıyormuş gibi davranılır; kuyruk dolu kalır.
+    writer._started_pid = os.getpid()
+    writer._queue.put_nowait((insert("queued"), Future()))
+    monkeypatch.setattr(api, "group_commit", writer)
+
+    response = login(owner_id, "owner").post(f"/api/vehicles/{vehicle_id}/fuel_entries",
+                                             json={"date": "2024-05-01", "amount": 300, "unit": "TL", "distance": 200})
+    assert response.status_code == 503
+    assert response.get_json()["description"] == "Sunucu şu anda yoğun, lütfen tekrar deneyin."
+
+
+def test_rejected_writer_wait_returns_503(api, create_user, login, monkeypatch):
+    owner_id = create_user("owner")
+    vehicle_id = create_vehicle(api, owner_id)
+    client = login(owner_id, "owner")
+    monkeypatch.setattr(api.db_writer, "max_waiters", 0)
+    held = api.db_writer.acquire()
+    try:
+        response = client.post(f"/api/vehicles/{vehicle_id}/fuel_entries",
+                               json={"date": "2024-05-01", "amount": 300, "unit": "TL", "distance": 200})
+    finally:
+        api.db_writer.release(held)
+    assert response.status_code == 503
+    assert client.post(f"/api/vehicles/{vehicle_id}/fuel_entries",
+                       json={"date": "2024-05-01", "amount": 300, "unit": "TL", "distance": 200}).status_code == 201
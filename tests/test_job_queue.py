@@ -0,0 +1,129 @@
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture
+def brevo(api, stub_server, monkeypatch):
+    # Brevo taklidi; mode "fail" iken 500 döner ve gönderim ApiException ile başarısız olur.
+    state = {"mode": "ok"}
+
+    def respond(method, path, headers, body):
+        if state["mode"] == "fail":
+            return 500, [("Content-Type", "application/json")], b'{"code": "internal_error"}'
+        return 201, [("Content-Type", "application/json")], b'{"messageId": "<test@brevo>"}'
+
+    server = stub_server(respond)
+    monkeypatch.setattr(api, "BREVO_API_KEY", "test")
+    monkeypatch.setattr(api, "BREVO_API_HOST", server.url("/v3"))
+    monkeypatch.setattr(api, "_brevo_api", None)
+    server.state = state
+    return server
+
+
+@pytest.fixture
+def queue(api):
+    conn = api.db_writer.acquire()
+    try:
+        conn.execute("DELETE FROM OutboundJobs")
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+    return api.JobQueue(worker_count=0, max_attempts=3, retry_base=10, lease_seconds=60)
+
+
+def enqueue_welcome(api, email):
+    conn = api.db_writer.acquire()
+    try:
+        api.enqueue_job(conn, "welcome_email", {"name": "Test", "email": email})
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+
+def jobs(api):
+    conn = api.db_writer.acquire()
+    try:
+        return [dict(row) for row in conn.execute("SELECT * FROM OutboundJobs ORDER BY id")]
+    finally:
+        api.db_writer.release(conn)
+
+
+def make_due(api):
+    conn = api.db_writer.acquire()
+    try:
+        conn.execute("UPDATE OutboundJobs SET next_attempt_at = ?", (time.time() - 1,))
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+
+def test_successful_job_is_sent_and_deleted(api, brevo, queue):
+    enqueue_welcome(api, "ok@test.local")
+    assert queue.run_once() is True
+    assert jobs(api) == []
+    sent = [request for request in brevo.requests if request["path"] == "/v3/smtp/email"]
+    assert len(sent) == 1
+    assert json.loads(sent[0]["body"])["to"] == [{"email": "ok@test.local", "name": "Test"}]
+    assert queue.run_once() is False
+
+
+def test_failed_job_backs_off_then_goes_to_dead_letter(api, brevo, queue):
+    brevo.state["mode"] = "fail"
+    enqueue_welcome(api, "fail@test.local")
+
+    started = time.time()
+    assert queue.run_once() is True
+    [job] = jobs(api)
+    assert job["status"] == "pending"
+    assert job["attempts"] == 1
+    assert "ApiException" in job["last_error"]
+    assert job["next_attempt_at"] == pytest.approx(started + 10, abs=2)
+    # Bekleme süresi dolmadan iş tekrar alınmaz.
+    assert queue.run_once() is False
+
+    make_due(api)
+    started = time.time()
+    assert queue.run_once() is True
+    [job] = jobs(api)
+    assert job["attempts"] == 2
+    assert job["next_attempt_at"] == pytest.approx(started + 20, abs=2)
+
+    make_due(api)
+    assert queue.run_once() is True
+    [job] = jobs(api)
+    assert job["status"] == "dead"
+    assert job["attempts"] == 3
+    make_due(api)
+    assert queue.run_once() is False
+    assert len(brevo.requests) == 3
+
+
+def test_expired_lease_is_reclaimed(api, brevo, queue):
+    enqueue_welcome(api, "lease@test.local")
+    conn = api.db_writer.acquire()
+    try:
+        # Worker'ı çökmüş, kilidi süresi dolmuş bir iş.
+        conn.execute("UPDATE OutboundJobs SET status = 'running', attempts = 1, locked_until = ?", (time.time() - 1,))
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+    assert queue.run_once() is True
+    assert jobs(api) == []
+    assert len(brevo.requests) == 1
+
+
+def test_shop_location_without_places_key_stays_queued(api, queue, monkeypatch):
+    monkeypatch.setattr(api, "GOOGLE_PLACES_API_KEY", None)
+    conn = api.db_writer.acquire()
+    try:
+        api.enqueue_job(conn, "shop_location", {"shop_user_id": 1, "place_id": "place-1"})
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+    assert queue.run_once() is True
+    [job] = jobs(api)
+    assert job["status"] == "pending"
+    assert job["attempts"] == 1
+    assert "GOOGLE_PLACES_API_KEY" in job["last_error"]
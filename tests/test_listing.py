@@ -0,0 +1,40 @@
+def insert_requests(api, owner_id, shop_id, count):
+    conn = api.db_writer.acquire()
+    try:
+        conn.executemany(
+            "INSERT INTO Requests (user_id, shop_user_id, vehicle_brand, vehicle_km, maintenance_km, selected_parts, created_at) VALUES (?, ?, 'BMW', 1000, 1000, '{}', ?)",
+            [(owner_id, shop_id, f"2024-01-{1 + index % 28:02d} 10:00:00") for index in range(count)]
+        )
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+
+def fetch_all_pages(client, url):
+    items, pages, cursor = [], 0, None
+    while True:
+        response = client.get(f"{url}&cursor={cursor}" if cursor else url)
+        assert response.status_code == 200
+        items.extend(response.get_json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return items, pages
+
+
+def test_following_next_cursor_returns_every_request(api, create_user, login):
+    owner_id, shop_id = create_user("owner"), create_user("business")
+    insert_requests(api, owner_id, shop_id, 120)
+    items, pages = fetch_all_pages(login(shop_id, "business"), "/api/requests?limit=50&fields=id,created_at")
+    assert pages == 3
+    assert len({item["id"] for item in items}) == 120
+    keys = [(item["created_at"], item["id"]) for item in items]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_first_page_announces_more_rows(api, create_user, login):
+    owner_id, shop_id = create_user("owner"), create_user("business")
+    insert_requests(api, owner_id, shop_id, api.LISTING_DEFAULT_LIMIT + 1)
+    response = login(owner_id, "owner").get("/api/requests?fields=id")
+    assert len(response.get_json()) == api.LISTING_DEFAULT_LIMIT
+    assert response.headers.get("X-Next-Cursor")
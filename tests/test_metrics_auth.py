@@ -0,0 +1,23 @@
+def test_internal_stats_refused_without_configured_token(api, monkeypatch):
+    monkeypatch.setattr(api, "METRICS_TOKEN", None)
+    client = api.app.test_client()
+    assert client.get("/api/internal/stats").status_code == 403
+    assert client.get("/api/internal/stats", headers={"Authorization": "Bearer "}).status_code == 403
+
+
+def test_internal_stats_require_matching_token(api, monkeypatch):
+    monkeypatch.setattr(api, "METRICS_TOKEN", "secret")
+    client = api.app.test_client()
+    assert client.get("/api/internal/stats").status_code == 403
+    assert client.get("/api/internal/stats", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    response = client.get("/api/internal/stats", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert "event_streams" in response.get_json()
+
+
+def test_metrics_refused_without_configured_token(api, monkeypatch):
+    monkeypatch.setattr(api, "METRICS_ENABLED", True)
+    monkeypatch.setattr(api, "METRICS_TOKEN", None)
+    client = api.app.test_client()
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics/profiles").status_code == 403
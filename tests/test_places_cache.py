@@ -0,0 +1,68 @@
+import time
+
+
+def shared_store(monkeypatch, *caches):
+    # Worker'lar arasında paylaşılan Redis yerine düz bir sözlük kullanılır.
+    store = {}
+    for cache in caches:
+        monkeypatch.setattr(cache, "_redis_get", lambda key: store.get(key))
+        monkeypatch.setattr(cache, "_redis_put", lambda key, entry: store.__setitem__(key, dict(entry)))
+    return store
+
+
+def counting_fetch(monkeypatch, cache, result):
+    calls = []
+
+    def fetch(place_id, fields, language):
+        calls.append(place_id)
+        return result
+    monkeypatch.setattr(cache, "_fetch", fetch)
+    return calls
+
+
+def test_stale_local_entry_is_replaced_by_newer_redis_entry(api, monkeypatch):
+    worker_a = api.PlacesDetailsCache(ttl=60, stale_ttl=3600, max_items=10)
+    worker_b = api.PlacesDetailsCache(ttl=60, stale_ttl=3600, max_items=10)
+    shared_store(monkeypatch, worker_a, worker_b)
+    key = worker_b._key("place-1", "name", "tr")
+    worker_b._lru_put(key, {"fetched_at": time.time() - 120, "result": {"name": "Eski"}})
+    counting_fetch(monkeypatch, worker_a, {"name": "Yeni"})
+    calls = counting_fetch(monkeypatch, worker_b, {"name": "Yeni"})
+
+    assert worker_a.get("place-1", "name") == {"name": "Yeni"}
+    assert worker_b.lookup("place-1", "name") == (True, {"name": "Yeni"})
+    assert calls == []
+    assert worker_b.stats()["redis_hits"] == 1
+    assert worker_b.stats()["stale_hits"] == 0
+
+
+def test_failed_fetch_is_negative_cached(api, monkeypatch):
+    cache = api.PlacesDetailsCache(ttl=60, stale_ttl=3600, max_items=10, negative_ttl=30)
+    store = shared_store(monkeypatch, cache)
+    calls = counting_fetch(monkeypatch, cache, None)
+
+    assert cache.get("place-2", "name") is None
+    assert cache.get("place-2", "name") is None
+    assert cache.lookup("place-2", "name") == (True, None)
+    assert calls == ["place-2"]
+    assert cache.stats()["negative_hits"] == 2
+
+    key = cache._key("place-2", "name", "tr")
+    for entry in (cache._lru[key], store[key]):
+        entry["failed_at"] -= 31
+    assert cache.get("place-2", "name") is None
+    assert calls == ["place-2", "place-2"]
+
+
+def test_failed_refresh_keeps_stale_result_without_retrying(api, monkeypatch):
+    cache = api.PlacesDetailsCache(ttl=60, stale_ttl=3600, max_items=10, negative_ttl=30)
+    shared_store(monkeypatch, cache)
+    key = cache._key("place-3", "name", "tr")
+    cache._lru_put(key, {"fetched_at": time.time() - 120, "result": {"name": "Eski"}})
+    calls = counting_fetch(monkeypatch, cache, None)
+
+    # Arka plan yenilemesi başarısız olur; eski sonuç döner ve negative_ttl içinde tekrar istenmez.
+    assert cache._submit(key, "place-3", "name", "tr").result() is None
+    assert cache.lookup("place-3", "name") == (True, {"name": "Eski"})
+    assert cache.lookup("place-3", "name") == (True, {"name": "Eski"})
+    assert calls == ["place-3"]
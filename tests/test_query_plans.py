@@ -0,0 +1,32 @@
+import sqlite3
+
+
+def migrated_connection(api, path):
+    conn = sqlite3.connect(path)
+    conn.create_function("distance_km", 4, api.distance_km, deterministic=True)
+    api.run_migrations(conn)
+    return conn
+
+
+def test_hot_queries_use_indexes(api, tmp_path):
+    conn = migrated_connection(api, str(tmp_path / "plans.db"))
+    try:
+        assert api.find_query_plan_problems(conn) == []
+    finally:
+        conn.close()
+
+
+def test_hot_queries_cover_listing_builders(api):
+    names = {name for name, _query, _params in api.hot_query_plans()}
+    for endpoint in ("get_requests (işletme)", "get_requests (araç sahibi)", "get_appointments (araç sahibi)", "get_appointments (işletme)"):
+        assert endpoint in names
+        assert f"{endpoint} (sayfalı)" in names
+
+
+def test_plan_check_reports_full_scans(api, tmp_path, monkeypatch):
+    conn = migrated_connection(api, str(tmp_path / "plans.db"))
+    try:
+        monkeypatch.setattr(api, "hot_query_plans", lambda: [("tam tarama", "SELECT * FROM Requests WHERE vehicle_km = ?", (1,))])
+        assert api.find_query_plan_problems(conn) == ["tam tarama: SCAN Requests"]
+    finally:
+        conn.close()
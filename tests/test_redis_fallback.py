@@ -0,0 +1,58 @@
+import time
+
+import pytest
+import redis
+
+
+def test_unreachable_redis_fails_fast_and_is_retried(api):
+    pool = api.InstrumentedRedisPool.from_url("redis://127.0.0.1:1/0", max_connections=2, timeout=0.1,
+                                              socket_connect_timeout=0.5, retry_interval=0.2)
+    client = redis.Redis(connection_pool=pool)
+    with pytest.raises(redis.exceptions.ConnectionError):
+        client.ping()
+    assert not pool.available()
+    assert pool.stats()["fallback"] is True
+
+    with pytest.raises(redis.exceptions.ConnectionError, match="devre dışı"):
+        client.ping()
+    time.sleep(0.25)
+    assert pool.available()
+    with pytest.raises(redis.exceptions.ConnectionError):
+        client.ping()
+    assert pool.stats()["outages"] == 1
+
+
+def test_sessions_fall_back_to_cookies_while_redis_is_down(api, create_user, login):
+    user_id = create_user("owner")
+    response = login(user_id, "owner").get("/api/auth/status")
+    assert response.get_json()["loggedIn"] is True
+
+
+def test_pool_exhaustion_is_not_an_outage(api):
+    fakeredis = pytest.importorskip("fakeredis")
+    pool = api.InstrumentedRedisPool(connection_class=fakeredis.FakeRedisConnection, server=fakeredis.FakeServer(),
+                                     max_connections=1, timeout=0.05)
+    held = pool.get_connection()
+    with pytest.raises(redis.exceptions.ConnectionError):
+        pool.get_connection()
+    stats = pool.stats()
+    assert (stats["exhausted"], stats["errors"], stats["outages"]) == (1, 0, 0)
+    assert pool.available()
+    pool.release(held)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_failed_connect_does_not_decrement_connections_in_use(api):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    pool = api.InstrumentedRedisPool(connection_class=fakeredis.FakeRedisConnection, server=server, max_connections=2, timeout=0.05)
+    held = pool.get_connection()
+    server.connected = False
+    # redis-py bağlantı kurulamayınca bağlantıyı kendi içinde release eder; bu verilmemiş bağlantı sayılmaz.
+    with pytest.raises(redis.exceptions.ConnectionError):
+        pool.get_connection()
+    assert pool.stats()["in_use"] == 1
+    assert pool.stats()["outages"] == 1
+    pool.release(held)
+    pool.release(held)
+    assert pool.stats()["in_use"] == 0
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_worker(api, server):
+    client = fakeredis.FakeRedis(server=server)
+    worker = api.CompactRedisSessionInterface(
+        api.app, client, SimpleNamespace(available=lambda: True), fakeredis.FakeRedis(server=server),
+        local_ttl=60, local_size=100, refresh_interval=3600, key_prefix="session:", use_signer=True, permanent=True
+    )
+    worker._ensure_listener()
+    assert worker._subscribed.wait(2)
+    return worker
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_logout_on_one_worker_evicts_cached_session_on_others(api):
+    server = fakeredis.FakeServer()
+    worker_a, worker_b = make_worker(api, server), make_worker(api, server)
+    worker_a._upsert_session(timedelta(days=1), {"user_id": 7, "name": "Ayşe"}, "session:abc")
+    assert worker_b._retrieve_session_data("session:abc")["user_id"] == 7
+    assert "session:abc" in worker_b._local
+
+    worker_a._delete_session("session:abc")
+    assert wait_until(lambda: "session:abc" not in worker_b._local)
+    assert worker_b._retrieve_session_data("session:abc") is None
+
+
+def test_session_update_on_one_worker_refreshes_others(api):
+    server = fakeredis.FakeServer()
+    worker_a, worker_b = make_worker(api, server), make_worker(api, server)
+    worker_a._upsert_session(timedelta(days=1), {"user_id": 7, "name": "Ayşe"}, "session:def")
+    assert worker_b._retrieve_session_data("session:def")["name"] == "Ayşe"
+
+    worker_a._upsert_session(timedelta(days=1), {"user_id": 7, "name": "Ayşe Yılmaz"}, "session:def")
+    assert wait_until(lambda: "session:def" not in worker_b._local)
+    assert worker_b._retrieve_session_data("session:def")["name"] == "Ayşe Yılmaz"
+    # Yazan worker kendi yayınıyla kopyasını düşürmez.
+    assert "session:def" in worker_a._local
+
+
+def test_local_cache_is_bypassed_while_not_subscribed(api):
+    server = fakeredis.FakeServer()
+    worker = make_worker(api, server)
+    worker._subscribed.clear()
+    worker._upsert_session(timedelta(days=1), {"user_id": 9}, "session:ghi")
+    assert worker._retrieve_session_data("session:ghi")["user_id"] == 9
+    assert worker._local == {}
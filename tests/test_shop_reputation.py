@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+
+def done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def reputation_row(api, shop_user_id):
+    conn = api.db_writer.acquire()
+    try:
+        return dict(conn.execute("SELECT * FROM ShopReputation WHERE shop_user_id = ?", (shop_user_id,)).fetchone())
+    finally:
+        api.db_writer.release(conn)
+
+
+def make_due(api, shop_user_id):
+    conn = api.db_writer.acquire()
+    try:
+        conn.execute("UPDATE ShopReputation SET next_check_at = ? WHERE shop_user_id = ?", (time.time() - 1, shop_user_id))
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+
+def test_failed_refresh_of_rated_shop_is_retried_after_retry_delay(api, create_user, monkeypatch):
+    shop_user_id = create_user("business")
+    place_id = f"place-{shop_user_id}"
+    conn = api.db_writer.acquire()
+    try:
+        conn.execute("INSERT INTO Shops (user_id, city, google_place_id) VALUES (?, 'Ankara', ?)", (shop_user_id, place_id))
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+    refresher = api.ShopReputationRefresher(interval=60, batch_size=100, max_age=86400, retry_after=1800)
+    places = {"result": {"name": "Servis", "rating": 4.5, "user_ratings_total": 10}}
+    monkeypatch.setattr(api.places_cache, "fetch_async", lambda pid, fields: done(places["result"] if pid == place_id else None))
+
+    started = time.time()
+    refresher.refresh()
+    row = reputation_row(api, shop_user_id)
+    assert row["rating"] == 4.5
+    assert row["next_check_at"] == pytest.approx(started + 86400, abs=5)
+    assert shop_user_id not in [shop[0] for shop in refresher.due_shops(100)]
+
+    make_due(api, shop_user_id)
+    places["result"] = None
+    started = time.time()
+    refresher.refresh()
+    row = reputation_row(api, shop_user_id)
+    # Önceki puan korunur, ancak bir sonraki deneme günlük değil kısa bekleme süresiyle yapılır.
+    assert row["rating"] == 4.5
+    assert row["next_check_at"] == pytest.approx(started + 1800, abs=5)
+
+
+def test_refresh_writes_in_one_short_transaction_and_skips_deleted_shops(api, create_user, monkeypatch):
+    kept_id, deleted_id = create_user("business"), create_user("business")
+    conn = api.db_writer.acquire()
+    try:
+        for shop_user_id in (kept_id, deleted_id):
+            conn.execute("INSERT INTO Shops (user_id, city, google_place_id) VALUES (?, 'Sinop', ?)", (shop_user_id, f"place-{shop_user_id}"))
+        conn.commit()
+    finally:
+        api.db_writer.release(conn)
+
+    def fetch(place_id, fields):
+        if place_id == f"place-{deleted_id}":
+            # İşletme, Places yanıtı beklenirken silinir.
+            writer = api.db_writer.acquire()
+            try:
+                writer.execute("DELETE FROM Shops WHERE user_id = ?", (deleted_id,))
+                writer.commit()
+            finally:
+                api.db_writer.release(writer)
+        return done({"name": "Servis", "rating": 4.0, "user_ratings_total": 3} if place_id.startswith("place-") else None)
+    monkeypatch.setattr(api.places_cache, "fetch_async", fetch)
+
+    refresher = api.ShopReputationRefresher(interval=60, batch_size=100, max_age=86400, retry_after=1800)
+    acquired = api.db_writer.stats()["acquired"]
+    refresher.refresh()
+    # Silme işlemi bir kez, yenileyicinin toplu yazması bir kez yazıcıyı alır.
+    assert api.db_writer.stats()["acquired"] - acquired == 2
+    assert reputation_row(api, kept_id)["rating"] == 4.0
+    conn = api.db_writer.acquire()
+    try:
+        assert conn.execute("SELECT 1 FROM ShopReputation WHERE shop_user_id = ?", (deleted_id,)).fetchone() is None
+    finally:
+        api.db_writer.release(conn)
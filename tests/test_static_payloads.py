@@ -0,0 +1,58 @@
+import gzip
+import json
+
+import pytest
+
+
+@pytest.fixture
+def cities(api, monkeypatch):
+    body = json.dumps([f"Şehir {index}" for index in range(200)], ensure_ascii=False).encode("utf-8")
+    monkeypatch.setattr(api, "cities_payload", api.make_static_payload(body))
+    return body
+
+
+def get_cities(api, accept_encoding=None, etag=None):
+    headers = {}
+    if accept_encoding is not None:
+        headers["Accept-Encoding"] = accept_encoding
+    if etag:
+        headers["If-None-Match"] = etag
+    return api.app.test_client().get("/api/cities", headers=headers)
+
+
+def test_gzip_is_served_when_accepted(api, cities):
+    response = get_cities(api, "gzip, deflate")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == cities
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"].endswith('-gzip"')
+
+
+def test_brotli_is_preferred_when_available(api, cities):
+    brotli = pytest.importorskip("brotli")
+    response = get_cities(api, "gzip, br")
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data) == cities
+    assert response.headers["ETag"].endswith('-br"')
+
+
+@pytest.mark.parametrize("accept_encoding", [None, "identity", "gzip;q=0"])
+def test_identity_without_acceptable_encoding(api, cities, accept_encoding):
+    response = get_cities(api, accept_encoding)
+    assert "Content-Encoding" not in response.headers
+    assert response.data == cities
+    assert response.headers["ETag"] == f'"{api.cities_payload.etag}"'
+
+
+def test_etag_is_per_encoding(api, cities):
+    gzip_etag = get_cities(api, "gzip").headers["ETag"]
+    assert get_cities(api, "gzip", etag=gzip_etag).status_code == 304
+    identity = get_cities(api, "identity", etag=gzip_etag)
+    assert identity.status_code == 200
+    assert identity.data == cities
+
+
+def test_small_bodies_are_not_compressed(api):
+    payload = api.make_static_payload(b'["Ankara"]')
+    assert (payload.gzip, payload.br) == (b"", b"")
+    assert api.EMPTY_LIST_PAYLOAD.gzip == b""
@@ -0,0 +1,23 @@
+import json
+import random
+
+from catalogue_bench import generate_catalogue, legacy_catalogue_lookup
+
+
+def test_catalogue_index_matches_legacy_scans_for_every_path(api, tmp_path):
+    vehicle_data = generate_catalogue(random.Random(7), brands=4, series_per_brand=3, years=4, fuels=3, models=3)
+    catalogue = api.build_vehicle_catalogue(vehicle_data)
+    path = str(tmp_path / "test.cat")
+    api.write_catalogue_file(catalogue, path, 0, 0)
+    store = api.CatalogueStore(path)
+
+    expected_paths = {()}
+    for item in vehicle_data:
+        values = (item["marka"], item["seri"], item["yil"], item["yakit"])
+        expected_paths.update(values[:depth] for depth in range(1, 5))
+    assert set(catalogue) == expected_paths
+    for catalogue_path in expected_paths:
+        expected = legacy_catalogue_lookup(vehicle_data, catalogue_path)
+        assert json.loads(catalogue[catalogue_path]) == expected
+        assert json.loads(bytes(store.get(catalogue_path).body)) == expected
+    assert store.get(("Marka999",)) is None